@@ -1,92 +1,622 @@
 import module.printer as printer
-import module.plotter as plotter
-import module.io as io
+import module.analysis as analysis
+import module.metrics as metrics
+import module.export as export
+import module.catalog as catalog
+import module.watch as watch
+import module.golden as golden
+import gen_signals
+from concurrent.futures import ProcessPoolExecutor
+import functools
 import time
 import os
+import sys
+import csv
 import numpy as np
 
 CONFIG = {
     "sample_rate": 48000,
     "load_dir_impulse": "./effected/impulse",
     "load_dir_sin": "./effected/sin",
+    # paths, sizes and headers of the renders, only changed files are read again
+    "catalog_path": "./data/catalog.json",
+    # True analyzes the valid plugins when others are missing a render or unreadable, False aborts
+    "skip_invalid": False,
+    # renders at other rates are resampled to sample_rate, False reports them as problems
+    "resample": False,
+    # "first" analyzes channel 0 only, "all" every channel, "mid_side" also mid and side of stereo renders
+    "channels": "first",
+    # rows this far below the loudest row of their render, e.g. the side of a near-mono plugin, are left out
+    "channel_floor_db": -90,
     "fft_size": 2**23,
+    # "float32", "float64" or "longdouble"
+    "precision": "float64",
+    # the -200 dB distortion floor needs longdouble
+    "distortion_precision": "longdouble",
+    # correlate the impulse renders with the impulse fed to the plugins, and center
+    # the impulse panel and the phase on the detected latency
+    "detect_latency": True,
     "plot_zoom": 3000,
     "plot_important_freq": 200,
+    # frequencies of the zoomed-in magnitude around plot_important_freq
+    "plot_zoom_points": 4000,
+    # the sine test tone, as generated by gen_signals.py
+    "sine_wave_freq": gen_signals.CONFIG["sine_wave_freq"],
+    "n_harmonics": 10,
+    # evaluate each harmonic band with a zoom FFT at this many points, 0 reads the FFT bins
+    "harmonic_points": 0,
+    # False skips matplotlib entirely, for automated runs
+    "plot": True,
+    # spectra, impulse excerpts and metrics on a log-frequency grid of this many points, 0 disables
+    "export_n_freq": 4000,
+    # "npz", "json" or "parquet" (needs pyarrow)
+    "export_format": "npz",
+    # spectra of unchanged renders are reused from here, None disables the cache
+    "cache_dir": "./data/cache_analyze",
+    "cache_max_bytes": 16 * 2**30,
+    # plugins are spread over this many processes, 1 runs everything in this process
+    "workers": os.cpu_count(),
+    "fft_workers": os.cpu_count(),
+    # renders are loaded in batches whose estimated size fits this many bytes, split over the workers, None loads each worker's plugins at once.
+    # fewer workers run when their share cannot hold the largest plugin, so the budget bounds all of them
+    "memory_budget": 8 * 2**30,
+    # measure the bytes allocated per stage, see printer.span. Slows down every stage and skews its timing
+    "trace_memory": False,
+    # "store" keeps this run as the golden reference of each plugin, "compare" checks this
+    # run against them and plots only the plugins that fail, None does neither. Both need the export
+    "golden_mode": None,
+    "golden_dir": "./golden",
+    # log-spaced bands of the references, at most export_n_freq
+    "golden_n_bands": 400,
+    # see golden.GoldenTolerances
+    "golden_tolerances": golden.DEFAULT_TOLERANCES,
+    # exit with status 1 when a plugin fails the comparison, except in watch mode
+    "golden_fail_exit": True,
+    # keep running and analyze renders as they arrive or change, until interrupted
+    "watch": False,
+    # seconds between scans in watch mode, a render is analyzed once it is unchanged for one interval
+    "watch_interval": 5,
     "output_dir": os.path.join("output_analyze", time.strftime("%Y%m%d-%H%M%S")),
 }
 
 
+def write_metrics(filepath: str, metrics_list: list[metrics.DistortionMetrics]):
+    """
+    Writes the latency and distortion metrics as CSV, one row per plugin and one column per harmonic.
+
+    Parameters
+    ----------
+    filepath : str
+        The path of the CSV file.
+    metrics_list : list[metrics.DistortionMetrics]
+        The metrics of each plugin.
+    """
+    n_harmonics = max([len(m["harmonic_dbc"]) for m in metrics_list], default=0)
+    with open(filepath, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(
+            [
+                "title",
+                "latency",
+                "fundamental_freq",
+                "thd",
+                "thd_db",
+                "thd_n",
+                "thd_n_db",
+                "noise_floor_db",
+            ]
+            + [f"h{order}_dbc" for order in range(2, n_harmonics + 2)]
+        )
+        for m in metrics_list:
+            writer.writerow(
+                [
+                    m["title"],
+                    m["latency"],
+                    m["fundamental_freq"],
+                    m["thd"],
+                    m["thd_db"],
+                    m["thd_n"],
+                    m["thd_n_db"],
+                    m["noise_floor_db"],
+                ]
+                + m["harmonic_dbc"]
+            )
+
+
+@functools.cache
+def sine_wave_half_width() -> int:
+    """Returns the half width of the test tone in bins of fft_size, see `metrics.window_half_width`."""
+    # scaled in analyze_chunk for longer renders
+    return gen_signals.sine_wave_half_width(gen_signals.CONFIG, CONFIG["fft_size"])
+
+
+@functools.cache
+def sine_wave_order_gain() -> tuple[float, ...]:
+    """Returns how the test tone window scales each harmonic order, see `metrics.window_order_gain`."""
+    # the gain is a ratio of sums, so float64 is precise enough
+    window = gen_signals.sine_wave_window(
+        {**gen_signals.CONFIG, "precision": "float64"}
+    )
+    return tuple(metrics.window_order_gain(window, CONFIG["n_harmonics"]).tolist())
+
+
+def plots_enabled() -> bool:
+    """Returns whether the panels of all plugins are plotted, which a golden comparison replaces."""
+    return CONFIG["plot"] and CONFIG["golden_mode"] != "compare"
+
+
+def analysis_settings(workers: int) -> analysis.AnalysisSettings:
+    """Returns the analysis settings of CONFIG for `workers` processes."""
+    return {
+        "sample_rate": CONFIG["sample_rate"],
+        "fft_size": CONFIG["fft_size"],
+        "precision": CONFIG["precision"],
+        "distortion_precision": CONFIG["distortion_precision"],
+        "zoom": CONFIG["plot_zoom"],
+        "important_freq": CONFIG["plot_important_freq"],
+        "cache_dir": CONFIG["cache_dir"],
+        "cache_max_bytes": CONFIG["cache_max_bytes"],
+        # the processes share the cores
+        "fft_workers": max(1, (CONFIG["fft_workers"] or 1) // workers),
+        "sine_wave_freq": CONFIG["sine_wave_freq"],
+        "n_harmonics": CONFIG["n_harmonics"],
+        "half_width": sine_wave_half_width(),
+        "order_gain": list(sine_wave_order_gain()),
+        "plot": plots_enabled(),
+        "export_n_freq": CONFIG["export_n_freq"],
+        "zoom_points": CONFIG["plot_zoom_points"],
+        "harmonic_points": CONFIG["harmonic_points"],
+        "trace_memory": CONFIG["trace_memory"],
+        "channels": CONFIG["channels"],
+        "channel_floor_db": CONFIG["channel_floor_db"],
+        "resample": CONFIG["resample"],
+        "detect_latency": CONFIG["detect_latency"],
+        # the impulse fed to the plugins, as generated by gen_signals.py
+        "signal_length": gen_signals.CONFIG["signal_length"],
+        "memory_budget": (
+            None
+            if CONFIG["memory_budget"] is None
+            else CONFIG["memory_budget"] // workers
+        ),
+    }
+
+
+def scan_renders(p: printer.printer, _catalog: catalog.catalog, entries=None):
+    """
+    Pairs the renders of the catalog and reports the problems found.
+
+    Parameters
+    ----------
+    p : printer.printer
+        The printer.
+    _catalog : catalog.catalog
+        The catalog of the input directories.
+    entries : list[catalog.CatalogEntry], optional
+        The entries of a scan that already happened, otherwise the
+        directories are scanned.
+
+    Returns
+    -------
+    tuple
+        A tuple containing the catalog entries (list[catalog.CatalogEntry]),
+        the valid (title, impulse path, sine path) of each plugin (list[tuple])
+        and the problems (list[str]).
+    """
+    if entries is None:
+        entries = _catalog.scan(
+            {"impulse": CONFIG["load_dir_impulse"], "sine": CONFIG["load_dir_sin"]}
+        )
+        _catalog.save()
+    pair_list, problems = catalog.pair_renders(
+        entries, None if CONFIG["resample"] else CONFIG["sample_rate"]
+    )
+    p.print_message(f"renders: {len(entries)}, plugins: {len(pair_list)}")
+    for problem in problems:
+        p.print_message(problem)
+    return entries, pair_list, problems
+
+
+def analyze_pairs(p: printer.printer, pair_list: list[tuple[str, str, str]]):
+    """
+    Analyzes plugins, spread over CONFIG["workers"] processes.
+
+    Returns
+    -------
+    tuple
+        A tuple containing the panel data, the distortion metrics, the grid
+        spectra and the plugin title of each analyzed channel, see
+        `analysis.analyze_chunk`.
+    """
+    workers = max(1, min(CONFIG["workers"] or 1, len(pair_list)))
+    # the budget is shared by the processes, so fewer run if a share cannot hold a plugin
+    budget_workers = analysis.memory_workers(pair_list, analysis_settings(1), workers)
+    if budget_workers < workers:
+        p.print_message(
+            f"memory budget: {budget_workers} of {workers} processes fit, see memory_budget"
+        )
+        workers = budget_workers
+    settings = analysis_settings(workers)
+    if workers == 1:
+        result = analysis.analyze_chunk(pair_list, settings, p)[:4]
+        report_silent(p, pair_list, result[3])
+        return result
+
+    chunk_list = [pair_list[idx::workers] for idx in range(workers)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunk_result_list = list(
+            executor.map(
+                analysis.analyze_chunk, chunk_list, [settings] * len(chunk_list)
+            )
+        )
+    traces_list, metrics_list, export_list, plugin_list = [], [], [], []
+    for chunk_result in chunk_result_list:
+        chunk_traces, chunk_metrics, chunk_exports, chunk_plugins, spans = chunk_result
+        p.add_spans(spans)
+        traces_list += chunk_traces
+        metrics_list += chunk_metrics
+        export_list += chunk_exports
+        plugin_list += chunk_plugins
+    # restore the sorted order of the interleaved chunks, the channels of a plugin stay in order
+    order = {title: idx for idx, (title, _, _) in enumerate(pair_list)}
+    index = sorted(range(len(plugin_list)), key=lambda idx: order[plugin_list[idx]])
+    report_silent(p, pair_list, plugin_list)
+    return (
+        [traces_list[idx] for idx in index] if plots_enabled() else [],
+        [metrics_list[idx] for idx in index],
+        [export_list[idx] for idx in index] if CONFIG["export_n_freq"] > 0 else [],
+        [plugin_list[idx] for idx in index],
+    )
+
+
+def report_silent(
+    p: printer.printer, pair_list: list[tuple[str, str, str]], plugin_list: list[str]
+):
+    """
+    Reports the plugins without any analyzed channel, e.g. bypassed or muted
+    ones whose renders are silent. They are left out of all outputs.
+    """
+    analyzed = set(plugin_list)
+    for title, _, _ in pair_list:
+        if title not in analyzed:
+            p.print_message(f"{title}: every channel is silent, left out")
+
+
+def write_outputs(
+    p: printer.printer,
+    traces_list: list[analysis.AnalysisTraces],
+    metrics_list: list[metrics.DistortionMetrics],
+    export_list: list[export.AnalysisExport],
+):
+    """
+    Writes the metrics, the export and the plots of all plugins to the output
+    directory, and stores or checks the golden references.
+
+    Returns
+    -------
+    list[str]
+        The titles that failed the golden comparison.
+    """
+    with p.span("write metrics"):
+        p.print_message("Writing distortion metrics...")
+        write_metrics(
+            os.path.join(CONFIG["output_dir"], "distortion_metrics.csv"), metrics_list
+        )
+        for m in metrics_list:
+            if CONFIG["detect_latency"]:
+                p.print_message(
+                    f"{m['title']}: latency {m['latency']:.3f} samples ({1e3 * m['latency'] / CONFIG['sample_rate']:.3f} ms)"
+                )
+            p.print_message(
+                f"{m['title']}: THD {m['thd_db']:.2f} dB, THD+N {m['thd_n_db']:.2f} dB, noise floor {m['noise_floor_db']:.2f} dB"
+            )
+
+    with p.span("export"):
+        if CONFIG["export_n_freq"] > 0:
+            p.print_message("Writing export...")
+            freq, _ = export.log_frequency_grid(
+                1, CONFIG["sample_rate"] / 2, CONFIG["export_n_freq"]
+            )
+            filepath = export.write_export(
+                os.path.join(CONFIG["output_dir"], "analysis_export"),
+                freq,
+                export_list,
+                metrics_list,
+                CONFIG["export_format"],
+            )
+            p.print_message(f"export: {filepath}")
+
+    failed = []
+    # without plugins, e.g. once all renders left in watch mode, only the
+    # metrics and the export are written, empty
+    if CONFIG["golden_mode"] is not None and len(metrics_list) > 0:
+        with p.span("golden"):
+            failed = check_golden(p, export_list, metrics_list)
+
+    if plots_enabled() and len(traces_list) > 0:
+        with p.span("plot"):
+            # imported here so that runs without plots never load matplotlib
+            import module.plotter as plotter
+            from matplotlib import pyplot as plt
+
+            p.print_message("Plotting result...")
+            plot = plotter.plotter(CONFIG["output_dir"])
+            plot.plot_analysis_traces(
+                traces_list,
+                CONFIG["sample_rate"],
+                zoom=CONFIG["plot_zoom"],
+                important_freq=CONFIG["plot_important_freq"],
+            )
+            # watch mode plots again on every change
+            plt.close("all")
+    return failed
+
+
+def check_golden(
+    p: printer.printer,
+    export_list: list[export.AnalysisExport],
+    metrics_list: list[metrics.DistortionMetrics],
+) -> list[str]:
+    """
+    Stores this run as the golden references, or checks it against them.
+
+    A comparison writes golden_report.csv and plots the failing plugins over
+    their references into the golden_failures directory.
+
+    Returns
+    -------
+    list[str]
+        The titles that failed the comparison, empty when storing.
+    """
+    freq, _ = export.log_frequency_grid(
+        1, CONFIG["sample_rate"] / 2, CONFIG["export_n_freq"]
+    )
+    references = golden.reduce_references(
+        freq, export_list, metrics_list, CONFIG["golden_n_bands"]
+    )
+    if CONFIG["golden_mode"] == "store":
+        p.print_message(
+            f"Storing {len(references)} golden references: '{CONFIG['golden_dir']}'"
+        )
+        golden.store(CONFIG["golden_dir"], references)
+        return []
+
+    p.print_message("Comparing with golden references...")
+    stored = golden.load(CONFIG["golden_dir"])
+    checks = golden.compare(references, stored, CONFIG["golden_tolerances"])
+    golden.write_report(os.path.join(CONFIG["output_dir"], "golden_report.csv"), checks)
+    for check in checks:
+        if check["passed"]:
+            continue
+        if check["check"] == "reference":
+            p.print_message(
+                f"FAIL {check['title']}: no golden reference or no render to compare"
+            )
+            continue
+        p.print_message(
+            f"FAIL {check['title']}: {check['check']} off by {check['deviation']:.4g}"
+            + (
+                ""
+                if np.isnan(check["worst_freq"])
+                else f" at {check['worst_freq']:.1f} Hz"
+            )
+            + f" (tolerance {check['tolerance']:.4g}, {check['failed_bands']} failed)"
+        )
+    failed = sorted(set(check["title"] for check in checks if not check["passed"]))
+    titles = set(check["title"] for check in checks)
+    p.print_message(f"golden: {len(titles) - len(failed)} passed, {len(failed)} failed")
+
+    plotted = [
+        (reference, stored[reference["title"]])
+        for reference in references
+        if reference["title"] in failed
+        and reference["title"] in stored
+        and np.array_equal(reference["freq"], stored[reference["title"]]["freq"])
+    ]
+    if CONFIG["plot"] and len(plotted) > 0:
+        # imported here so that passing runs never load matplotlib
+        import module.plotter as plotter
+        from matplotlib import pyplot as plt
+
+        p.print_message(f"Plotting {len(plotted)} failed plugins...")
+        traces_list = []
+        for reference, golden_reference in plotted:
+            traces_list += analysis.traces_from_export(
+                golden.reference_columns([reference]), CONFIG["plot_important_freq"]
+            )
+            traces_list += analysis.traces_from_export(
+                golden.reference_columns([golden_reference], " (golden)"),
+                CONFIG["plot_important_freq"],
+            )
+        plot = plotter.plotter(os.path.join(CONFIG["output_dir"], "golden_failures"))
+        plot.plot_analysis_traces(
+            traces_list,
+            CONFIG["sample_rate"],
+            zoom=CONFIG["plot_zoom"],
+            important_freq=CONFIG["plot_important_freq"],
+        )
+        plt.close("all")
+    return failed
+
+
+def watch_renders(
+    p: printer.printer,
+    _catalog: catalog.catalog,
+    entries: list[catalog.CatalogEntry],
+    results: dict[str, list[tuple]],
+):
+    """
+    Analyzes renders as they arrive or change until interrupted.
+
+    The process, its imports, the FFT plans of scipy and the spectrum cache
+    stay warm, so each update costs the analysis of the changed plugins and
+    rewriting the outputs.
+
+    Parameters
+    ----------
+    p : printer.printer
+        The printer.
+    _catalog : catalog.catalog
+        The catalog of the input directories.
+    entries : list[catalog.CatalogEntry]
+        The renders already analyzed.
+    results : dict[str, list[tuple]]
+        The (panel data, metrics, grid spectra) of each analyzed channel of
+        each plugin by title, updated in place.
+    """
+    _watcher = watch.watcher(
+        _catalog,
+        {"impulse": CONFIG["load_dir_impulse"], "sine": CONFIG["load_dir_sin"]},
+    )
+    _watcher.mark_seen(entries)
+    p.print_message(f"Watching for renders every {CONFIG['watch_interval']} s...")
+    while True:
+        time.sleep(CONFIG["watch_interval"])
+        _watch_update(p, _catalog, _watcher, results)
+
+
+def _watch_update(
+    p: printer.printer,
+    _catalog: catalog.catalog,
+    _watcher: watch.watcher,
+    results: dict[str, list[tuple]],
+):
+    # one poll of watch_renders
+    entries, changed, removed = _watcher.poll()
+    if len(changed) == 0 and len(removed) == 0:
+        return
+    with p.span("update"):
+        for path in removed:
+            p.print_message(f"removed: {path}")
+        for entry in changed:
+            p.print_message(f"changed: {entry['path']}")
+        # a plugin is paired only once both of its renders have settled, so
+        # one is never analyzed against its counterpart still being written
+        settled = _watcher.settled(entries)
+        _, pair_list, _ = scan_renders(p, _catalog, settled)
+        titles = set(title for title, _, _ in pair_list)
+        # a plugin whose render is being rewritten keeps its earlier results
+        writing = set(entry["title"] for entry in entries) - set(
+            entry["title"] for entry in settled
+        )
+        dropped = [
+            title for title in results if title not in titles and title not in writing
+        ]
+        for title in dropped:
+            del results[title]
+        changed_titles = set(entry["title"] for entry in changed)
+        update_list = [pair for pair in pair_list if pair[0] in changed_titles]
+        if len(update_list) > 0:
+            with p.span("analyze"):
+                p.print_message(f"Analyzing {len(update_list)} plugins...")
+                _store_results(results, update_list, *analyze_pairs(p, update_list))
+        # e.g. the first render of a plugin only, its counterpart is yet to come
+        if len(update_list) > 0 or len(dropped) > 0:
+            if len(results) == 0:
+                p.print_message("No plugin left, writing empty outputs")
+            write_outputs(p, *_collect_results(results))
+    p.flush()
+
+
+def _store_results(
+    results: dict[str, list[tuple]],
+    pair_list: list[tuple[str, str, str]],
+    traces_list: list[analysis.AnalysisTraces],
+    metrics_list: list[metrics.DistortionMetrics],
+    export_list: list[export.AnalysisExport],
+    plugin_list: list[str],
+):
+    # a plugin whose channels are all silent has no results, see report_silent
+    for title, _, _ in pair_list:
+        results[title] = []
+    # the panel data and grid spectra are empty when disabled
+    for idx, title in enumerate(plugin_list):
+        results[title].append(
+            (
+                traces_list[idx] if plots_enabled() else None,
+                metrics_list[idx],
+                export_list[idx] if CONFIG["export_n_freq"] > 0 else None,
+            )
+        )
+
+
+def _collect_results(results: dict[str, list[tuple]]):
+    # in title order, as pair_renders returns the plugins
+    ordered = [r for title in sorted(results) for r in results[title]]
+    traces_list = [r[0] for r in ordered] if plots_enabled() else []
+    metrics_list = [r[1] for r in ordered]
+    export_list = [r[2] for r in ordered] if CONFIG["export_n_freq"] > 0 else []
+    return traces_list, metrics_list, export_list
+
+
 def main():
+    golden_mode = CONFIG["golden_mode"]
+    assert golden_mode in (None,) + golden.MODES, f"unknown golden mode: {golden_mode}"
+    # golden references are reduced from the export
+    assert (
+        golden_mode is None or CONFIG["export_n_freq"] >= CONFIG["golden_n_bands"]
+    ), "export_n_freq must be at least golden_n_bands"
     os.makedirs(CONFIG["output_dir"], exist_ok=True)
 
-    p = printer.printer(CONFIG["output_dir"])
+    p = printer.printer(CONFIG["output_dir"], CONFIG["trace_memory"])
     p.print_message(f"sample_rate: {CONFIG['sample_rate']}")
+    p.print_message(f"resample: {CONFIG['resample']}")
     p.print_message(f"load_dir_impulse: '{CONFIG['load_dir_impulse']}'")
     p.print_message(f"load_dir_sin: '{CONFIG['load_dir_sin']}'")
+    p.print_message(f"catalog_path: '{CONFIG['catalog_path']}'")
     p.print_message(f"fft_size: {CONFIG['fft_size']}")
+    p.print_message(f"precision: {CONFIG['precision']}")
+    p.print_message(f"channels: {CONFIG['channels']}")
+    p.print_message(f"distortion_precision: {CONFIG['distortion_precision']}")
+    p.print_message(f"detect_latency: {CONFIG['detect_latency']}")
+    p.print_message(f"cache_dir: '{CONFIG['cache_dir']}'")
+    p.print_message(f"workers: {CONFIG['workers']}")
+    p.print_message(f"memory_budget: {CONFIG['memory_budget']}")
+    p.print_message(f"plot: {CONFIG['plot']}")
+    p.print_message(
+        f"export: {CONFIG['export_n_freq']} points, {CONFIG['export_format']}"
+    )
+    p.print_message(f"golden: {CONFIG['golden_mode']}, '{CONFIG['golden_dir']}'")
+    p.print_message(f"watch: {CONFIG['watch']}")
     p.print_message(f"output_dir: '{CONFIG['output_dir']}'")
 
-    p.print_message("Loading impulse...")
-    _io = io.io()
-    audio_path_list = []
-    for root, _, files in os.walk(CONFIG["load_dir_impulse"]):
-        for file in files:
-            if os.path.splitext(file)[1] == ".wav":
-                audio_path_list.append(os.path.join(root, file))
-    audio_path_list = sorted(audio_path_list)
-    p.print_message(f"audio_path_list: {audio_path_list}")
-    wave_dict_list: list[plotter.AnalyzeDict] = []
-    for audio_path in audio_path_list:
-        sample_rate, audio_data = _io.load_wav_as_mono(audio_path)
+    with p.span("list"):
+        p.print_message("Scanning renders...")
+        _catalog = catalog.catalog(CONFIG["catalog_path"])
+        entries, pair_list, problems = scan_renders(p, _catalog)
+        # everything is checked before any render is loaded. In watch mode
+        # incomplete plugins are expected, their renders are still arriving
         assert (
-            sample_rate == CONFIG["sample_rate"]
-        ), f"sample rate mismatch: {sample_rate}"
-        pad_length = CONFIG["fft_size"] - audio_data.shape[0]
-        if pad_length > 0:
-            audio_data = np.pad(audio_data, (pad_length // 2, pad_length // 2))
-        audio_data /= np.max(np.abs(audio_data))
-        wave_dict_list.append(
-            {
-                "impulse": audio_data,
-                "title": os.path.splitext(os.path.basename(audio_path))[0],
-            }
+            len(problems) == 0 or CONFIG["skip_invalid"] or CONFIG["watch"]
+        ), f"{len(problems)} problems found, see above"
+        assert len(pair_list) > 0 or CONFIG["watch"], "no plugin to analyze"
+
+    results = {}
+    failed = []
+    if len(pair_list) > 0:
+        with p.span("analyze"):
+            p.print_message("Analyzing...")
+            p.print_message(
+                f"sine wave window half width: {sine_wave_half_width()} bins"
+            )
+            traces_list, metrics_list, export_list, plugin_list = analyze_pairs(
+                p, pair_list
+            )
+        failed = write_outputs(p, traces_list, metrics_list, export_list)
+        _store_results(
+            results, pair_list, traces_list, metrics_list, export_list, plugin_list
         )
 
-    p.print_message("Loading sine...")
-    audio_path_list = []
-    for root, _, files in os.walk(CONFIG["load_dir_sin"]):
-        for file in files:
-            if os.path.splitext(file)[1] == ".wav":
-                audio_path_list.append(os.path.join(root, file))
-    audio_path_list = sorted(audio_path_list)
-    p.print_message(f"audio_path_list: {audio_path_list}")
-    for idx, audio_path in enumerate(audio_path_list):
-        sample_rate, audio_data = _io.load_wav_as_mono(audio_path)
-        assert (
-            sample_rate == CONFIG["sample_rate"]
-        ), f"sample rate mismatch: {sample_rate}"
-        pad_length = CONFIG["fft_size"] - audio_data.shape[0]
-        if pad_length > 0:
-            audio_data = np.pad(audio_data, (pad_length // 2, pad_length // 2))
-        audio_data /= np.max(np.abs(audio_data))
-        wave_dict_list[idx]["sine_wave"] = audio_data
-
-        # check title is same
-        assert (
-            wave_dict_list[idx]["title"]
-            == os.path.splitext(os.path.basename(audio_path))[0]
-        ), f"title mismatch: {wave_dict_list[idx]['title']}"
-
-    p.print_message("Plotting result...")
-    plot = plotter.plotter(CONFIG["output_dir"])
-    plot.plot_analysis_result(
-        wave_dict_list,
-        CONFIG["sample_rate"],
-        zoom=CONFIG["plot_zoom"],
-        important_freq=CONFIG["plot_important_freq"],
-    )
+    if CONFIG["watch"]:
+        try:
+            watch_renders(p, _catalog, entries, results)
+        except KeyboardInterrupt:
+            p.print_message("Stopped watching.")
 
     p.print_message("Done!")
+    p.summary()
+    p.close()
+    if len(failed) > 0 and CONFIG["golden_fail_exit"] and not CONFIG["watch"]:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,286 @@
+import module.printer as printer
+import module.io as io
+import module.cache as cache
+import module.catalog as catalog
+import module.analysis as analysis
+import module.metrics as metrics
+import module.intermodulation as intermodulation
+import module.precision as precision
+import gen_signals
+import functools
+import time
+import os
+import csv
+
+CONFIG = {
+    "sample_rate": 48000,
+    # the renders of each test signal, None skips the test
+    "load_dirs": {
+        "multitone": "./effected/multitone",
+        "smpte": "./effected/two_tone_smpte",
+        "ccif": "./effected/two_tone_ccif",
+    },
+    # shared with analyze.py, see catalog.catalog
+    "catalog_path": "./data/catalog.json",
+    # renders at other rates are resampled to sample_rate, False reports them as problems
+    "resample": False,
+    # "first" analyzes channel 0 only, "all" every channel, "mid_side" also mid and side of stereo renders
+    "channels": "first",
+    # rows this far below the loudest row of their render, e.g. the side of a near-mono plugin, are left out
+    "channel_floor_db": -90,
+    "fft_size": 2**22,
+    # the -200 dB distortion floor needs longdouble
+    "precision": "longdouble",
+    # the highest harmonic order of each multitone tone, up to gen_signals' multitone_n_orders
+    "multitone_n_orders": gen_signals.CONFIG["multitone_n_orders"],
+    # the highest intermodulation order of the two-tone tests
+    "two_tone_n_orders": 5,
+    # spectra of unchanged renders are reused from here, None disables the cache
+    "cache_dir": "./data/cache_analyze",
+    "cache_max_bytes": 16 * 2**30,
+    "fft_workers": os.cpu_count(),
+    # renders loaded and transformed together
+    "batch_size": 8,
+    "output_dir": os.path.join(
+        "output_analyze_multitone", time.strftime("%Y%m%d-%H%M%S")
+    ),
+}
+
+
+@functools.cache
+def tone_half_width() -> int:
+    """Returns the half width of the windowed tones in bins of fft_size, see `metrics.window_half_width`."""
+    return gen_signals.sine_wave_half_width(gen_signals.CONFIG, CONFIG["fft_size"])
+
+
+@functools.cache
+def tone_order_gain():
+    """Returns how the window of the tones scales each product order, see `metrics.window_order_gain`."""
+    # the gain is a ratio of sums, so float64 is precise enough
+    window = gen_signals.sine_wave_window(
+        {**gen_signals.CONFIG, "precision": "float64"}
+    )
+    n_orders = max(CONFIG["multitone_n_orders"], CONFIG["two_tone_n_orders"], 3)
+    return metrics.window_order_gain(window, n_orders)
+
+
+def analyze_renders(
+    p: printer.printer,
+    _io: io.io,
+    _cache: cache.cache | None,
+    test: str,
+    entries: list[catalog.CatalogEntry],
+) -> list[dict]:
+    """
+    Computes the metrics of the renders of one test signal.
+
+    Each batch of renders goes through one batched FFT, and all tone and
+    product bins are read from it with the index tables of `intermodulation`.
+
+    Returns
+    -------
+    list[dict]
+        The `intermodulation.MultitoneMetrics` or
+        `intermodulation.TwoToneMetrics` of each analyzed channel.
+    """
+    tables = {}
+    metrics_list = []
+    for start in range(0, len(entries), CONFIG["batch_size"]):
+        batch = entries[start : start + CONFIG["batch_size"]]
+        renders = analysis.load_renders(
+            _io,
+            [entry["path"] for entry in batch],
+            precision.real_dtype(CONFIG["precision"]),
+            CONFIG["fft_size"],
+            _cache,
+            CONFIG["fft_workers"],
+            p,
+            CONFIG["channels"],
+            CONFIG["sample_rate"] if CONFIG["resample"] else None,
+        )
+        spectrum_list, title_list = [], []
+        for entry, (sample_rate, labels, rows, spectra) in zip(batch, renders):
+            assert (
+                sample_rate == CONFIG["sample_rate"]
+            ), f"sample rate mismatch: {sample_rate}"
+            audible_list = analysis.audible_rows(rows, CONFIG["channel_floor_db"])
+            if not any(audible_list):
+                p.print_message(f"{entry['title']}: every channel is silent, left out")
+            for label, _spectrum, audible in zip(labels, spectra, audible_list):
+                if not audible:
+                    continue
+                spectrum_list.append(_spectrum)
+                title_list.append(
+                    entry["title"] if label == "" else f"{entry['title']} [{label}]"
+                )
+        # the tables depend on the FFT length, which grows for renders longer than fft_size
+        for length, rows in analysis.length_groups(
+            [_spectrum.length for _spectrum in spectrum_list]
+        ):
+            # the tones spread over proportionally more bins of a longer FFT
+            half_width = tone_half_width() * length // CONFIG["fft_size"]
+            if length not in tables:
+                if test == "multitone":
+                    tables[length] = intermodulation.multitone_table(
+                        gen_signals.multitone_frequencies(gen_signals.CONFIG),
+                        CONFIG["sample_rate"],
+                        length,
+                        CONFIG["multitone_n_orders"],
+                        half_width,
+                    )
+                else:
+                    tables[length] = intermodulation.two_tone_table(
+                        test,
+                        CONFIG["sample_rate"],
+                        length,
+                        CONFIG["two_tone_n_orders"],
+                        half_width,
+                    )
+            compute = (
+                intermodulation.multitone_metrics
+                if test == "multitone"
+                else intermodulation.two_tone_metrics
+            )
+            metrics_list += compute(
+                [spectrum_list[idx] for idx in rows],
+                [title_list[idx] for idx in rows],
+                tables[length],
+                order_gain=tone_order_gain(),
+            )
+    return metrics_list
+
+
+def write_multitone_metrics(
+    filepath: str, metrics_list: list[intermodulation.MultitoneMetrics]
+):
+    """Writes multitone metrics as CSV, one row per plugin and tone and one column per harmonic."""
+    n_harmonics = max(
+        [len(m["harmonic_dbc"][0]) for m in metrics_list if len(m["harmonic_dbc"]) > 0],
+        default=0,
+    )
+    with open(filepath, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(
+            [
+                "title",
+                "tone_freq",
+                "tone_db",
+                "tone_thd_db",
+                "imd2_db",
+                "imd3_db",
+                "tdn_db",
+            ]
+            + [f"h{order}_dbc" for order in range(2, n_harmonics + 2)]
+        )
+        for m in metrics_list:
+            for idx, tone_freq in enumerate(m["tone_freq"]):
+                writer.writerow(
+                    [
+                        m["title"],
+                        tone_freq,
+                        m["tone_db"][idx],
+                        m["tone_thd_db"][idx],
+                        m["imd2_db"],
+                        m["imd3_db"],
+                        m["tdn_db"],
+                    ]
+                    + m["harmonic_dbc"][idx]
+                )
+
+
+def write_two_tone_metrics(
+    filepath: str, metrics_list: list[intermodulation.TwoToneMetrics]
+):
+    """Writes two-tone metrics as CSV, one row per plugin and standard."""
+    columns = [
+        "title",
+        "standard",
+        "low_freq",
+        "high_freq",
+        "imd",
+        "imd_db",
+        "imd2_db",
+        "imd3_db",
+    ]
+    with open(filepath, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for m in metrics_list:
+            writer.writerow([m[column] for column in columns])
+
+
+def main():
+    os.makedirs(CONFIG["output_dir"], exist_ok=True)
+
+    p = printer.printer(CONFIG["output_dir"])
+    for key, value in CONFIG.items():
+        p.print_message(f"{key}: {value}")
+
+    load_dirs = {
+        test: directory
+        for test, directory in CONFIG["load_dirs"].items()
+        if directory is not None
+    }
+    with p.span("list"):
+        p.print_message("Scanning renders...")
+        _catalog = catalog.catalog(CONFIG["catalog_path"])
+        entries = _catalog.scan(load_dirs)
+        _catalog.save()
+        valid = []
+        for entry in entries:
+            problem = catalog.entry_problem(
+                entry, None if CONFIG["resample"] else CONFIG["sample_rate"]
+            )
+            if problem is not None:
+                p.print_message(problem)
+                continue
+            valid.append(entry)
+        n_problems = len(entries) - len(valid)
+        assert n_problems == 0, f"{n_problems} problems found, see above"
+
+    _io = io.io()
+    _cache = (
+        cache.cache(CONFIG["cache_dir"], CONFIG["cache_max_bytes"])
+        if CONFIG["cache_dir"] is not None
+        else None
+    )
+    multitone_list, two_tone_list = [], []
+    for test in load_dirs:
+        test_entries = [entry for entry in valid if entry["test"] == test]
+        with p.span(test):
+            p.print_message(f"Analyzing {len(test_entries)} {test} renders...")
+            metrics_list = analyze_renders(p, _io, _cache, test, test_entries)
+        if test == "multitone":
+            multitone_list += metrics_list
+            for m in metrics_list:
+                p.print_message(
+                    f"{m['title']}: IMD2 {m['imd2_db']:.2f} dB, IMD3 {m['imd3_db']:.2f} dB, TD+N {m['tdn_db']:.2f} dB"
+                )
+        else:
+            two_tone_list += metrics_list
+            for m in metrics_list:
+                p.print_message(
+                    f"{m['title']}: {m['standard']} IMD {m['imd_db']:.2f} dB ({100 * m['imd']:.6f} %)"
+                )
+    if _cache is not None:
+        _cache.flush()
+
+    with p.span("write metrics"):
+        if len(multitone_list) > 0:
+            write_multitone_metrics(
+                os.path.join(CONFIG["output_dir"], "multitone_metrics.csv"),
+                multitone_list,
+            )
+        if len(two_tone_list) > 0:
+            write_two_tone_metrics(
+                os.path.join(CONFIG["output_dir"], "two_tone_metrics.csv"),
+                two_tone_list,
+            )
+
+    p.print_message("Done!")
+    p.summary()
+    p.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,57 +1,245 @@
 import module.printer as printer
 import module.plotter as plotter
 import module.io as io
+import module.precision as precision
+import module.generator as generator
+import module.deconvolution as deconvolution
+import module.catalog as catalog
+import module.watch as watch
+import module.resample as resample
+from matplotlib import pyplot as plt
+import numpy as np
 import time
 import os
-import numpy as np
 
 CONFIG = {
     "sample_rate": 48000,
+    # sweeps at other rates are plotted at their own rate and resampled to sample_rate for the deconvolution, False reports them as problems
+    "resample": False,
     "load_dir_sweep": "./effected/sweep",
+    # shared with analyze.py, see catalog.catalog
+    "catalog_path": "./data/catalog.json",
+    # "float32", "float64" or "longdouble"
+    "precision": "float64",
+    "workers": os.cpu_count(),
+    # deconvolve each render into linear and harmonic impulse responses (Farina method).
+    # needs a logarithmic sweep, and the sweep settings used in gen_signals.py
+    "deconvolve": False,
+    "sweep_length": 2**22,
+    "sweep_start_freq": 1,
+    "sweep_end_freq": 23000,
+    "sweep_amplitude_dBFS": -6,
+    "n_harmonics": 5,
+    "ir_length": 2**14,
+    # keep running and analyze sweeps as they arrive or change, until interrupted
+    "watch": False,
+    # seconds between scans in watch mode, a render is analyzed once it is unchanged for one interval
+    "watch_interval": 5,
     "output_dir": os.path.join("output_analyze_sweep", time.strftime("%Y%m%d-%H%M%S")),
 }
 
 
-def main():
-    os.makedirs(CONFIG["output_dir"], exist_ok=True)
-
-    p = printer.printer(CONFIG["output_dir"])
-    for key, value in CONFIG.items():
-        p.print_message(f"{key}: {value}")
-
-    p.print_message("Loading sweep...")
-    _io = io.io()
-    audio_path_list = []
-    for root, _, files in os.walk(CONFIG["load_dir_sweep"]):
-        for file in files:
-            if os.path.splitext(file)[1] == ".wav":
-                audio_path_list.append(os.path.join(root, file))
-    audio_path_list = sorted(audio_path_list)
-    p.print_message(f"audio_path_list: {audio_path_list}")
+def sweep_dicts(
+    p: printer.printer, entries: list[catalog.CatalogEntry]
+) -> list[plotter.AnalyzeSweepDict]:
+    """Returns the valid sweeps of catalog entries and reports the others."""
     wave_dict_list: list[plotter.AnalyzeSweepDict] = []
-    for audio_path in audio_path_list:
-        sample_rate, audio_data = _io.load_wav_as_mono(audio_path)
-        assert (
-            sample_rate == CONFIG["sample_rate"]
-        ), f"sample rate mismatch: {sample_rate}"
+    for entry in entries:
+        # only the headers are read here, the spectrogram streams the files
+        problem = catalog.entry_problem(
+            entry, None if CONFIG["resample"] else CONFIG["sample_rate"]
+        )
+        if problem is not None:
+            p.print_message(problem)
+            continue
         wave_dict_list.append(
             {
-                "sweep": audio_data,
-                "title": os.path.splitext(os.path.basename(audio_path))[0],
+                "sweep": entry["path"],
+                "title": entry["title"],
+                "sample_rate": entry["info"]["sample_rate"],
             }
         )
+    return wave_dict_list
+
+
+def plot_spectrograms(
+    p: printer.printer,
+    plot: plotter.plotter,
+    wave_dict_list: list[plotter.AnalyzeSweepDict],
+):
+    """Plots the spectrogram of each sweep."""
+    for analyze_sweep_dict in wave_dict_list:
+        with p.span(analyze_sweep_dict["title"]):
+            plot.plot_mono_audio_spectrogram(
+                analyze_sweep_dict["sweep"],
+                analyze_sweep_dict["sample_rate"],
+                False,
+                f"[{analyze_sweep_dict['title']}] ",
+                workers=CONFIG["workers"],
+                dtype=precision.real_dtype(CONFIG["precision"]),
+            )
+            # watch mode plots again on every change
+            plt.close("all")
+
+
+def make_deconvolver() -> deconvolution.deconvolver:
+    """Returns the deconvolver of the sweep of CONFIG."""
+    gen = generator.generator(
+        CONFIG["sample_rate"], CONFIG["output_dir"], CONFIG["precision"]
+    )
+    return deconvolution.deconvolver(
+        gen.sweep_up(
+            CONFIG["sweep_length"],
+            CONFIG["sweep_start_freq"],
+            CONFIG["sweep_end_freq"],
+            CONFIG["sweep_amplitude_dBFS"],
+        ),
+        gen.inverse_sweep_up(
+            CONFIG["sweep_length"],
+            CONFIG["sweep_start_freq"],
+            CONFIG["sweep_end_freq"],
+        ),
+        CONFIG["sample_rate"],
+        CONFIG["sweep_start_freq"],
+        CONFIG["sweep_end_freq"],
+    )
+
+
+def deconvolve_sweeps(
+    _io: io.io,
+    _deconvolver: deconvolution.deconvolver,
+    wave_dict_list: list[plotter.AnalyzeSweepDict],
+) -> dict[str, list[deconvolution.HarmonicResponse]]:
+    """
+    Separates each sweep into its harmonic responses and saves them as npz.
 
-    p.print_message("Plotting result...")
-    plot = plotter.plotter(CONFIG["output_dir"])
+    Returns
+    -------
+    dict[str, list[deconvolution.HarmonicResponse]]
+        The responses of each sweep, by title.
+    """
+    responses_dict = {}
     for analyze_sweep_dict in wave_dict_list:
-        plot.plot_mono_audio_spectrogram(
+        sample_rate, audio_data = _io.load_wav_as_mono(
             analyze_sweep_dict["sweep"],
-            CONFIG["sample_rate"],
-            False,
-            f"[{analyze_sweep_dict['title']}] ",
+            precision.real_dtype(CONFIG["precision"]),
         )
+        if sample_rate != CONFIG["sample_rate"]:
+            audio_data = resample.resample(
+                audio_data, sample_rate, CONFIG["sample_rate"]
+            ).astype(audio_data.dtype)
+        responses = _deconvolver.separate(
+            audio_data, CONFIG["n_harmonics"], CONFIG["ir_length"]
+        )
+        np.savez(
+            os.path.join(
+                CONFIG["output_dir"],
+                f"[{analyze_sweep_dict['title']}] deconvolution.npz",
+            ),
+            **{
+                f"h{response['order']}_impulse_response": response["impulse_response"]
+                for response in responses
+            },
+            **{
+                f"h{response['order']}_spectrum": response["spectrum"].values
+                for response in responses
+            },
+        )
+        responses_dict[analyze_sweep_dict["title"]] = responses
+    return responses_dict
+
+
+def plot_deconvolution(
+    plot: plotter.plotter,
+    responses_dict: dict[str, list[deconvolution.HarmonicResponse]],
+):
+    """Plots the harmonic responses of all sweeps, in title order."""
+    if len(responses_dict) == 0:
+        return
+    deconvolution_dict_list: list[plotter.SweepDeconvolutionDict] = [
+        {"title": title, "responses": responses_dict[title]}
+        for title in sorted(responses_dict)
+    ]
+    plot.plot_sweep_deconvolution(deconvolution_dict_list, CONFIG["sample_rate"])
+    plt.close("all")
+
+
+def main():
+    os.makedirs(CONFIG["output_dir"], exist_ok=True)
+
+    p = printer.printer(CONFIG["output_dir"])
+    for key, value in CONFIG.items():
+        p.print_message(f"{key}: {value}")
+
+    with p.span("list"):
+        p.print_message("Scanning sweep...")
+        _io = io.io()
+        _catalog = catalog.catalog(CONFIG["catalog_path"])
+        entries = _catalog.scan({"sweep": CONFIG["load_dir_sweep"]})
+        _catalog.save()
+        p.print_message(f"audio_path_list: {[entry['path'] for entry in entries]}")
+        wave_dict_list = sweep_dicts(p, entries)
+        # in watch mode invalid sweeps are expected, they may still be written
+        n_problems = len(entries) - len(wave_dict_list)
+        assert (
+            n_problems == 0 or CONFIG["watch"]
+        ), f"{n_problems} problems found, see above"
+
+    with p.span("spectrogram"):
+        p.print_message("Plotting result...")
+        plot = plotter.plotter(CONFIG["output_dir"])
+        plot_spectrograms(p, plot, wave_dict_list)
+
+    responses_dict = {}
+    if CONFIG["deconvolve"]:
+        with p.span("deconvolve"):
+            p.print_message("Deconvolving sweep...")
+            _deconvolver = make_deconvolver()
+            responses_dict = deconvolve_sweeps(_io, _deconvolver, wave_dict_list)
+            plot_deconvolution(plot, responses_dict)
+
+    if CONFIG["watch"]:
+        # the deconvolver, imports and FFT plans stay warm between updates
+        _watcher = watch.watcher(_catalog, {"sweep": CONFIG["load_dir_sweep"]})
+        _watcher.mark_seen(entries)
+        p.print_message(f"Watching for sweeps every {CONFIG['watch_interval']} s...")
+        try:
+            while True:
+                time.sleep(CONFIG["watch_interval"])
+                _, changed, removed = _watcher.poll()
+                if len(changed) == 0 and len(removed) == 0:
+                    continue
+                with p.span("update"):
+                    for path in removed:
+                        p.print_message(f"removed: {path}")
+                    for entry in changed:
+                        p.print_message(f"changed: {entry['path']}")
+                    wave_dict_list = sweep_dicts(p, changed)
+                    plot_spectrograms(p, plot, wave_dict_list)
+                    if CONFIG["deconvolve"]:
+                        removed_titles = set(
+                            os.path.splitext(os.path.basename(path))[0]
+                            for path in removed
+                        )
+                        # a changed sweep that is no longer valid loses its old responses too
+                        changed_titles = set(entry["title"] for entry in changed)
+                        valid_titles = set(
+                            wave_dict["title"] for wave_dict in wave_dict_list
+                        )
+                        stale_titles = removed_titles | (changed_titles - valid_titles)
+                        for title in stale_titles & set(responses_dict):
+                            del responses_dict[title]
+                        responses_dict |= deconvolve_sweeps(
+                            _io, _deconvolver, wave_dict_list
+                        )
+                        plot_deconvolution(plot, responses_dict)
+                p.flush()
+        except KeyboardInterrupt:
+            p.print_message("Stopped watching.")
 
     p.print_message("Done!")
+    p.summary()
+    p.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,81 @@
+import module.printer as printer
+import module.windows as windows
+import gen_signals
+import scipy.signal.windows as scipy_windows
+import numpy as np
+import csv
+import os
+import time
+
+CONFIG = {
+    # the length of the windowed signal, std values below are in its samples
+    "signal_length": gen_signals.CONFIG["signal_length"],
+    "gaussian_stds": [100000, 150000, 200000, 250000, 300000],
+    "kaiser_betas": [20, 25, 30, 35, 40, 50],
+    "chebyshev_attenuations": [200, 250, 300],
+    # each kaiser beta is also tried multiplied with a Nuttall window
+    "nuttall_kaiser_betas": [10, 20, 30],
+    "floor_db": -200,
+    "eval_length": 2**12,
+    "oversample": 16,
+    "output_dir": os.path.join("output_windows", time.strftime("%Y%m%d-%H%M%S")),
+}
+
+
+def main():
+    os.makedirs(CONFIG["output_dir"], exist_ok=True)
+
+    p = printer.printer(CONFIG["output_dir"])
+
+    for key, value in CONFIG.items():
+        p.print_message(f"{key}: {value}")
+
+    nuttall: windows.WindowCandidate = {
+        "title": "nuttall",
+        "window": lambda M: scipy_windows.nuttall(M).astype(np.longdouble),
+    }
+    candidates = (
+        windows.gaussian_candidates(CONFIG["gaussian_stds"], CONFIG["signal_length"])
+        + windows.kaiser_candidates(CONFIG["kaiser_betas"])
+        + windows.chebyshev_candidates(CONFIG["chebyshev_attenuations"])
+        + [
+            windows.product_candidate(nuttall, kaiser)
+            for kaiser in windows.kaiser_candidates(CONFIG["nuttall_kaiser_betas"])
+        ]
+    )
+
+    p.print_message(f"Evaluating {len(candidates)} windows...")
+    design_list = windows.evaluate_windows(
+        candidates,
+        floor_db=CONFIG["floor_db"],
+        eval_length=CONFIG["eval_length"],
+        oversample=CONFIG["oversample"],
+    )
+    # narrowest skirt down to the floor first, that is what bounds the harmonic bins
+    design_list.sort(key=lambda d: (d["floor_half_width"], d["mainlobe_half_width"]))
+
+    p.print_message("Writing result...")
+    columns = [
+        "title",
+        "mainlobe_half_width",
+        "sidelobe_db",
+        "leakage_floor_db",
+        "floor_half_width",
+    ]
+    with open(
+        os.path.join(CONFIG["output_dir"], "window_design.csv"), "w", newline=""
+    ) as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for d in design_list:
+            writer.writerow([d[column] for column in columns])
+    for d in design_list:
+        p.print_message(
+            f"{d['title']}: main lobe {d['mainlobe_half_width']:.2f} bins, sidelobe {d['sidelobe_db']:.1f} dB, leakage floor {d['leakage_floor_db']:.1f} dB, below {CONFIG['floor_db']} dB after {d['floor_half_width']:.2f} bins"
+        )
+
+    p.print_message("Done!")
+
+
+if __name__ == "__main__":
+    main()
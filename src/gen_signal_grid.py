@@ -0,0 +1,103 @@
+import module.printer as printer
+import module.signal_grid as signal_grid
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+import time
+
+CONFIG = {
+    "sample_rate": 48000,
+    "signal_length": 2**22,
+    "sine_wave_freqs": [50, 100, 200, 500, 1000, 2000, 5000, 10000],
+    "sine_wave_amplitudes_dBFS": [-48, -36, -24, -18, -12, -6, -3, 0],
+    # standard deviations of the Gaussian window in samples, None for no window
+    "sine_wave_window_stds": [200000],
+    "sweep_start_freq": 1,
+    "sweep_end_freq": 23000,
+    "sweep_amplitudes_dBFS": [-24, -12, -6],
+    "sweep_log_scales": [True],
+    # "float32", "float64" or "longdouble"
+    "precision": "longdouble",
+    "block_size": 2**16,
+    # generated signals are kept here by parameters and reused by later runs
+    "cache_dir": "./cache_signals",
+    "workers": os.cpu_count(),
+    "output_dir": os.path.join("output_signal_grid", time.strftime("%Y%m%d-%H%M%S")),
+}
+
+
+def main():
+    os.makedirs(CONFIG["output_dir"], exist_ok=True)
+    os.makedirs(CONFIG["cache_dir"], exist_ok=True)
+
+    p = printer.printer(CONFIG["output_dir"])
+
+    for key, value in CONFIG.items():
+        p.print_message(f"{key}: {value}")
+
+    spec_list = (
+        [signal_grid.impulse_spec(CONFIG["signal_length"])]
+        + signal_grid.sine_grid(
+            CONFIG["signal_length"],
+            CONFIG["sine_wave_freqs"],
+            CONFIG["sine_wave_amplitudes_dBFS"],
+            CONFIG["sine_wave_window_stds"],
+        )
+        + signal_grid.sweep_grid(
+            CONFIG["signal_length"],
+            CONFIG["sweep_start_freq"],
+            CONFIG["sweep_end_freq"],
+            CONFIG["sweep_amplitudes_dBFS"],
+            CONFIG["sweep_log_scales"],
+        )
+    )
+    settings: signal_grid.GridSettings = {
+        "sample_rate": CONFIG["sample_rate"],
+        "precision": CONFIG["precision"],
+        "block_size": CONFIG["block_size"],
+        "cache_dir": CONFIG["cache_dir"],
+    }
+
+    p.print_message(f"Generating {len(spec_list)} signals...")
+    workers = max(1, min(CONFIG["workers"] or 1, len(spec_list)))
+    if workers == 1:
+        entry_list = [signal_grid.generate_signal(spec, settings) for spec in spec_list]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            entry_list = list(
+                executor.map(
+                    signal_grid.generate_signal,
+                    spec_list,
+                    [settings] * len(spec_list),
+                )
+            )
+    p.print_message(
+        f"generated: {sum(not entry['cached'] for entry in entry_list)}, reused: {sum(entry['cached'] for entry in entry_list)}"
+    )
+
+    p.print_message("Writing manifest...")
+    manifest = []
+    for entry in entry_list:
+        manifest.append(
+            {
+                **entry,
+                "path": signal_grid.link_signal(entry, CONFIG["output_dir"]),
+                "cache_path": entry["path"],
+            }
+        )
+    with open(os.path.join(CONFIG["output_dir"], "manifest.json"), "w") as f:
+        json.dump(
+            {
+                "sample_rate": CONFIG["sample_rate"],
+                "precision": CONFIG["precision"],
+                "signals": manifest,
+            },
+            f,
+            indent=2,
+        )
+
+    p.print_message("Done!")
+
+
+if __name__ == "__main__":
+    main()
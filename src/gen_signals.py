@@ -1,10 +1,11 @@
 import module.generator as generator
 import module.printer as printer
-import module.plotter as plotter
 import os
 import time
 import module.windows as windows
-from scipy.signal import windows as scipy_windows
+import module.precision as precision
+import module.metrics as metrics
+import numpy as np
 
 
 CONFIG = {
@@ -17,10 +18,93 @@ CONFIG = {
     "sweep_is_log_scale": False,
     "sweep_amplitude_dBFS": -6,
     "should_apply_window_to_sine_wave": True,
+    "sine_wave_window_std": 200000,
+    # the multitone and two-tone signals get the sine wave window too
+    "multitone_n_tones": 20,
+    "multitone_low_freq": 20,
+    "multitone_high_freq": 20000,
+    # tones, harmonics and intermodulation products lie on this grid without sharing a point
+    "multitone_resolution": 1,
+    "multitone_n_orders": 3,
+    "multitone_amplitude_dBFS": -6,
+    # see generator.IMD_STANDARDS
+    "two_tone_standards": ["smpte", "ccif"],
+    "two_tone_amplitude_dBFS": -6,
+    # "float32", "float64" or "longdouble"
+    "precision": "longdouble",
+    # signals are generated and written this many samples at a time
+    "block_size": 2**16,
     "output_dir": os.path.join("output_signals", time.strftime("%Y%m%d-%H%M%S")),
 }
 
 
+def sine_wave_window(config: dict):
+    """
+    Returns the window applied to the sine wave, or None if it is not windowed.
+
+    analyze.py rebuilds it from gen_signals.CONFIG to know how far the test
+    tone spreads in the spectrum. Other windows can be compared with
+    explore_windows.py.
+    """
+    if not config["should_apply_window_to_sine_wave"]:
+        return None
+    return windows.gaussian_longdouble(
+        config["signal_length"],
+        config["sine_wave_window_std"],
+        dtype=precision.real_dtype(config["precision"]),
+    )
+
+
+def sine_wave_half_width(config: dict, fft_size: int, floor_db: float = -200) -> int:
+    """
+    Returns `metrics.window_half_width` of `sine_wave_window` at `fft_size`.
+
+    The spectrum of the Gaussian falls as `exp(-2 (pi std f) ** 2)`, so the
+    bin where it reaches `floor_db` is found without building the window.
+    Only a window cut off above `floor_db` is transformed. Change this
+    together with `sine_wave_window`.
+    """
+    if not config["should_apply_window_to_sine_wave"]:
+        return fft_size // 2
+    std = config["sine_wave_window_std"]
+    edge_db = -20 * np.log10(np.e) * (config["signal_length"] / 2) ** 2 / (2 * std**2)
+    if edge_db > floor_db:
+        return metrics.window_half_width(sine_wave_window(config), fft_size, floor_db)
+    half_width = fft_size / (np.pi * std) * np.sqrt(-floor_db * np.log(10) / 40)
+    return min(int(np.ceil(half_width)), fft_size // 2)
+
+
+def sine_wave_window_segment(config: dict):
+    """
+    Returns the block-wise form of `sine_wave_window`, or None if it is not windowed.
+    """
+    if not config["should_apply_window_to_sine_wave"]:
+        return None
+    return lambda start, stop: windows.gaussian_segment_longdouble(
+        config["signal_length"],
+        config["sine_wave_window_std"],
+        start,
+        stop,
+        dtype=precision.real_dtype(config["precision"]),
+    )
+
+
+def multitone_frequencies(config: dict):
+    """
+    Returns the tone frequencies of the multitone signal.
+
+    analyze_multitone.py rebuilds them from gen_signals.CONFIG to know which
+    bins hold the tones and their products.
+    """
+    return generator.multitone_frequencies(
+        config["multitone_low_freq"],
+        config["multitone_high_freq"],
+        config["multitone_n_tones"],
+        config["multitone_resolution"],
+        config["multitone_n_orders"],
+    )
+
+
 def main():
     os.makedirs(CONFIG["output_dir"], exist_ok=True)
 
@@ -29,46 +113,77 @@ def main():
     for key, value in CONFIG.items():
         p.print_message(f"{key}: {value}")
 
-    gen = generator.generator(CONFIG["sample_rate"], CONFIG["output_dir"])
-
-    p.print_message("Generating impulse...")
-    gen.generate_impulse(CONFIG["signal_length"])
-
-    p.print_message("Generating sine wave...")
-    _, window = gen.generate_sine_wave(
-        CONFIG["sine_wave_freq"],
-        CONFIG["signal_length"],
-        CONFIG["sine_wave_amplitude_dBFS"],
-        window=(
-            windows.gaussian_longdouble(CONFIG["signal_length"], 200000)
-            # scipy_windows.nuttall(CONFIG["signal_length"])
-            # * scipy_windows.kaiser(CONFIG["signal_length"], 20)
-            # scipy_windows.chebwin(CONFIG["signal_length"], 400)
-            if CONFIG["should_apply_window_to_sine_wave"]
-            else None
-        ),
+    gen = generator.generator(
+        CONFIG["sample_rate"], CONFIG["output_dir"], CONFIG["precision"]
     )
 
-    if CONFIG["should_apply_window_to_sine_wave"]:
-        p.print_message("Plotting window...")
-        plot = plotter.plotter(CONFIG["output_dir"])
-        plot.plot_window(
-            [{"title": "default window", "window": window}], CONFIG["sample_rate"]
+    with p.span("impulse"):
+        p.print_message("Generating impulse...")
+        gen.stream_impulse(CONFIG["signal_length"], CONFIG["block_size"])
+
+    with p.span("sine wave"):
+        p.print_message("Generating sine wave...")
+        gen.stream_sine_wave(
+            CONFIG["sine_wave_freq"],
+            CONFIG["signal_length"],
+            CONFIG["sine_wave_amplitude_dBFS"],
+            window=sine_wave_window_segment(CONFIG),
+            block_size=CONFIG["block_size"],
         )
-        plot.plot_window_spectrum(
-            [{"title": "default window", "window": window}], CONFIG["sample_rate"]
+
+    with p.span("multitone"):
+        p.print_message("Generating multitone...")
+        frequencies = multitone_frequencies(CONFIG)
+        p.print_message(f"multitone frequencies: {frequencies.tolist()}")
+        gen.stream_multitone(
+            frequencies,
+            CONFIG["signal_length"],
+            CONFIG["multitone_amplitude_dBFS"],
+            window=sine_wave_window_segment(CONFIG),
+            block_size=CONFIG["block_size"],
         )
 
-    p.print_message("Generating sweep...")
-    gen.generate_sweep_up(
-        CONFIG["signal_length"],
-        CONFIG["sweep_start_freq"],
-        CONFIG["sweep_end_freq"],
-        CONFIG["sweep_amplitude_dBFS"],
-        log_scale=CONFIG["sweep_is_log_scale"],
-    )
+    with p.span("two-tone"):
+        for standard in CONFIG["two_tone_standards"]:
+            p.print_message(f"Generating {standard} two-tone...")
+            gen.stream_two_tone(
+                standard,
+                CONFIG["signal_length"],
+                CONFIG["two_tone_amplitude_dBFS"],
+                window=sine_wave_window_segment(CONFIG),
+                block_size=CONFIG["block_size"],
+            )
+
+    if CONFIG["should_apply_window_to_sine_wave"]:
+        with p.span("plot window"):
+            p.print_message("Plotting window...")
+            # the only full-length array, the signals themselves are streamed
+            window = sine_wave_window(CONFIG)
+            # imported here so that analyze.py can read CONFIG without loading matplotlib
+            import module.plotter as plotter
+
+            plot = plotter.plotter(CONFIG["output_dir"])
+            plot.plot_window(
+                [{"title": "default window", "window": window}], CONFIG["sample_rate"]
+            )
+            plot.plot_window_spectrum(
+                [{"title": "default window", "window": window}], CONFIG["sample_rate"]
+            )
+
+    with p.span("sweep"):
+        p.print_message("Generating sweep...")
+        gen.stream_sweep_up(
+            CONFIG["signal_length"],
+            CONFIG["sweep_start_freq"],
+            CONFIG["sweep_end_freq"],
+            CONFIG["sweep_amplitude_dBFS"],
+            log_scale=CONFIG["sweep_is_log_scale"],
+            block_size=CONFIG["block_size"],
+        )
 
     p.print_message("Done!")
+    p.summary()
+    p.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,1014 @@
+from contextlib import nullcontext
+from typing import NotRequired, TypedDict
+import numpy as np
+import module.io as io
+import module.cache as cache
+import module.precision as precision
+import module.spectrum as spectrum
+import module.decimate as decimate
+import module.metrics as metrics
+import module.export as export
+import module.printer as printer
+import module.resample as resample
+import module.latency as latency
+import module.generator as generator
+
+
+class AnalyzeDict(TypedDict):
+    impulse: np.ndarray
+    sine_wave: np.ndarray
+    title: str
+    impulse_spectrum: NotRequired[spectrum.spectrum]
+    sine_wave_spectrum: NotRequired[spectrum.spectrum]
+    # in samples, already added to the delay of impulse_spectrum
+    latency: NotRequired[float]
+
+
+class AnalysisTraces(TypedDict):
+    title: str
+    latency: float
+    impulse_zoom_index: np.ndarray
+    impulse_zoom: np.ndarray
+    impulse_zoom_limit: float
+    magnitude_freq: np.ndarray
+    magnitude_db: np.ndarray
+    phase_freq: np.ndarray
+    phase: np.ndarray
+    distortion_freq: np.ndarray
+    distortion_db: np.ndarray
+    zoom_freq: np.ndarray
+    zoom_magnitude_db: np.ndarray
+
+
+class AnalysisSettings(TypedDict):
+    sample_rate: int
+    fft_size: int
+    precision: str
+    distortion_precision: str
+    zoom: int
+    important_freq: float
+    cache_dir: str | None
+    cache_max_bytes: int
+    fft_workers: int | None
+    sine_wave_freq: float
+    n_harmonics: int
+    half_width: int
+    # of each harmonic order under the test tone window, see metrics.window_order_gain
+    order_gain: list[float]
+    plot: bool
+    export_n_freq: int
+    zoom_points: int
+    harmonic_points: int
+    trace_memory: bool
+    memory_budget: int | None
+    channels: str
+    # rows this far below the loudest row of their render are left out, see audible_rows
+    channel_floor_db: float
+    resample: bool
+    detect_latency: bool
+    signal_length: int
+
+
+# "first" analyzes channel 0 only, "all" every channel, "mid_side" also mid and side of stereo renders
+CHANNEL_MODES = ("first", "all", "mid_side")
+
+
+def channel_labels(n_channels: int, channels: str) -> list[str]:
+    """
+    Returns the label of each analyzed row of a render.
+
+    Parameters
+    ----------
+    n_channels : int
+        The number of channels of the render.
+    channels : str
+        One of `CHANNEL_MODES`.
+
+    Returns
+    -------
+    list[str]
+        "" for a mono render or with "first", so titles stay unchanged.
+        Otherwise "L" and "R" (and "M" and "S" with "mid_side") for stereo
+        renders, and "ch1", "ch2", ... for more channels.
+    """
+    assert channels in CHANNEL_MODES, f"unknown channel mode: {channels}"
+    if n_channels == 1 or channels == "first":
+        return [""]
+    if n_channels != 2:
+        return [f"ch{idx + 1}" for idx in range(n_channels)]
+    return ["L", "R"] + (["M", "S"] if channels == "mid_side" else [])
+
+
+def audible_rows(rows: np.ndarray, floor_db: float) -> list[bool]:
+    """
+    Returns which rows of a render to analyze.
+
+    The rows of a render share one normalization, see `load_renders`, so a
+    row far below the loudest, e.g. the side of a near-mono plugin at
+    rounding-noise level, is left out instead of being analyzed as a plugin
+    of its own.
+
+    Parameters
+    ----------
+    rows : np.ndarray
+        The `(n_rows, length)` rows of one render.
+    floor_db : float
+        The level below the loudest row's peak at which a row is left out.
+        Silent rows are always left out.
+
+    Returns
+    -------
+    list[bool]
+        Whether each row is analyzed.
+    """
+    peaks = np.max(np.abs(rows), axis=-1).astype(np.float64)
+    threshold = peaks.max() * 10 ** (floor_db / 20)
+    return [bool(peak > 0 and peak >= threshold) for peak in peaks]
+
+
+def length_groups(lengths: list[int]) -> list[tuple[int, list[int]]]:
+    """
+    Groups items by FFT length, for the batched transforms and the index
+    tables, which all need one length.
+
+    Parameters
+    ----------
+    lengths : list[int]
+        The FFT length of each item, e.g. `spectrum.length`. Renders longer
+        than fft_size get longer ones.
+
+    Returns
+    -------
+    list[tuple[int, list[int]]]
+        Each length, ascending, with the positions of its items in `lengths`.
+    """
+    return [
+        (
+            length,
+            [idx for idx, item_length in enumerate(lengths) if item_length == length],
+        )
+        for length in sorted(set(lengths))
+    ]
+
+
+def resampled_length(info: io.WavInfo, sample_rate: int) -> int:
+    """Returns the number of frames of a render at `sample_rate`, see `resample.resample`."""
+    return resample.resampled_length(info["frames"], info["sample_rate"], sample_rate)
+
+
+def _read_render(
+    _io: io.io,
+    audio_path: str,
+    info: io.WavInfo,
+    rate: int,
+    labels: list[str],
+    dtype: np.dtype,
+    rows: np.ndarray,
+):
+    # reads one render into its zeroed rows, adds mid and side and normalizes
+    # them all by one peak, so the levels of the rows relative to each other stay
+    n_channels = 1 if labels == [""] else info["channels"]
+    if info["sample_rate"] == rate:
+        _io.load_wav(
+            audio_path,
+            channel=0 if n_channels == 1 else None,
+            dtype=dtype,
+            out=rows[0] if n_channels == 1 else rows[:n_channels],
+        )
+    else:
+        _, audio_data = _io.load_wav(
+            audio_path,
+            channel=0 if n_channels == 1 else None,
+            dtype=np.float64,
+        )
+        audio_data = resample.resample(audio_data, info["sample_rate"], rate)
+        rows[:n_channels, : audio_data.shape[-1]] = audio_data
+        del audio_data
+    if "M" in labels:
+        np.add(rows[0], rows[1], out=rows[2])
+        np.subtract(rows[0], rows[1], out=rows[3])
+        rows[2:4] /= 2
+    # mid and side never exceed the louder of left and right
+    peak = np.max(np.abs(rows))
+    if peak > 0:
+        rows /= peak
+
+
+def load_renders(
+    _io: io.io,
+    audio_path_list: list[str],
+    dtype: np.dtype,
+    fft_size: int,
+    _cache: cache.cache | None = None,
+    workers: int | None = None,
+    _recorder: printer.recorder | None = None,
+    channels: str = "first",
+    sample_rate: int | None = None,
+):
+    """
+    Loads renders with all rows of each normalized to one peak and computes their spectra.
+
+    Renders that are not cached are read straight into the rows of a
+    preallocated `(n_rows, length)` array, one row per channel (and mid and
+    side, see `channel_labels`), and the rows of all renders with the same
+    FFT length are transformed together with one batched real FFT along the
+    last axis.
+
+    Parameters
+    ----------
+    _io : io.io
+        The loader.
+    audio_path_list : list[str]
+        The paths to the renders.
+    dtype : np.dtype
+        The dtype to load and transform in.
+    fft_size : int
+        The minimum FFT length. Shorter renders are zero-padded at the end,
+        longer ones are transformed at their own (even) length.
+    _cache : cache.cache, optional
+        If given, the normalized renders and their spectra are served from
+        and stored to it.
+    workers : int, optional
+        The number of workers for the batched FFT.
+    _recorder : printer.recorder, optional
+        If given, the cache lookup, reading, FFT and cache store are
+        recorded as spans.
+    channels : str, optional
+        The rows of each render, one of `CHANNEL_MODES`.
+    sample_rate : int, optional
+        If given, renders at other rates are resampled to it, see
+        `resample.resample`. The cache keeps them per target rate.
+
+    Returns
+    -------
+    list[tuple]
+        For each render, a tuple containing the sample rate (int), the label
+        of each row (list[str]), the normalized rows (np.ndarray,
+        `(n_rows, length)`) and the spectrum of each row
+        (list[spectrum.spectrum]).
+    """
+    span = _recorder.span if _recorder is not None else lambda name: nullcontext()
+    results = [None] * len(audio_path_list)
+    keys = [None] * len(audio_path_list)
+    missing = []
+    with span("cache load"):
+        for idx, audio_path in enumerate(audio_path_list):
+            if _cache is None:
+                missing.append(idx)
+                continue
+            keys[idx] = _cache.key(
+                audio_path,
+                {
+                    "fft_size": fft_size,
+                    "dtype": np.dtype(dtype).name,
+                    "normalize": "render_peak",
+                    # entries of older versions were padded to the longest render of their batch
+                    "padding": "own",
+                    "channels": channels,
+                    "sample_rate": sample_rate,
+                },
+            )
+            cached = _cache.load(keys[idx])
+            if cached is None:
+                missing.append(idx)
+                continue
+            arrays, meta = cached
+            results[idx] = (
+                meta["sample_rate"],
+                meta["labels"],
+                arrays["signal"],
+                [
+                    spectrum.spectrum(
+                        values, meta["length"], meta["sample_rate"], meta["delay"]
+                    )
+                    for values in arrays["spectrum"]
+                ],
+            )
+    if len(missing) == 0:
+        return results
+
+    with span("read"):
+        infos = [_io.read_wav_info(audio_path_list[idx]) for idx in missing]
+        rates = [
+            info["sample_rate"] if sample_rate is None else sample_rate
+            for info in infos
+        ]
+        # odd renders are padded to even length, as in load_wav_as_mono
+        frames = [
+            resampled_length(info, rate) + resampled_length(info, rate) % 2
+            for info, rate in zip(infos, rates)
+        ]
+        labels = [channel_labels(info["channels"], channels) for info in infos]
+        assert (
+            len(set(rates)) == 1
+        ), f"sample rate mismatch: {dict(zip([audio_path_list[idx] for idx in missing], rates))}"
+        # the center of the render, where the impulse is, moves with the resampling
+        delays = [
+            (info["frames"] + info["frames"] % 2) // 2 * rate / info["sample_rate"]
+            for info, rate in zip(infos, rates)
+        ]
+    # each render is padded to its own FFT length, so its spectrum does not
+    # depend on the other renders of the batch; renders of one length are
+    # transformed together
+    for length, group in length_groups(
+        [max(fft_size, render_frames) for render_frames in frames]
+    ):
+        with span("read"):
+            offsets = np.cumsum([0] + [len(labels[row]) for row in group])
+            batch = np.zeros((offsets[-1], length), dtype=dtype)
+            for position, row in enumerate(group):
+                rows = batch[offsets[position] : offsets[position + 1]]
+                _read_render(
+                    _io,
+                    audio_path_list[missing[row]],
+                    infos[row],
+                    rates[row],
+                    labels[row],
+                    dtype,
+                    rows,
+                )
+
+        with span("fft"):
+            spectra = spectrum.spectrum.from_signals(
+                batch,
+                rates[0],
+                [delays[row] for row in group for _ in range(len(labels[row]))],
+                workers=workers,
+            )
+        with span("cache store"):
+            for position, row in enumerate(group):
+                idx = missing[row]
+                audio_data = batch[
+                    offsets[position] : offsets[position + 1], : frames[row]
+                ]
+                render_spectra = spectra[offsets[position] : offsets[position + 1]]
+                results[idx] = (rates[row], labels[row], audio_data, render_spectra)
+                if _cache is not None:
+                    _cache.store(
+                        keys[idx],
+                        {
+                            "signal": audio_data,
+                            "spectrum": np.stack(
+                                [_spectrum.values for _spectrum in render_spectra]
+                            ),
+                        },
+                        {
+                            "sample_rate": rates[row],
+                            "labels": labels[row],
+                            "length": render_spectra[0].length,
+                            "delay": render_spectra[0].delay,
+                        },
+                    )
+    return results
+
+
+def detect_latency(
+    spectrum_list: list[spectrum.spectrum],
+    reference_length: int,
+    workers: int | None = None,
+) -> tuple[list[spectrum.spectrum], np.ndarray]:
+    """
+    Detects the latency of impulse renders and moves their phase reference to it.
+
+    The renders are correlated with the impulse fed to the plugins, see
+    `latency.latency_estimator`, in one batch per FFT length.
+
+    Parameters
+    ----------
+    spectrum_list : list[spectrum.spectrum]
+        The spectra of the impulse renders.
+    reference_length : int
+        The length of the impulse fed to the plugins, see `generator.impulse`.
+    workers : int, optional
+        The number of workers for the batched inverse FFT.
+
+    Returns
+    -------
+    tuple
+        A tuple containing the spectra with the latency added to their
+        `delay` (list[spectrum.spectrum], sharing the values of
+        `spectrum_list`) and the latency of each render in samples
+        (np.ndarray).
+    """
+    estimator = latency.latency_estimator(generator.impulse(reference_length))
+    latencies = np.zeros(len(spectrum_list), dtype=np.float64)
+    for _, rows in length_groups([_spectrum.length for _spectrum in spectrum_list]):
+        latencies[rows] = estimator.estimate(
+            [spectrum_list[idx] for idx in rows], workers
+        )
+    return [
+        spectrum.spectrum(
+            _spectrum.values,
+            _spectrum.length,
+            _spectrum.sample_rate,
+            _spectrum.delay + latencies[idx],
+        )
+        for idx, _spectrum in enumerate(spectrum_list)
+    ], latencies
+
+
+def impulse_excerpt(impulse: np.ndarray, delay: float, zoom: int) -> np.ndarray:
+    """Returns the `2 * zoom` samples of an impulse render around `delay`, zero beyond its ends."""
+    start = int(round(delay)) - zoom
+    excerpt = np.zeros(2 * zoom, dtype=impulse.dtype)
+    low, high = max(start, 0), min(start + 2 * zoom, len(impulse))
+    if high > low:
+        excerpt[low - start : high - start] = impulse[low:high]
+    return excerpt
+
+
+def analysis_traces(
+    analyze_dict: AnalyzeDict,
+    sample_rate: float,
+    zoom: int = 50,
+    important_freq: float = 200,
+    max_points: int = decimate.MAX_POINTS,
+    zoom_points: int = decimate.MAX_POINTS,
+) -> AnalysisTraces:
+    """
+    Reduces one plugin's impulse and sine renders to the data drawn in each
+    panel of `plotter.plot_analysis_result`.
+
+    Parameters
+    ----------
+    analyze_dict : AnalyzeDict
+        The renders of one plugin, and optionally their spectra. Without an
+        impulse spectrum, the latency is detected here, see `detect_latency`.
+    sample_rate : float
+        The sample rate of the renders.
+    zoom : int, optional
+        The number of samples shown on each side of the impulse, at the
+        `delay` of the impulse spectrum.
+    important_freq : float, optional
+        The frequency the zoomed-in panels are centered on, in Hertz.
+    max_points : int, optional
+        The maximum number of points of each trace, see `decimate.decimate`.
+    zoom_points : int, optional
+        The number of frequencies of the zoomed-in magnitude, which is
+        evaluated with a zoom FFT over its band only, so its resolution does
+        not depend on the FFT length of `impulse_spectrum`.
+
+    Returns
+    -------
+    AnalysisTraces
+        The panel data, as float64.
+    """
+    impulse = analyze_dict["impulse"]
+    impulse_spectrum = analyze_dict.get("impulse_spectrum")
+    impulse_latency = analyze_dict.get("latency", np.nan)
+    if impulse_spectrum is None:
+        (impulse_spectrum,), (impulse_latency,) = detect_latency(
+            [spectrum.spectrum.from_signal(impulse, sample_rate)], len(impulse)
+        )
+    sine_wave_spectrum = analyze_dict.get("sine_wave_spectrum")
+    if sine_wave_spectrum is None:
+        sine_wave_spectrum = spectrum.spectrum.from_signal(
+            analyze_dict["sine_wave"], sample_rate
+        )
+
+    center = impulse_excerpt(impulse, impulse_spectrum.delay, zoom)
+    impulse_zoom = (center**20) * np.sign(center)
+    second_max_value = np.sort(np.abs(impulse_zoom))[::-1][1]
+
+    plot_index = impulse_spectrum.band(1, sample_rate / 2)
+    distortion_index = sine_wave_spectrum.band(1, sample_rate / 2)
+    zoom_spectrum = spectrum.band_spectrum.from_signal(
+        impulse,
+        sample_rate,
+        max(important_freq / 2, 1),
+        min(important_freq * 2, sample_rate / 2),
+        zoom_points,
+        impulse_spectrum.delay,
+    )
+    impulse_zoom_index, impulse_zoom = decimate.decimate(
+        np.arange(len(impulse_zoom)), impulse_zoom.astype(np.float64), max_points
+    )
+    magnitude_freq, magnitude_db = decimate.decimate(
+        impulse_spectrum.freq[plot_index],
+        impulse_spectrum.normalized_db[plot_index].astype(np.float64),
+        max_points,
+        log_x=True,
+    )
+    phase_freq, phase = decimate.decimate(
+        impulse_spectrum.freq[plot_index],
+        impulse_spectrum.phase[plot_index].astype(np.float64),
+        max_points,
+        log_x=True,
+    )
+    distortion_freq, distortion_db = decimate.decimate(
+        sine_wave_spectrum.freq[distortion_index],
+        sine_wave_spectrum.normalized_db[distortion_index].astype(np.float64),
+        max_points,
+        log_x=True,
+    )
+    zoom_freq, zoom_magnitude_db = decimate.decimate(
+        zoom_spectrum.freq,
+        zoom_spectrum.db - 20 * np.log10(np.float64(impulse_spectrum.peak_magnitude)),
+        max_points,
+        log_x=True,
+    )
+    return {
+        "title": analyze_dict["title"],
+        "latency": float(impulse_latency),
+        "impulse_zoom_index": impulse_zoom_index,
+        "impulse_zoom": impulse_zoom,
+        "impulse_zoom_limit": float(second_max_value),
+        "magnitude_freq": magnitude_freq,
+        "magnitude_db": magnitude_db,
+        "phase_freq": phase_freq,
+        "phase": phase,
+        "distortion_freq": distortion_freq,
+        "distortion_db": distortion_db,
+        "zoom_freq": zoom_freq,
+        "zoom_magnitude_db": zoom_magnitude_db,
+    }
+
+
+def analysis_export(
+    analyze_dict: AnalyzeDict,
+    sample_rate: float,
+    freq_centers: np.ndarray,
+    freq_edges: np.ndarray,
+    zoom: int = 50,
+) -> export.AnalysisExport:
+    """
+    Reduces one plugin's renders to spectra on a shared frequency grid.
+
+    Unlike `analysis_traces`, every plugin gets the same frequencies, so the
+    results of all plugins stack into `(n_plugins, n_freq)` arrays.
+
+    Parameters
+    ----------
+    analyze_dict : AnalyzeDict
+        The renders of one plugin, and optionally their spectra.
+    sample_rate : float
+        The sample rate of the renders.
+    freq_centers : np.ndarray
+        The grid points, see `export.log_frequency_grid`.
+    freq_edges : np.ndarray
+        The band edges of the grid.
+    zoom : int, optional
+        The number of impulse samples kept on each side of the impulse, at
+        the `delay` of the impulse spectrum.
+
+    Returns
+    -------
+    export.AnalysisExport
+        The magnitude and distortion as the peak of each band in dB, the
+        phase at the band centers in degrees, and the impulse excerpt.
+    """
+    impulse = analyze_dict["impulse"]
+    impulse_spectrum = analyze_dict.get("impulse_spectrum")
+    if impulse_spectrum is None:
+        impulse_spectrum = spectrum.spectrum.from_signal(impulse, sample_rate)
+    sine_wave_spectrum = analyze_dict.get("sine_wave_spectrum")
+    if sine_wave_spectrum is None:
+        sine_wave_spectrum = spectrum.spectrum.from_signal(
+            analyze_dict["sine_wave"], sample_rate
+        )
+    return {
+        "title": analyze_dict["title"],
+        "magnitude_db": export.peak_on_grid(
+            impulse_spectrum.freq, impulse_spectrum.normalized_db, freq_edges
+        ).astype(np.float64),
+        "phase": export.nearest_on_grid(
+            impulse_spectrum.freq, impulse_spectrum.phase, freq_centers
+        ).astype(np.float64),
+        "distortion_db": export.peak_on_grid(
+            sine_wave_spectrum.freq, sine_wave_spectrum.normalized_db, freq_edges
+        ).astype(np.float64),
+        "impulse_excerpt": impulse_excerpt(
+            impulse, impulse_spectrum.delay, zoom
+        ).astype(np.float64),
+    }
+
+
+def traces_from_export(
+    columns: dict[str, np.ndarray],
+    important_freq: float = 200,
+) -> list[AnalysisTraces]:
+    """
+    Rebuilds the panel data of `plotter.plot_analysis_traces` from an export.
+
+    This is how plots of a headless run are rendered later, see
+    `export.read_export`. The panels show the grid resolution of the export.
+
+    Parameters
+    ----------
+    columns : dict[str, np.ndarray]
+        The columns of an export file.
+    important_freq : float, optional
+        The frequency the zoomed-in panels are centered on, in Hertz.
+
+    Returns
+    -------
+    list[AnalysisTraces]
+        The panel data of each plugin.
+    """
+    freq = columns["freq"].astype(np.float64)
+    # exports written before latency detection have no latency column
+    latencies = columns.get("latency", np.full(len(columns["title"]), np.nan))
+    zoom_index = (freq >= important_freq / 2) & (freq <= important_freq * 2)
+    traces_list = []
+    for row, title in enumerate(columns["title"]):
+        center = columns["impulse_excerpt"][row].astype(np.float64)
+        impulse_zoom = (center**20) * np.sign(center)
+        magnitude_db = columns["magnitude_db"][row].astype(np.float64)
+        traces_list.append(
+            {
+                "title": str(title),
+                "latency": float(latencies[row]),
+                "impulse_zoom_index": np.arange(len(impulse_zoom)),
+                "impulse_zoom": impulse_zoom,
+                "impulse_zoom_limit": float(np.sort(np.abs(impulse_zoom))[::-1][1]),
+                "magnitude_freq": freq,
+                "magnitude_db": magnitude_db,
+                "phase_freq": freq,
+                "phase": columns["phase"][row].astype(np.float64),
+                "distortion_freq": freq,
+                "distortion_db": columns["distortion_db"][row].astype(np.float64),
+                "zoom_freq": freq[zoom_index],
+                "zoom_magnitude_db": magnitude_db[zoom_index],
+            }
+        )
+    return traces_list
+
+
+def estimate_plugin_bytes(
+    impulse_info: io.WavInfo, sine_info: io.WavInfo, settings: AnalysisSettings
+) -> int:
+    """
+    Estimates the memory one plugin takes while it is analyzed.
+
+    Each row of a render is held as the padded signal, its spectrum and the
+    derived arrays the spectrum keeps (magnitude, dB, phase), see
+    `load_renders`.
+
+    Parameters
+    ----------
+    impulse_info : io.WavInfo
+        The header of the impulse render.
+    sine_info : io.WavInfo
+        The header of the sine render.
+    settings : AnalysisSettings
+        The analysis settings.
+
+    Returns
+    -------
+    int
+        The estimate, in bytes.
+    """
+    total = 0
+    for info, precision_name in (
+        (impulse_info, settings["precision"]),
+        (sine_info, settings["distortion_precision"]),
+    ):
+        itemsize = precision.real_dtype(precision_name).itemsize
+        n_rows, length = _rows_and_length(info, settings)
+        # the signal, the complex spectrum and three real arrays derived from it
+        total += n_rows * (length * itemsize + (length // 2 + 1) * itemsize * (2 + 3))
+        if settings["detect_latency"] and info is impulse_info:
+            # the cross spectrum and the correlation with its magnitude
+            total += n_rows * ((length // 2 + 1) * itemsize * 2 + length * itemsize * 2)
+    if settings["harmonic_points"] > 0:
+        # the float64 copy of the sine rows for the zoom FFTs
+        n_rows, length = _rows_and_length(sine_info, settings)
+        total += n_rows * length * 8
+    return total
+
+
+def _rows_and_length(info: io.WavInfo, settings: AnalysisSettings) -> tuple[int, int]:
+    # the analyzed rows of a render and its FFT length, see load_renders
+    frames = resampled_length(
+        info, settings["sample_rate"] if settings["resample"] else info["sample_rate"]
+    )
+    length = max(settings["fft_size"], frames + frames % 2)
+    return len(channel_labels(info["channels"], settings["channels"])), length
+
+
+def memory_workers(
+    pair_list: list[tuple[str, str, str]],
+    settings: AnalysisSettings,
+    workers: int,
+    _io: io.io | None = None,
+) -> int:
+    """
+    Limits the number of processes so that the memory budget bounds them all.
+
+    Each process gets `settings["memory_budget"] // workers`, so the count
+    is lowered until that share holds the largest plugin, see
+    `estimate_plugin_bytes`. Only the WAV headers are read.
+
+    Parameters
+    ----------
+    pair_list : list[tuple[str, str, str]]
+        (title, impulse path, sine path) of each plugin.
+    settings : AnalysisSettings
+        The analysis settings, with the budget of all processes together.
+    workers : int
+        The number of processes wanted.
+    _io : io.io, optional
+        The loader.
+
+    Returns
+    -------
+    int
+        The number of processes, at least 1. A plugin larger than the whole
+        budget runs alone in one process.
+    """
+    if settings["memory_budget"] is None or len(pair_list) == 0:
+        return workers
+    if _io is None:
+        _io = io.io()
+    largest = max(
+        estimate_plugin_bytes(
+            _io.read_wav_info(impulse_path), _io.read_wav_info(sine_path), settings
+        )
+        for _, impulse_path, sine_path in pair_list
+    )
+    return max(1, min(workers, settings["memory_budget"] // largest))
+
+
+def memory_batches(
+    pair_list: list[tuple[str, str, str]],
+    settings: AnalysisSettings,
+    _io: io.io | None = None,
+) -> list[list[tuple[str, str, str]]]:
+    """
+    Splits plugins into consecutive batches that fit `settings["memory_budget"]`.
+
+    Only the WAV headers are read. A plugin larger than the budget on its own
+    still gets a batch.
+
+    Parameters
+    ----------
+    pair_list : list[tuple[str, str, str]]
+        (title, impulse path, sine path) of each plugin.
+    settings : AnalysisSettings
+        The analysis settings. A `memory_budget` of None puts all plugins
+        in one batch.
+    _io : io.io, optional
+        The loader.
+
+    Returns
+    -------
+    list[list[tuple[str, str, str]]]
+        The batches, in the order of `pair_list`.
+    """
+    if settings["memory_budget"] is None or len(pair_list) == 0:
+        return [pair_list]
+    if _io is None:
+        _io = io.io()
+    batches = [[]]
+    batch_bytes = 0
+    for pair in pair_list:
+        _, impulse_path, sine_path = pair
+        plugin_bytes = estimate_plugin_bytes(
+            _io.read_wav_info(impulse_path), _io.read_wav_info(sine_path), settings
+        )
+        if (
+            len(batches[-1]) > 0
+            and batch_bytes + plugin_bytes > settings["memory_budget"]
+        ):
+            batches.append([])
+            batch_bytes = 0
+        batches[-1].append(pair)
+        batch_bytes += plugin_bytes
+    return batches
+
+
+def _analyze_batch(
+    pair_list: list[tuple[str, str, str]],
+    settings: AnalysisSettings,
+    _io: io.io,
+    _cache: cache.cache | None,
+    _recorder: printer.recorder,
+):
+    # everything derived from the renders is reduced before returning, so the
+    # renders and spectra of the batch are released together
+    with _recorder.span("load impulse"):
+        impulse_renders = load_renders(
+            _io,
+            [impulse_path for _, impulse_path, _ in pair_list],
+            precision.real_dtype(settings["precision"]),
+            settings["fft_size"],
+            _cache,
+            settings["fft_workers"],
+            _recorder,
+            settings["channels"],
+            settings["sample_rate"] if settings["resample"] else None,
+        )
+    with _recorder.span("load sine"):
+        sine_renders = load_renders(
+            _io,
+            [sine_path for _, _, sine_path in pair_list],
+            precision.real_dtype(settings["distortion_precision"]),
+            settings["fft_size"],
+            _cache,
+            settings["fft_workers"],
+            _recorder,
+            settings["channels"],
+            settings["sample_rate"] if settings["resample"] else None,
+        )
+
+    # each analyzed row of a plugin is reported as a plugin of its own
+    analyze_dict_list: list[AnalyzeDict] = []
+    plugin_list = []
+    for (title, _, _), impulse_render, sine_render in zip(
+        pair_list, impulse_renders, sine_renders
+    ):
+        for sample_rate, *_ in (impulse_render, sine_render):
+            assert (
+                sample_rate == settings["sample_rate"]
+            ), f"sample rate mismatch: {sample_rate}"
+        assert (
+            impulse_render[1] == sine_render[1]
+        ), f"channel mismatch of {title}: {impulse_render[1]}, {sine_render[1]}"
+        audible = [
+            impulse_audible and sine_audible
+            for impulse_audible, sine_audible in zip(
+                audible_rows(impulse_render[2], settings["channel_floor_db"]),
+                audible_rows(sine_render[2], settings["channel_floor_db"]),
+            )
+        ]
+        for row, label in enumerate(impulse_render[1]):
+            impulse_spectrum = impulse_render[3][row]
+            sine_wave_spectrum = sine_render[3][row]
+            if not audible[row]:
+                continue
+            analyze_dict_list.append(
+                {
+                    "title": title if label == "" else f"{title} [{label}]",
+                    "impulse": impulse_render[2][row],
+                    "impulse_spectrum": impulse_spectrum,
+                    "sine_wave": sine_render[2][row],
+                    "sine_wave_spectrum": sine_wave_spectrum,
+                }
+            )
+            plugin_list.append(title)
+
+    if settings["detect_latency"]:
+        with _recorder.span("latency"):
+            impulse_spectrum_list, latencies = detect_latency(
+                [
+                    analyze_dict["impulse_spectrum"]
+                    for analyze_dict in analyze_dict_list
+                ],
+                settings["signal_length"],
+                settings["fft_workers"],
+            )
+            for analyze_dict, impulse_spectrum, impulse_latency in zip(
+                analyze_dict_list, impulse_spectrum_list, latencies
+            ):
+                analyze_dict["impulse_spectrum"] = impulse_spectrum
+                analyze_dict["latency"] = float(impulse_latency)
+
+    with _recorder.span("reduce"):
+        if settings["export_n_freq"] > 0:
+            freq_centers, freq_edges = export.log_frequency_grid(
+                1, settings["sample_rate"] / 2, settings["export_n_freq"]
+            )
+
+        traces_list = []
+        export_list = []
+        for analyze_dict in analyze_dict_list:
+            if settings["plot"]:
+                traces_list.append(
+                    analysis_traces(
+                        analyze_dict,
+                        settings["sample_rate"],
+                        settings["zoom"],
+                        settings["important_freq"],
+                        zoom_points=settings["zoom_points"],
+                    )
+                )
+            if settings["export_n_freq"] > 0:
+                export_list.append(
+                    analysis_export(
+                        analyze_dict,
+                        settings["sample_rate"],
+                        freq_centers,
+                        freq_edges,
+                        settings["zoom"],
+                    )
+                )
+
+    with _recorder.span("metrics"):
+        sine_spectrum_list = [
+            analyze_dict["sine_wave_spectrum"] for analyze_dict in analyze_dict_list
+        ]
+        metrics_list = []
+        # the table depends on the FFT length, which grows for renders longer than fft_size
+        for length, rows in length_groups(
+            [_spectrum.length for _spectrum in sine_spectrum_list]
+        ):
+            index_table = metrics.harmonic_index_table(
+                settings["sine_wave_freq"],
+                settings["sample_rate"],
+                length,
+                settings["n_harmonics"],
+                # the tone spreads over proportionally more bins of a longer FFT
+                settings["half_width"] * length // settings["fft_size"],
+            )
+            harmonic_bands = None
+            if settings["harmonic_points"] > 0:
+                signals = np.zeros((len(rows), length), dtype=np.float64)
+                for row, idx in enumerate(rows):
+                    sine_wave = analyze_dict_list[idx]["sine_wave"]
+                    signals[row, : len(sine_wave)] = sine_wave
+                harmonic_bands = metrics.harmonic_bands(
+                    signals,
+                    settings["sample_rate"],
+                    index_table,
+                    length,
+                    settings["harmonic_points"],
+                )
+            metrics_list += metrics.distortion_metrics(
+                [sine_spectrum_list[idx] for idx in rows],
+                [analyze_dict_list[idx]["title"] for idx in rows],
+                settings["sine_wave_freq"],
+                index_table,
+                harmonic_bands=harmonic_bands,
+                latency=[analyze_dict_list[idx].get("latency", np.nan) for idx in rows],
+                order_gain=np.array(settings["order_gain"]),
+            )
+    order = {
+        analyze_dict["title"]: idx for idx, analyze_dict in enumerate(analyze_dict_list)
+    }
+    metrics_list.sort(key=lambda m: order[m["title"]])
+    return traces_list, metrics_list, export_list, plugin_list
+
+
+def analyze_chunk(
+    pair_list: list[tuple[str, str, str]],
+    settings: AnalysisSettings,
+    _recorder: printer.recorder | None = None,
+) -> tuple[
+    list[AnalysisTraces],
+    list[metrics.DistortionMetrics],
+    list[export.AnalysisExport],
+    list[str],
+    list[dict],
+]:
+    """
+    Loads, transforms and reduces the renders of some plugins.
+
+    Each analyzed channel of a render (see `channel_labels`) is reported as a
+    plugin of its own, titled e.g. "title [L]". Rows far below the loudest of
+    their render, like the side of a mono plugin, are left out, see
+    `audible_rows`.
+
+    The plugins are processed in batches that fit `settings["memory_budget"]`,
+    see `memory_batches`. Each batch is reduced to the panel data, metrics and
+    grid spectra before the next is loaded, so the peak memory depends on the
+    budget rather than the number of plugins.
+
+    This is the unit of work of the process pool in `analyze.py`, so it only
+    takes and returns picklable data.
+
+    Parameters
+    ----------
+    pair_list : list[tuple[str, str, str]]
+        (title, impulse path, sine path) of each plugin.
+    settings : AnalysisSettings
+        The analysis settings.
+    _recorder : printer.recorder, optional
+        Records the stages when running in the main process. Otherwise a
+        recorder of this process is used and its spans are returned.
+
+    Returns
+    -------
+    tuple
+        A tuple containing the panel data (list[AnalysisTraces]), the
+        distortion metrics (list[metrics.DistortionMetrics]), the grid
+        spectra (list[export.AnalysisExport]) and the title in `pair_list`
+        (list[str]) of each analyzed channel, in the order of `pair_list`,
+        and the stages recorded by the own recorder (list[dict], see
+        `printer.printer.add_spans`). The panel data is empty unless
+        `settings["plot"]`, and the grid spectra are empty unless
+        `settings["export_n_freq"]` > 0.
+    """
+    _io = io.io()
+    _cache = (
+        cache.cache(settings["cache_dir"], settings["cache_max_bytes"])
+        if settings["cache_dir"] is not None
+        else None
+    )
+    spans = []
+    if _recorder is None:
+        _recorder = printer.recorder(settings["trace_memory"])
+        spans = _recorder.spans
+    batches = memory_batches(pair_list, settings, _io)
+    traces_list, metrics_list, export_list, plugin_list = [], [], [], []
+    for batch in batches:
+        with _recorder.span("batch"):
+            batch_traces, batch_metrics, batch_exports, batch_plugins = _analyze_batch(
+                batch, settings, _io, _cache, _recorder
+            )
+        traces_list += batch_traces
+        metrics_list += batch_metrics
+        export_list += batch_exports
+        plugin_list += batch_plugins
+    if _cache is not None:
+        _cache.flush()
+    return traces_list, metrics_list, export_list, plugin_list, spans
@@ -0,0 +1,459 @@
+from typing import Callable, TypedDict
+import csv
+import json
+import os
+import platform
+import numpy as np
+import scipy.fft
+import scipy.signal
+from matplotlib import pyplot as plt
+import module.io as io
+import module.generator as generator
+import module.spectrum as spectrum
+import module.plotter as plotter
+import module.printer as printer
+import module.latency as latency
+
+# the timed stages, in the order they run
+STAGES = (
+    "load_wav_as_mono",
+    "spectrum",
+    "plot_analysis_result",
+    "plot_mono_audio_spectrogram",
+)
+
+# the spectrogram has a fixed FFT length, so it is measured once per plugin count with
+# this fft_size
+NO_FFT_SIZE = 0
+
+Plugin = Callable[[np.ndarray, int], np.ndarray]
+
+
+class BenchmarkResult(TypedDict):
+    stage: str
+    fft_size: int
+    n_plugins: int
+    wall_s: float
+    cpu_s: float
+    allocated_bytes: int | None
+    # of the process up to the end of the stage, not of the stage alone
+    peak_rss_bytes: int | None
+
+
+class BenchmarkComparison(TypedDict):
+    stage: str
+    fft_size: int
+    n_plugins: int
+    wall_s: float
+    baseline_wall_s: float
+    wall_ratio: float
+    allocated_ratio: float | None
+    regression: bool
+
+
+class LatencyCheck(TypedDict):
+    delay: float
+    polarity: int
+    latency: float
+    error: float
+    passed: bool
+
+
+def _lowpass(signal: np.ndarray, sample_rate: int) -> np.ndarray:
+    sos = scipy.signal.butter(2, 5000, fs=sample_rate, output="sos")
+    return scipy.signal.sosfilt(sos, signal)
+
+
+def _highpass(signal: np.ndarray, sample_rate: int) -> np.ndarray:
+    sos = scipy.signal.butter(2, 30, btype="highpass", fs=sample_rate, output="sos")
+    return scipy.signal.sosfilt(sos, signal)
+
+
+# stand-ins for plugins: known linear filters and memoryless nonlinearities
+PLUGINS: dict[str, Plugin] = {
+    "dry": lambda signal, sample_rate: signal.copy(),
+    "lowpass": _lowpass,
+    "tanh": lambda signal, sample_rate: np.tanh(1.5 * signal),
+    "lowpass_tanh": lambda signal, sample_rate: np.tanh(
+        1.5 * _lowpass(signal, sample_rate)
+    ),
+    "highpass_clip": lambda signal, sample_rate: np.clip(
+        _highpass(signal, sample_rate), -0.4, 0.4
+    ),
+}
+
+
+def plugin_titles(n_plugins: int) -> list[str]:
+    """Returns the titles of the first `n_plugins` plugins, cycling `PLUGINS`."""
+    names = list(PLUGINS)
+    return [f"{idx:03d}_{names[idx % len(names)]}" for idx in range(n_plugins)]
+
+
+def render_plugins(
+    render_dir: str,
+    sample_rate: int,
+    length: int,
+    n_plugins: int,
+    sine_wave_freq: float = 1000,
+    amplitude_dBFS: float = -6,
+    block_size: int = 2**16,
+):
+    """
+    Renders the test signals through synthetic plugins.
+
+    The impulse, sine wave and sweep are generated with `generator.generator`
+    into `render_dir`, then each plugin's renders are written to
+    `render_dir/{impulse,sin,sweep}/<title>.wav`, the layout `analyze.py` and
+    `analyze_sweep.py` read.
+
+    Parameters
+    ----------
+    render_dir : str
+        The directory to write the signals and renders into.
+    sample_rate : int
+        The sample rate of the signals.
+    length : int
+        The length of the signals, in samples.
+    n_plugins : int
+        The number of plugins, see `plugin_titles`.
+    sine_wave_freq : float, optional
+        The frequency of the sine wave, in Hertz.
+    amplitude_dBFS : float, optional
+        The amplitude of the sine wave and the sweep.
+    block_size : int, optional
+        The number of samples generated at once.
+
+    Returns
+    -------
+    dict[str, list[str]]
+        The paths of the renders of each signal ("impulse", "sin" and
+        "sweep"), in the order of `plugin_titles`.
+    """
+    _io = io.io()
+    gen = generator.generator(sample_rate, render_dir, "float64")
+    sources = {
+        "impulse": gen.stream_impulse(length, block_size),
+        "sin": gen.stream_sine_wave(
+            sine_wave_freq, length, amplitude_dBFS, block_size=block_size
+        ),
+        "sweep": gen.stream_sweep_up(
+            length, 1, sample_rate / 2 * 0.95, amplitude_dBFS, block_size=block_size
+        ),
+    }
+    render_paths = {}
+    for kind, source_path in sources.items():
+        os.makedirs(os.path.join(render_dir, kind), exist_ok=True)
+        _, signal = _io.load_wav_as_mono(source_path, np.float64)
+        signal = signal[:length]
+        render_paths[kind] = []
+        for title in plugin_titles(n_plugins):
+            filepath = os.path.join(render_dir, kind, f"{title}.wav")
+            plugin = PLUGINS[title.split("_", 1)[1]]
+            _io.save_wav(filepath, sample_rate, plugin(signal, sample_rate))
+            render_paths[kind].append(filepath)
+    return render_paths
+
+
+def _result(span: dict, fft_size: int, n_plugins: int) -> BenchmarkResult:
+    return {
+        "stage": span["name"],
+        "fft_size": fft_size,
+        "n_plugins": n_plugins,
+        "wall_s": span["wall_s"],
+        "cpu_s": span["cpu_s"],
+        "allocated_bytes": span["allocated_bytes"],
+        "peak_rss_bytes": span["peak_rss_bytes"],
+    }
+
+
+def _best(repeats: list[BenchmarkResult]) -> BenchmarkResult:
+    # the fastest repeat is the least disturbed by the rest of the machine
+    best = dict(min(repeats, key=lambda result: result["wall_s"]))
+    best["cpu_s"] = min(result["cpu_s"] for result in repeats)
+    if best["allocated_bytes"] is not None:
+        best["allocated_bytes"] = max(result["allocated_bytes"] for result in repeats)
+    best["peak_rss_bytes"] = repeats[-1]["peak_rss_bytes"]
+    return best
+
+
+def run_case(
+    render_paths: dict[str, list[str]],
+    sample_rate: int,
+    fft_size: int,
+    n_plugins: int,
+    output_dir: str,
+    repeats: int = 3,
+    spectrogram: bool = True,
+    trace_memory: bool = False,
+    workers: int | None = None,
+) -> list[BenchmarkResult]:
+    """
+    Times each stage of the analysis for one fft_size and plugin count.
+
+    Each stage runs `repeats` times and is reported by its fastest run, with
+    the largest allocation of all runs.
+
+    Parameters
+    ----------
+    render_paths : dict[str, list[str]]
+        The renders, see `render_plugins`.
+    sample_rate : int
+        The sample rate of the renders.
+    fft_size : int
+        The minimum FFT length of the spectra.
+    n_plugins : int
+        The number of plugins analyzed, the first of `render_paths`.
+    output_dir : str
+        The directory the plots are written into.
+    repeats : int, optional
+        The number of runs of each stage.
+    spectrogram : bool, optional
+        If True, `plotter.plot_mono_audio_spectrogram` is timed too. Its
+        result has `fft_size` `NO_FFT_SIZE`.
+    trace_memory : bool, optional
+        See `printer.recorder`.
+    workers : int, optional
+        The number of workers of the FFTs.
+
+    Returns
+    -------
+    list[BenchmarkResult]
+        One result per stage.
+    """
+    n_rendered = len(render_paths["impulse"])
+    assert n_plugins <= n_rendered, f"only {n_rendered} plugins rendered"
+    _io = io.io()
+    plot = plotter.plotter(output_dir)
+    titles = plugin_titles(n_plugins)
+    _recorder = printer.recorder(trace_memory)
+    runs = {stage: [] for stage in STAGES}
+    for _ in range(repeats):
+        _recorder.spans = []
+        with _recorder.span("load_wav_as_mono"):
+            renders = [
+                (
+                    _io.load_wav_as_mono(impulse_path, np.float64)[1],
+                    _io.load_wav_as_mono(sine_path, np.float64)[1],
+                )
+                for impulse_path, sine_path in zip(
+                    render_paths["impulse"][:n_plugins], render_paths["sin"][:n_plugins]
+                )
+            ]
+        with _recorder.span("spectrum"):
+            analyze_dict_list: list[plotter.AnalyzeDict] = []
+            for title, (impulse, sine_wave) in zip(titles, renders):
+                impulse_spectrum, sine_wave_spectrum = [
+                    spectrum.spectrum.from_signal(
+                        signal,
+                        sample_rate,
+                        max(fft_size, len(signal)),
+                        len(signal) // 2,
+                        workers=workers,
+                    )
+                    for signal in (impulse, sine_wave)
+                ]
+                # what every panel reads, so the plots below only draw
+                impulse_spectrum.normalized_db
+                impulse_spectrum.phase
+                sine_wave_spectrum.normalized_db
+                analyze_dict_list.append(
+                    {
+                        "title": title,
+                        "impulse": impulse,
+                        "sine_wave": sine_wave,
+                        "impulse_spectrum": impulse_spectrum,
+                        "sine_wave_spectrum": sine_wave_spectrum,
+                    }
+                )
+        with _recorder.span("plot_analysis_result"):
+            plot.plot_analysis_result(analyze_dict_list, sample_rate)
+            plt.close("all")
+        if spectrogram:
+            with _recorder.span("plot_mono_audio_spectrogram"):
+                for title, sweep_path in zip(titles, render_paths["sweep"]):
+                    plot.plot_mono_audio_spectrogram(
+                        sweep_path, sample_rate, False, f"[{title}] ", workers=workers
+                    )
+                    plt.close("all")
+        for span in _recorder.spans:
+            runs[span["name"]].append(
+                _result(
+                    span,
+                    (
+                        NO_FFT_SIZE
+                        if span["name"] == "plot_mono_audio_spectrogram"
+                        else fft_size
+                    ),
+                    n_plugins,
+                )
+            )
+    return [_best(runs[stage]) for stage in STAGES if len(runs[stage]) > 0]
+
+
+def check_latency(
+    length: int,
+    sample_rate: int,
+    delays: tuple[float, ...] = (0, 0.25, 0.5, 12.25, 37.123, -5.75),
+    tolerance: float = 1e-3,
+    workers: int | None = None,
+) -> list[LatencyCheck]:
+    """
+    Checks that `latency.latency_estimator` recovers known sub-sample delays.
+
+    The impulse of `generator.impulse` is delayed by each of `delays` with an
+    exact band-limited (circular) fractional delay, applied as a phase ramp
+    to its spectrum, in both polarities, and the estimates are compared with
+    the delays.
+
+    Parameters
+    ----------
+    length : int
+        The length of the impulse, in samples.
+    sample_rate : int
+        The sample rate of the impulse.
+    delays : tuple[float, ...], optional
+        The delays to recover, in samples.
+    tolerance : float, optional
+        The largest error that passes, in samples.
+    workers : int, optional
+        The number of workers of the FFTs.
+
+    Returns
+    -------
+    list[LatencyCheck]
+        One check per delay and polarity.
+    """
+    reference = generator.impulse(length)
+    values = scipy.fft.rfft(reference)
+    k = np.arange(len(values))
+    cases = [(delay, polarity) for delay in delays for polarity in (1, -1)]
+    renders = np.stack(
+        [
+            polarity
+            * scipy.fft.irfft(
+                values * np.exp(-2j * np.pi * k * delay / length), n=length
+            )
+            for delay, polarity in cases
+        ]
+    )
+    spectra = spectrum.spectrum.from_signals(
+        renders, sample_rate, [length // 2] * len(cases), workers=workers
+    )
+    latencies = latency.latency_estimator(reference).estimate(spectra, workers)
+    return [
+        {
+            "delay": float(delay),
+            "polarity": polarity,
+            "latency": float(estimate),
+            "error": float(abs(estimate - delay)),
+            "passed": bool(abs(estimate - delay) <= tolerance),
+        }
+        for (delay, polarity), estimate in zip(cases, latencies)
+    ]
+
+
+def machine_info() -> dict:
+    """Returns what the timings depend on besides the code, stored with the baseline."""
+    return {
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "scipy": scipy.__version__,
+    }
+
+
+def write_results(filepath: str, results: list[dict]):
+    """
+    Writes benchmark results or comparisons as CSV, one row per entry.
+
+    Parameters
+    ----------
+    filepath : str
+        The path of the CSV file.
+    results : list[dict]
+        The `BenchmarkResult` or `BenchmarkComparison` entries.
+    """
+    with open(filepath, "w", newline="") as f:
+        writer = csv.writer(f)
+        if len(results) == 0:
+            return
+        writer.writerow(list(results[0]))
+        for result in results:
+            writer.writerow(list(result.values()))
+
+
+def save_baseline(filepath: str, results: list[BenchmarkResult]):
+    """Stores results as the baseline later runs are compared against."""
+    os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+    with open(filepath, "w") as f:
+        json.dump({"machine": machine_info(), "results": results}, f, indent=2)
+
+
+def load_baseline(filepath: str) -> dict | None:
+    """Returns the baseline written by `save_baseline`, or None if there is none."""
+    if not os.path.exists(filepath):
+        return None
+    with open(filepath) as f:
+        return json.load(f)
+
+
+def compare_to_baseline(
+    results: list[BenchmarkResult],
+    baseline_results: list[BenchmarkResult],
+    tolerance: float = 0.2,
+    min_delta_s: float = 0.05,
+) -> list[BenchmarkComparison]:
+    """
+    Compares results with the baseline result of the same stage and case.
+
+    Parameters
+    ----------
+    results : list[BenchmarkResult]
+        The results of this run.
+    baseline_results : list[BenchmarkResult]
+        The stored results, see `load_baseline`.
+    tolerance : float, optional
+        The relative slowdown or growth of allocation counted as a regression.
+    min_delta_s : float, optional
+        Slowdowns of fewer seconds are not regressions, so the jitter of
+        stages taking milliseconds is not reported.
+
+    Returns
+    -------
+    list[BenchmarkComparison]
+        One comparison per result that has a baseline.
+    """
+    baseline = {
+        (result["stage"], result["fft_size"], result["n_plugins"]): result
+        for result in baseline_results
+    }
+    comparisons = []
+    for result in results:
+        reference = baseline.get(
+            (result["stage"], result["fft_size"], result["n_plugins"])
+        )
+        if reference is None:
+            continue
+        wall_ratio = result["wall_s"] / max(reference["wall_s"], 1e-9)
+        allocated_ratio = None
+        if result["allocated_bytes"] is not None and reference["allocated_bytes"]:
+            allocated_ratio = result["allocated_bytes"] / reference["allocated_bytes"]
+        comparisons.append(
+            {
+                "stage": result["stage"],
+                "fft_size": result["fft_size"],
+                "n_plugins": result["n_plugins"],
+                "wall_s": result["wall_s"],
+                "baseline_wall_s": reference["wall_s"],
+                "wall_ratio": wall_ratio,
+                "allocated_ratio": allocated_ratio,
+                "regression": (
+                    wall_ratio > 1 + tolerance
+                    and result["wall_s"] - reference["wall_s"] > min_delta_s
+                )
+                or (allocated_ratio is not None and allocated_ratio > 1 + tolerance),
+            }
+        )
+    return comparisons
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import numpy as np
+
+
+class cache:
+    def __init__(self, cache_dir: str, max_bytes: int) -> None:
+        """
+        Content-addressed on-disk store of NumPy arrays.
+
+        Entries are keyed by the hash of an input file plus the settings used
+        to derive the arrays, stored as `.npy` so they can be memory-mapped,
+        and evicted least-recently-used first once `max_bytes` is exceeded.
+
+        Parameters
+        ----------
+        cache_dir : str
+            The directory holding the entries and `index.json`.
+        max_bytes : int
+            The total size of all entries to keep.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_filepath = os.path.join(cache_dir, "index.json")
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index = {"entries": {}, "files": {}}
+        if os.path.exists(self.index_filepath):
+            with open(self.index_filepath) as f:
+                self.index = json.load(f)
+        # keys evicted by this process, which must not be merged back from disk
+        self._evicted: set[str] = set()
+        # whether `last_used` changed since the index was last saved
+        self._dirty = False
+
+    def _save_index(self):
+        # other processes may share the cache, so keep what they added meanwhile
+        if os.path.exists(self.index_filepath):
+            with open(self.index_filepath) as f:
+                on_disk = json.load(f)
+            for key, value in on_disk["files"].items():
+                self.index["files"].setdefault(key, value)
+            for key, value in on_disk["entries"].items():
+                if key in self._evicted:
+                    continue
+                entry = self.index["entries"].setdefault(key, value)
+                entry["last_used"] = max(entry["last_used"], value["last_used"])
+        # entries evicted by other processes have no directory any more
+        entries = self.index["entries"]
+        for key in list(entries):
+            if not os.path.isdir(os.path.join(self.cache_dir, key)):
+                del entries[key]
+        tmp_filepath = f"{self.index_filepath}.{os.getpid()}.tmp"
+        with open(tmp_filepath, "w") as f:
+            json.dump(self.index, f)
+        os.replace(tmp_filepath, self.index_filepath)
+        self._dirty = False
+
+    def flush(self):
+        """Saves the `last_used` times of the entries loaded since the index was last saved."""
+        if self._dirty:
+            self._save_index()
+
+    def file_hash(self, filepath: str) -> str:
+        """
+        Returns the SHA-256 of a file's content.
+
+        The hash is remembered together with the file's size and mtime, so an
+        unchanged file is not read again.
+
+        Parameters
+        ----------
+        filepath : str
+            The path to the file.
+
+        Returns
+        -------
+        str
+            The hex digest.
+        """
+        stat = os.stat(filepath)
+        filepath = os.path.abspath(filepath)
+        known = self.index["files"].get(filepath)
+        if known is not None and known[:2] == [stat.st_size, stat.st_mtime_ns]:
+            return known[2]
+
+        sha = hashlib.sha256()
+        with open(filepath, "rb") as f:
+            for block in iter(lambda: f.read(2**20), b""):
+                sha.update(block)
+        digest = sha.hexdigest()
+        self.index["files"][filepath] = [stat.st_size, stat.st_mtime_ns, digest]
+        return digest
+
+    def key(self, filepath: str, settings: dict) -> str:
+        """
+        Returns the cache key of a file processed with the given settings.
+
+        Parameters
+        ----------
+        filepath : str
+            The path to the input file.
+        settings : dict
+            JSON-serializable settings that affect the cached arrays.
+
+        Returns
+        -------
+        str
+            The key.
+        """
+        settings_json = json.dumps(settings, sort_keys=True)
+        return hashlib.sha256(
+            (self.file_hash(filepath) + settings_json).encode()
+        ).hexdigest()
+
+    def load(self, key: str):
+        """
+        Loads an entry.
+
+        Parameters
+        ----------
+        key : str
+            The key returned by `key`.
+
+        Returns
+        -------
+        tuple or None
+            A tuple of the memory-mapped arrays (dict) and the metadata (dict),
+            or None if the entry does not exist.
+        """
+        entry = self.index["entries"].get(key)
+        entry_dir = os.path.join(self.cache_dir, key)
+        if entry is None or not os.path.isdir(entry_dir):
+            return None
+
+        arrays = {
+            name: np.load(os.path.join(entry_dir, f"{name}.npy"), mmap_mode="r")
+            for name in entry["arrays"]
+        }
+        # saved with the next `store` or `flush`, not on every hit
+        entry["last_used"] = time.time()
+        self._dirty = True
+        return arrays, entry["meta"]
+
+    def store(self, key: str, arrays: dict[str, np.ndarray], meta: dict):
+        """
+        Stores an entry and evicts least recently used entries over the size cap.
+
+        Parameters
+        ----------
+        key : str
+            The key returned by `key`.
+        arrays : dict[str, np.ndarray]
+            The arrays to store, by name.
+        meta : dict
+            JSON-serializable metadata stored along with the arrays.
+        """
+        entry_dir = os.path.join(self.cache_dir, key)
+        os.makedirs(entry_dir, exist_ok=True)
+        size = 0
+        for name, array in arrays.items():
+            filepath = os.path.join(entry_dir, f"{name}.npy")
+            np.save(filepath, array)
+            size += os.path.getsize(filepath)
+        self.index["entries"][key] = {
+            "arrays": list(arrays.keys()),
+            "meta": meta,
+            "bytes": size,
+            "last_used": time.time(),
+        }
+        self._evict()
+        self._save_index()
+
+    def _evict(self):
+        entries = self.index["entries"]
+        total = sum(entry["bytes"] for entry in entries.values())
+        for key in sorted(entries, key=lambda k: entries[k]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            total -= entries[key]["bytes"]
+            del entries[key]
+            self._evicted.add(key)
+            shutil.rmtree(os.path.join(self.cache_dir, key), ignore_errors=True)
@@ -0,0 +1,199 @@
+from typing import TypedDict
+import json
+import os
+import struct
+import module.io as io
+
+
+class CatalogEntry(TypedDict):
+    path: str
+    title: str
+    test: str
+    size: int
+    mtime_ns: int
+    info: io.WavInfo | None
+    error: str | None
+
+
+class catalog:
+    def __init__(self, manifest_filepath: str) -> None:
+        """
+        Persisted index of the renders in the input directories.
+
+        Every WAV file is recorded with its size, mtime, header and test type
+        (e.g. "impulse" or "sine"). Later scans only re-read the header of
+        files whose size or mtime changed.
+
+        Parameters
+        ----------
+        manifest_filepath : str
+            The JSON file the index is kept in.
+        """
+        self.manifest_filepath = manifest_filepath
+        self.io = io.io()
+        self.entries: dict[str, CatalogEntry] = {}
+        if os.path.exists(manifest_filepath):
+            with open(manifest_filepath) as f:
+                self.entries = json.load(f)["entries"]
+
+    def _scan_dir(self, directory: str):
+        # one scandir pass per directory, the stat of each entry comes with it
+        stack = [directory]
+        while len(stack) > 0:
+            with os.scandir(stack.pop()) as it:
+                for dir_entry in it:
+                    if dir_entry.is_dir():
+                        stack.append(dir_entry.path)
+                    elif os.path.splitext(dir_entry.name)[1] == ".wav":
+                        yield dir_entry
+
+    def scan(self, load_dirs: dict[str, str]) -> list[CatalogEntry]:
+        """
+        Lists the WAV files of each test directory and updates the index.
+
+        Files that cannot be parsed are kept with their `error`, so they are
+        reported instead of aborting the scan.
+
+        Parameters
+        ----------
+        load_dirs : dict[str, str]
+            The directory of each test type, e.g. {"impulse": ..., "sine": ...}.
+
+        Returns
+        -------
+        list[CatalogEntry]
+            The current entries of the directories, sorted by test and path.
+        """
+        scanned = {}
+        for test, directory in load_dirs.items():
+            assert os.path.isdir(directory), f"directory not found: {directory}"
+            for dir_entry in self._scan_dir(directory):
+                stat = dir_entry.stat()
+                path = os.path.normpath(dir_entry.path)
+                known = self.entries.get(path)
+                if (
+                    known is not None
+                    and known["test"] == test
+                    and known["size"] == stat.st_size
+                    and known["mtime_ns"] == stat.st_mtime_ns
+                ):
+                    scanned[path] = known
+                    continue
+                entry: CatalogEntry = {
+                    "path": path,
+                    "title": os.path.splitext(dir_entry.name)[0],
+                    "test": test,
+                    "size": stat.st_size,
+                    "mtime_ns": stat.st_mtime_ns,
+                    "info": None,
+                    "error": None,
+                }
+                try:
+                    entry["info"] = self.io.read_wav_info(path)
+                except (AssertionError, OSError, struct.error) as e:
+                    entry["error"] = str(e) or type(e).__name__
+                scanned[path] = entry
+        # files gone from the scanned tests are dropped, other tests are kept for later runs
+        self.entries = {
+            path: entry
+            for path, entry in self.entries.items()
+            if entry["test"] not in load_dirs
+        } | scanned
+        return sorted(scanned.values(), key=lambda e: (e["test"], e["path"]))
+
+    def save(self):
+        """Writes the index to the manifest file."""
+        os.makedirs(os.path.dirname(self.manifest_filepath) or ".", exist_ok=True)
+        tmp_filepath = f"{self.manifest_filepath}.{os.getpid()}.tmp"
+        with open(tmp_filepath, "w") as f:
+            json.dump({"entries": self.entries}, f)
+        os.replace(tmp_filepath, self.manifest_filepath)
+
+
+def entry_problem(entry: CatalogEntry, sample_rate: int | None) -> str | None:
+    """
+    Returns why a render cannot be analyzed, or None if it can.
+
+    Parameters
+    ----------
+    entry : CatalogEntry
+        The render.
+    sample_rate : int or None
+        The sample rate every render must have. None accepts any rate, for
+        renders that are resampled.
+    """
+    if entry["error"] is not None:
+        return f"unreadable {entry['test']} render {entry['path']}: {entry['error']}"
+    if sample_rate is not None and entry["info"]["sample_rate"] != sample_rate:
+        return (
+            f"sample rate mismatch in {entry['path']}: {entry['info']['sample_rate']}"
+        )
+    if entry["info"]["frames"] == 0:
+        return f"empty {entry['test']} render {entry['path']}"
+    return None
+
+
+def pair_renders(
+    entries: list[CatalogEntry],
+    sample_rate: int | None,
+    tests: tuple[str, ...] = ("impulse", "sine"),
+) -> tuple[list[tuple[str, ...]], list[str]]:
+    """
+    Pairs the renders of each plugin by title and validates them.
+
+    Nothing is loaded beyond the headers in the catalog, so every problem is
+    found before the analysis starts.
+
+    Parameters
+    ----------
+    entries : list[CatalogEntry]
+        The entries of a scan, see `catalog.scan`.
+    sample_rate : int or None
+        The sample rate every render must have, see `entry_problem`.
+    tests : tuple[str, ...], optional
+        The test types every plugin needs a render of, in tuple order.
+
+    Returns
+    -------
+    tuple
+        A tuple containing the complete and valid `(title, path of each test)`
+        tuples sorted by title (list[tuple]), and a description of each
+        problem found (list[str]).
+    """
+    problems = []
+    invalid = set()
+    entry_dict = {entry["path"]: entry for entry in entries}
+    for entry in entries:
+        problem = entry_problem(entry, sample_rate)
+        if problem is not None:
+            problems.append(problem)
+            invalid.add(entry["path"])
+    by_title: dict[str, dict[str, str]] = {}
+    for entry in entries:
+        if entry["test"] not in tests:
+            continue
+        paths = by_title.setdefault(entry["title"], {})
+        if entry["test"] in paths:
+            problems.append(
+                f"duplicate {entry['test']} render of {entry['title']}: {paths[entry['test']]}, {entry['path']}"
+            )
+            # neither is analyzed, it is unclear which one is meant
+            invalid.update([paths[entry["test"]], entry["path"]])
+            continue
+        paths[entry["test"]] = entry["path"]
+
+    pair_list = []
+    for title in sorted(by_title):
+        paths = by_title[title]
+        missing = [test for test in tests if test not in paths]
+        if len(missing) > 0:
+            problems.append(f"missing {', '.join(missing)} render of {title}")
+            continue
+        if any(paths[test] in invalid for test in tests):
+            continue
+        n_channels = [entry_dict[paths[test]]["info"]["channels"] for test in tests]
+        if len(set(n_channels)) > 1:
+            problems.append(f"channel count mismatch of {title}: {n_channels}")
+            continue
+        pair_list.append((title, *[paths[test] for test in tests]))
+    return pair_list, problems
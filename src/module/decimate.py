@@ -0,0 +1,101 @@
+import numpy as np
+
+# 20 inch wide figures at 100 dpi, one min and one max per pixel column
+COLUMNS = 2000
+MAX_POINTS = 2 * COLUMNS
+
+
+def decimate(
+    x: np.ndarray,
+    y: np.ndarray,
+    max_points: int = MAX_POINTS,
+    log_x: bool = False,
+):
+    """
+    Reduces a trace to the minimum and maximum of each column it is drawn into.
+
+    Every peak and notch that would be visible at the drawn resolution is
+    kept, so the plot looks the same while the number of points no longer
+    depends on the length of the trace.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        The x values, sorted in ascending order.
+    y : np.ndarray
+        The y values.
+    max_points : int, optional
+        The maximum number of points returned.
+    log_x : bool, optional
+        If True, the columns are spaced logarithmically, for log-x axes.
+        Non-positive x values are dropped.
+
+    Returns
+    -------
+    tuple
+        A tuple containing the decimated x (np.ndarray) and y (np.ndarray),
+        at most `max_points` long, in the original order.
+    """
+    assert x.shape == y.shape, f"x and y shapes differ: {x.shape}, {y.shape}"
+    if log_x:
+        first = np.searchsorted(x, 0, side="right")
+        x = x[first:]
+        y = y[first:]
+    if len(y) <= max_points:
+        return x, y
+
+    n_columns = max_points // 2
+    if log_x:
+        edges = np.searchsorted(x, np.geomspace(x[0], x[-1], n_columns + 1)[1:-1])
+        edges = np.unique(np.concatenate(([0], edges)))
+        edges = edges[edges < len(y)]
+    else:
+        edges = np.linspace(0, len(y), n_columns, endpoint=False).astype(np.int64)
+    column = np.repeat(np.arange(len(edges)), np.diff(np.append(edges, len(y))))
+
+    # the first index in each column where y equals that column's min / max
+    indices = []
+    for extreme in (np.minimum.reduceat(y, edges), np.maximum.reduceat(y, edges)):
+        match = np.flatnonzero(y == extreme[column])
+        _, first_match = np.unique(column[match], return_index=True)
+        indices.append(match[first_match])
+    indices = np.unique(np.concatenate(indices))
+    return x[indices], y[indices]
+
+
+def decimate_symlog(x: np.ndarray, y: np.ndarray, max_points: int = MAX_POINTS):
+    """
+    Reduces a trace drawn on a symlog x axis, see `decimate`.
+
+    The axis is logarithmic on each side of 0, so the negative and positive
+    halves are decimated on log |x| separately, half the points each. A
+    point at exactly 0 is kept.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        The x values, sorted in ascending order.
+    y : np.ndarray
+        The y values.
+    max_points : int, optional
+        The maximum number of points returned, plus the one at 0.
+
+    Returns
+    -------
+    tuple
+        A tuple containing the decimated x (np.ndarray) and y (np.ndarray),
+        in the original order.
+    """
+    assert x.shape == y.shape, f"x and y shapes differ: {x.shape}, {y.shape}"
+    negative = x < 0
+    negative_x, negative_y = decimate(
+        -x[negative][::-1], y[negative][::-1], max_points // 2, log_x=True
+    )
+    positive_x, positive_y = decimate(
+        x[~negative], y[~negative], max_points // 2, log_x=True
+    )
+    zero = x == 0
+    return (
+        np.concatenate([-negative_x[::-1], x[zero], positive_x]),
+        np.concatenate([negative_y[::-1], y[zero], positive_y]),
+    )
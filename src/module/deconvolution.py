@@ -0,0 +1,165 @@
+from typing import TypedDict
+import numpy as np
+import scipy.fft
+import scipy.signal
+import module.spectrum as spectrum
+
+
+class HarmonicResponse(TypedDict):
+    order: int
+    impulse_response: np.ndarray
+    spectrum: spectrum.spectrum
+    band: tuple[float, float]
+
+
+class deconvolver:
+    def __init__(
+        self,
+        reference_sweep: np.ndarray,
+        inverse_sweep: np.ndarray,
+        sample_rate: float,
+        start_frequency: float,
+        end_frequency: float,
+    ) -> None:
+        """
+        Deconvolves logarithmic sweep renders into linear and harmonic
+        impulse responses (Farina method).
+
+        The spectrum of the inverse filter is computed once per FFT length and
+        reused for every render.
+
+        Parameters
+        ----------
+        reference_sweep : np.ndarray
+            The sweep fed to the plugins, see `generator.sweep_up`.
+        inverse_sweep : np.ndarray
+            Its inverse filter, see `generator.inverse_sweep_up`.
+        sample_rate : float
+            The sample rate of the sweep.
+        start_frequency : float
+            The start frequency of the sweep, in Hertz.
+        end_frequency : float
+            The end frequency of the sweep, in Hertz.
+        """
+        self.inverse_sweep = inverse_sweep
+        self.sample_rate = sample_rate
+        self.start_frequency = start_frequency
+        self.end_frequency = end_frequency
+        self.sweep_length = reference_sweep.shape[0]
+        # time constant of the exponential sweep, in samples
+        self.rate_samples = (self.sweep_length - 1) / np.log(
+            end_frequency / start_frequency
+        )
+        self._inverse_fft: dict[int, np.ndarray] = {}
+        # scale so that the reference sweep deconvolves to 0 dB in the swept band
+        nfft = scipy.fft.next_fast_len(2 * self.sweep_length - 1, real=True)
+        reference_response = np.abs(
+            scipy.fft.rfft(reference_sweep, n=nfft) * self._inverse_spectrum(nfft)
+        )
+        freq = scipy.fft.rfftfreq(nfft, 1 / sample_rate)
+        self.scale = 1 / np.median(
+            reference_response[
+                (freq > 2 * start_frequency) & (freq < end_frequency / 2)
+            ]
+        )
+
+    def _inverse_spectrum(self, nfft: int):
+        if nfft not in self._inverse_fft:
+            self._inverse_fft[nfft] = scipy.fft.rfft(self.inverse_sweep, n=nfft)
+        return self._inverse_fft[nfft]
+
+    def deconvolve(self, render: np.ndarray):
+        """
+        Convolves a render with the inverse filter.
+
+        Parameters
+        ----------
+        render : np.ndarray
+            The sweep render of a plugin.
+
+        Returns
+        -------
+        np.ndarray
+            The full deconvolution. The linear impulse response starts at
+            `len(reference_sweep) - 1` plus the latency of the plugin, and the
+            harmonic responses precede it.
+        """
+        length = render.shape[0] + self.sweep_length - 1
+        nfft = scipy.fft.next_fast_len(length, real=True)
+        return (
+            scipy.fft.irfft(
+                scipy.fft.rfft(render, n=nfft) * self._inverse_spectrum(nfft), n=nfft
+            )[:length]
+            * self.scale
+        )
+
+    def harmonic_offset(self, order: int) -> float:
+        """Distance of the `order`-th harmonic response before the linear one, in samples."""
+        return self.rate_samples * np.log(order)
+
+    def separate(
+        self,
+        render: np.ndarray,
+        n_harmonics: int = 5,
+        ir_length: int = 2**14,
+    ) -> list[HarmonicResponse]:
+        """
+        Extracts the linear and harmonic impulse responses of a render.
+
+        Each response is cut out with a Tukey window that starts 1/8 of its
+        length before its peak. The window is shortened where the responses of
+        neighbouring orders would overlap.
+
+        Parameters
+        ----------
+        render : np.ndarray
+            The sweep render of a plugin.
+        n_harmonics : int, optional
+            The highest harmonic order, 1 being the linear response.
+        ir_length : int, optional
+            The maximum length of each response, in samples.
+
+        Returns
+        -------
+        list[HarmonicResponse]
+            The response and its spectrum for orders 1 to `n_harmonics`.
+            Spectrum frequencies are output frequencies; the excitation
+            frequency of order k is `freq / k`. `band` is the range of output
+            frequencies the sweep excited for that order.
+        """
+        full = self.deconvolve(render)
+        # the linear response is the largest, look for it where it is expected
+        search_start = (
+            self.sweep_length - 1 - int(np.ceil(self.harmonic_offset(2))) // 2
+        )
+        peak = search_start + int(np.argmax(np.abs(full[search_start:])))
+
+        responses = []
+        for order in range(1, n_harmonics + 1):
+            length = ir_length
+            if order > 1:
+                spacing = self.harmonic_offset(order) - self.harmonic_offset(order - 1)
+                length = min(length, int(spacing))
+            pre = length // 8
+            start = peak - int(round(self.harmonic_offset(order))) - pre
+            if start < 0 or length < 8:
+                break
+            taper = scipy.signal.windows.tukey(length, 0.2)
+            impulse_response = full[start : start + length] * taper
+            responses.append(
+                {
+                    "order": order,
+                    "impulse_response": impulse_response,
+                    "spectrum": spectrum.spectrum.from_signal(
+                        impulse_response,
+                        self.sample_rate,
+                        length=max(length, ir_length),
+                        delay=pre,
+                    ),
+                    "band": (
+                        order * self.start_frequency,
+                        min(order * self.end_frequency, self.sample_rate / 2),
+                    ),
+                }
+            )
+        return responses
@@ -0,0 +1,243 @@
+from typing import TypedDict
+import json
+import numpy as np
+import module.metrics as metrics
+
+FORMATS = ("npz", "json", "parquet")
+
+# metrics stored one value per plugin, in column order
+METRIC_COLUMNS = (
+    "latency",
+    "fundamental_freq",
+    "thd",
+    "thd_db",
+    "thd_n",
+    "thd_n_db",
+    "noise_floor_db",
+)
+
+
+class AnalysisExport(TypedDict):
+    title: str
+    magnitude_db: np.ndarray
+    phase: np.ndarray
+    distortion_db: np.ndarray
+    impulse_excerpt: np.ndarray
+
+
+def log_frequency_grid(low: float, high: float, n_points: int):
+    """
+    Returns a logarithmic frequency grid and the edges of its bands.
+
+    Parameters
+    ----------
+    low : float
+        The lowest frequency, in Hertz.
+    high : float
+        The highest frequency, in Hertz.
+    n_points : int
+        The number of grid points.
+
+    Returns
+    -------
+    tuple
+        A tuple containing the band centers (np.ndarray, `n_points`) and the
+        band edges (np.ndarray, `n_points + 1`), in Hertz.
+    """
+    edges = np.geomspace(low, high, n_points + 1)
+    return np.sqrt(edges[:-1] * edges[1:]), edges
+
+
+def peak_on_grid(freq: np.ndarray, values: np.ndarray, edges: np.ndarray):
+    """
+    Reduces a spectrum to the maximum of each band of a frequency grid.
+
+    Like `decimate.decimate`, peaks narrower than a band are kept. Bands
+    narrower than a bin take the value of the bin at their lower edge.
+
+    Parameters
+    ----------
+    freq : np.ndarray
+        The bin frequencies, sorted in ascending order.
+    values : np.ndarray
+        The values of the bins.
+    edges : np.ndarray
+        The band edges, see `log_frequency_grid`.
+
+    Returns
+    -------
+    np.ndarray
+        The maximum of each band, `len(edges) - 1` long.
+    """
+    index = np.searchsorted(freq, edges).clip(0, len(freq) - 1)
+    # reduceat takes values[index] alone where the next index is not larger
+    return np.maximum.reduceat(values, index)[:-1]
+
+
+def nearest_on_grid(freq: np.ndarray, values: np.ndarray, centers: np.ndarray):
+    """
+    Samples a spectrum at the bins nearest to the grid points.
+
+    Used for the phase, whose maximum over a band has no meaning.
+
+    Parameters
+    ----------
+    freq : np.ndarray
+        The bin frequencies, evenly spaced from 0 Hz.
+    values : np.ndarray
+        The values of the bins.
+    centers : np.ndarray
+        The grid points, see `log_frequency_grid`.
+
+    Returns
+    -------
+    np.ndarray
+        The value of the nearest bin of each grid point.
+    """
+    index = np.round(centers / (freq[1] - freq[0])).astype(np.int64)
+    return values[index.clip(0, len(freq) - 1)]
+
+
+def _columns(
+    freq: np.ndarray,
+    export_list: list[AnalysisExport],
+    metrics_list: list[metrics.DistortionMetrics],
+):
+    # the spectra are stored as float32, which resolves dB far below the -200 dB floor
+    columns = {
+        "freq": freq.astype(np.float64),
+        "title": np.array([export["title"] for export in export_list], dtype=str),
+    }
+    for name in ("magnitude_db", "phase", "distortion_db", "impulse_excerpt"):
+        # without plugins there are no rows, the spectra keep their grid
+        empty_shape = (0, len(freq)) if name != "impulse_excerpt" else (0, 0)
+        columns[name] = (
+            np.stack([export[name] for export in export_list]).astype(np.float32)
+            if len(export_list) > 0
+            else np.zeros(empty_shape, dtype=np.float32)
+        )
+    for name in METRIC_COLUMNS:
+        columns[name] = np.array([m[name] for m in metrics_list], dtype=np.float64)
+    columns["harmonic_dbc"] = (
+        np.array([m["harmonic_dbc"] for m in metrics_list], dtype=np.float64)
+        if len(metrics_list) > 0
+        else np.zeros((0, 0))
+    )
+    return columns
+
+
+def _json_list(value: np.ndarray) -> list:
+    # JSON has no NaN or infinity, they are stored as null
+    if value.dtype.kind != "f":
+        return value.tolist()
+    return np.where(np.isfinite(value), value, None).tolist()
+
+
+def write_export(
+    filepath: str,
+    freq: np.ndarray,
+    export_list: list[AnalysisExport],
+    metrics_list: list[metrics.DistortionMetrics],
+    format: str = "npz",
+) -> str:
+    """
+    Writes the spectra, impulse excerpts and metrics of all plugins to one file.
+
+    Rows are plugins and the spectra share the frequency grid `freq`, so every
+    array is a plain `(n_plugins, ...)` column. Without plugins every column
+    has zero rows. JSON stores non-finite values as null.
+
+    Parameters
+    ----------
+    filepath : str
+        The path of the file, without extension.
+    freq : np.ndarray
+        The frequency grid of the spectra, in Hertz.
+    export_list : list[AnalysisExport]
+        The spectra and impulse excerpt of each plugin.
+    metrics_list : list[metrics.DistortionMetrics]
+        The metrics of each plugin, in the order of `export_list`.
+    format : str, optional
+        "npz", "json" or "parquet". Parquet needs pyarrow.
+
+    Returns
+    -------
+    str
+        The path of the written file.
+    """
+    assert format in FORMATS, f"unknown export format: {format}"
+    columns = _columns(freq, export_list, metrics_list)
+    filepath = f"{filepath}.{format}"
+    if format == "npz":
+        np.savez(filepath, **columns)
+    elif format == "json":
+        with open(filepath, "w") as f:
+            json.dump(
+                {name: _json_list(value) for name, value in columns.items()},
+                f,
+                allow_nan=False,
+            )
+    else:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError(
+                "parquet export needs pyarrow: pip install pyarrow"
+            ) from e
+        # one row per plugin, the grid is kept in the schema metadata. The types
+        # are explicit so an export without plugins has them too
+        table = pa.table(
+            {
+                name: (
+                    pa.array(
+                        list(value), type=pa.list_(pa.from_numpy_dtype(value.dtype))
+                    )
+                    if value.ndim > 1
+                    else pa.array(value, type=pa.string() if name == "title" else None)
+                )
+                for name, value in columns.items()
+                if name != "freq"
+            }
+        )
+        table = table.replace_schema_metadata(
+            {"freq": json.dumps(columns["freq"].tolist())}
+        )
+        pq.write_table(table, filepath)
+    return filepath
+
+
+def read_export(filepath: str) -> dict[str, np.ndarray]:
+    """
+    Reads a file written by `write_export`.
+
+    Parameters
+    ----------
+    filepath : str
+        The path of the file, with extension.
+
+    Returns
+    -------
+    dict[str, np.ndarray]
+        The columns of the file, see `write_export`. Nulls of a JSON file are
+        read as NaN.
+    """
+    format = filepath.rsplit(".", 1)[-1]
+    assert format in FORMATS, f"unknown export format: {format}"
+    if format == "npz":
+        with np.load(filepath) as f:
+            return {name: f[name] for name in f.files}
+    if format == "json":
+        with open(filepath) as f:
+            return {
+                name: np.array(value, dtype=str if name == "title" else np.float64)
+                for name, value in json.load(f).items()
+            }
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(filepath)
+    columns = {
+        name: np.array(table.column(name).to_pylist()) for name in table.column_names
+    }
+    columns["freq"] = np.array(json.loads(table.schema.metadata[b"freq"]))
+    return columns
@@ -1,7 +1,143 @@
+from typing import Callable
+import itertools
 import numpy as np
 import scipy.signal
 import os
 import module.io as io
+import module.precision as precision_module
+import module.windows as windows
+
+# window segment for samples start:stop, see windows.gaussian_segment_longdouble
+WindowSegment = Callable[[int, int], np.ndarray]
+
+# two-tone intermodulation tests: (low frequency, high frequency, low to high amplitude ratio)
+IMD_STANDARDS = {
+    # SMPTE RP120 / DIN 45403: a low tone modulating a high tone 4:1
+    "smpte": (60.0, 7000.0, 4.0),
+    # CCIF / ITU-R: two equal high tones 1 kHz apart
+    "ccif": (19000.0, 20000.0, 1.0),
+}
+
+
+class phase_accumulator:
+    def __init__(self, dtype: np.dtype) -> None:
+        """
+        Tracks the phase at the start of each block, in cycles wrapped to [0, 1).
+
+        The block increments are summed with Kahan compensation, so the
+        phase of a long signal does not drift by the rounding of each add.
+
+        Parameters
+        ----------
+        dtype : np.dtype
+            The dtype the phase is kept in.
+        """
+        self.dtype = dtype
+        self.cycles = dtype.type(0)
+        self.compensation = dtype.type(0)
+
+    def advance(self, delta_cycles):
+        """Adds the phase advance of one block, in cycles."""
+        y = np.mod(self.dtype.type(delta_cycles), 1) - self.compensation
+        total = self.cycles + y
+        self.compensation = (total - self.cycles) - y
+        # total < 2, so removing the integer part is exact
+        self.cycles = total - np.floor(total)
+
+
+def impulse(length: int) -> np.ndarray:
+    """
+    Returns the impulse signal fed to the plugins, without saving it.
+
+    It has a single value of 1 at `length // 2` and 0 elsewhere, as
+    `generator.generate_impulse` and `generator.stream_impulse` write it.
+    """
+    signal = np.zeros(length, dtype=np.double)
+    signal[length // 2] = 1.0
+    return signal
+
+
+def _new_products(candidate: int, tones: list[int], n_orders: int) -> list[int]:
+    # the tone, its harmonics and the second and third order intermodulation
+    # products it forms with each earlier tone
+    products = [order * candidate for order in range(1, n_orders + 1)]
+    for tone in tones:
+        products += [
+            candidate + tone,
+            candidate - tone,
+            2 * candidate + tone,
+            2 * candidate - tone,
+            2 * tone + candidate,
+            abs(2 * tone - candidate),
+        ]
+    return [product for product in products if product > 0]
+
+
+def multitone_frequencies(
+    low: float,
+    high: float,
+    n_tones: int,
+    resolution: float,
+    n_orders: int = 3,
+) -> np.ndarray:
+    """
+    Picks roughly log-spaced multitone frequencies whose distortion products do not collide.
+
+    The frequencies are multiples of `resolution`. Each tone is placed at
+    the first multiple from its log-spaced target upwards (downwards only
+    near `high`) where no tone, harmonic
+    up to `n_orders`, or second or third order intermodulation product of any
+    pair falls on the same multiple as another. Every analyzed bin then
+    belongs to exactly one product, see `intermodulation.multitone_table`.
+    `resolution` should span more than the bins a windowed tone spreads to,
+    see `metrics.window_half_width`.
+
+    Parameters
+    ----------
+    low : float
+        The lowest frequency, in Hertz.
+    high : float
+        The highest frequency, in Hertz.
+    n_tones : int
+        The number of tones.
+    resolution : float
+        The frequency grid, in Hertz.
+    n_orders : int, optional
+        The highest harmonic order kept free, 1 being the tone.
+
+    Returns
+    -------
+    np.ndarray
+        The tone frequencies in ascending order, in Hertz.
+    """
+    targets = np.geomspace(low, high, n_tones) / resolution
+    limit = int(np.floor(high / resolution))
+    tones: list[int] = []
+    occupied: set[int] = set()
+    for target in targets:
+        lowest = tones[-1] + 1 if len(tones) > 0 else 1
+        start = min(max(int(np.ceil(target)), lowest), limit + 1)
+        # upwards keeps the tones spread, downwards is left near the top
+        candidates = itertools.chain(
+            range(start, limit + 1), range(start - 1, lowest - 1, -1)
+        )
+        for candidate in candidates:
+            products = _new_products(candidate, tones, n_orders)
+            if len(set(products)) == len(products) and occupied.isdisjoint(products):
+                tones.append(candidate)
+                occupied.update(products)
+                break
+        else:
+            raise AssertionError(
+                f"no room for {n_tones} tones up to {high} Hz at {resolution} Hz resolution"
+            )
+    return np.array(tones, dtype=np.float64) * resolution
+
+
+def schroeder_phases(n_tones: int) -> np.ndarray:
+    """Returns the Schroeder phases of equal tones in radians, which keep the crest factor of their sum low."""
+    k = np.arange(n_tones)
+    return -np.pi * k * (k + 1) / n_tones
 
 
 class generator:
@@ -9,24 +145,364 @@ class generator:
         self,
         sample_rate: float,
         output_dir: str,
+        precision: str = "longdouble",
     ) -> None:
         self.sample_rate = sample_rate
         self.output_dir = output_dir
+        self.dtype = precision_module.real_dtype(precision)
+        # a float32 time axis loses phase accuracy on long signals, so phase is computed in at least float64
+        self.phase_dtype = np.promote_types(self.dtype, np.float64)
         os.makedirs(output_dir, exist_ok=True)
         self.io = io.io()
 
-    def generate_sweep_up(
+    def _stream(
+        self,
+        filename: str,
+        length: int,
+        relative_cycles: Callable[[int, np.ndarray], np.ndarray],
+        amplitude_dBFS: float,
+        window: WindowSegment | None,
+        block_size: int,
+    ):
+        """
+        Writes a sine-based signal block by block into a WAV file.
+
+        `relative_cycles(start, k)` returns the phase of samples `start + k`
+        relative to sample `start`, in cycles. Only the phase at each block
+        start is accumulated, so the values stay small and accurate however
+        long the signal is.
+        """
+        filepath = os.path.join(self.output_dir, filename)
+        accumulator = phase_accumulator(np.dtype(self.phase_dtype))
+        amplitude = 10 ** (amplitude_dBFS / 20)
+        with self.io.open_wav_writer(filepath, self.sample_rate) as writer:
+            for start in range(0, length, block_size):
+                stop = min(start + block_size, length)
+                # one extra sample gives the phase advance of the block
+                cycles = relative_cycles(
+                    start, np.arange(stop - start + 1, dtype=self.phase_dtype)
+                )
+                block = np.sin(2 * np.pi * (accumulator.cycles + cycles[:-1])).astype(
+                    self.dtype
+                )
+                accumulator.advance(cycles[-1])
+                if window is not None:
+                    block *= window(start, stop)
+                block *= amplitude
+                writer.write(block)
+        return filepath
+
+    def stream_sine_wave(
+        self,
+        frequency: float,
+        length: int,
+        amplitude_dBFS: float,
+        window: WindowSegment | None = None,
+        block_size: int = 2**16,
+        filename: str = "sine.wav",
+    ):
+        """
+        Generates a sine wave signal block by block into a WAV file.
+
+        Memory use depends on `block_size` only, so any length can be
+        generated. The samples match `generate_sine_wave`.
+
+        Parameters
+        ----------
+        frequency : float
+            The frequency of the sine wave, in Hertz.
+        length : int
+            The length of the sine wave signal, in samples.
+        amplitude_dBFS : float
+            The amplitude of the sine wave, in decibels relative to full scale.
+        window : WindowSegment, optional
+            Returns the window for samples start:stop. If not provided, no window is applied.
+        block_size : int, optional
+            The number of samples generated at once.
+        filename : str, optional
+            The name of the file in the output directory.
+
+        Returns
+        -------
+        str
+            The path of the written file.
+        """
+        step = self.phase_dtype.type(frequency) / self.sample_rate
+        return self._stream(
+            filename,
+            length,
+            lambda start, k: k * step,
+            amplitude_dBFS,
+            window,
+            block_size,
+        )
+
+    def stream_tones(
+        self,
+        frequencies: np.ndarray,
+        weights: np.ndarray,
+        phases: np.ndarray,
+        length: int,
+        amplitude_dBFS: float,
+        window: WindowSegment | None = None,
+        block_size: int = 2**16,
+        filename: str = "tones.wav",
+    ):
+        """
+        Generates a sum of sine waves block by block into a WAV file.
+
+        The phase of each tone is accumulated per block as in
+        `stream_sine_wave`, so memory use depends on `block_size` and the
+        number of tones only.
+
+        Parameters
+        ----------
+        frequencies : np.ndarray
+            The frequency of each tone, in Hertz.
+        weights : np.ndarray
+            The relative amplitude of each tone. They are scaled to sum to
+            `amplitude_dBFS`, so the signal never exceeds it.
+        phases : np.ndarray
+            The starting phase of each tone, in radians.
+        length : int
+            The length of the signal, in samples.
+        amplitude_dBFS : float
+            The peak amplitude the tones add up to, in decibels relative to full scale.
+        window : WindowSegment, optional
+            Returns the window for samples start:stop. If not provided, no window is applied.
+        block_size : int, optional
+            The number of samples generated at once.
+        filename : str, optional
+            The name of the file in the output directory.
+
+        Returns
+        -------
+        str
+            The path of the written file.
+        """
+        filepath = os.path.join(self.output_dir, filename)
+        steps = (
+            np.asarray(frequencies, dtype=self.phase_dtype)[:, np.newaxis]
+            / self.sample_rate
+        )
+        start_cycles = np.asarray(phases, dtype=self.phase_dtype)[:, np.newaxis] / (
+            2 * np.pi
+        )
+        weights = np.asarray(weights, dtype=self.phase_dtype)
+        amplitudes = (weights / np.sum(weights) * 10 ** (amplitude_dBFS / 20)).astype(
+            self.dtype
+        )
+        accumulator = phase_accumulator(np.dtype(self.phase_dtype))
+        with self.io.open_wav_writer(filepath, self.sample_rate) as writer:
+            for start in range(0, length, block_size):
+                stop = min(start + block_size, length)
+                # (n_tones, samples + 1), the last sample gives the phase advance
+                cycles = np.arange(stop - start + 1, dtype=self.phase_dtype) * steps
+                tones = np.sin(
+                    2
+                    * np.pi
+                    * (
+                        np.reshape(accumulator.cycles, (-1, 1))
+                        + start_cycles
+                        + cycles[:, :-1]
+                    )
+                ).astype(self.dtype)
+                accumulator.advance(cycles[:, -1])
+                block = amplitudes @ tones
+                if window is not None:
+                    block *= window(start, stop)
+                writer.write(block)
+        return filepath
+
+    def stream_multitone(
+        self,
+        frequencies: np.ndarray,
+        length: int,
+        amplitude_dBFS: float,
+        window: WindowSegment | None = None,
+        block_size: int = 2**16,
+        filename: str = "multitone.wav",
+    ):
+        """
+        Generates equal tones with Schroeder phases block by block into a WAV file.
+
+        Parameters
+        ----------
+        frequencies : np.ndarray
+            The frequency of each tone, in Hertz, see `multitone_frequencies`.
+        length : int
+            The length of the signal, in samples.
+        amplitude_dBFS : float
+            The peak amplitude the tones add up to, see `stream_tones`.
+        window : WindowSegment, optional
+            Returns the window for samples start:stop. If not provided, no window is applied.
+        block_size : int, optional
+            The number of samples generated at once.
+        filename : str, optional
+            The name of the file in the output directory.
+
+        Returns
+        -------
+        str
+            The path of the written file.
+        """
+        return self.stream_tones(
+            frequencies,
+            np.ones(len(frequencies)),
+            schroeder_phases(len(frequencies)),
+            length,
+            amplitude_dBFS,
+            window,
+            block_size,
+            filename,
+        )
+
+    def stream_two_tone(
+        self,
+        standard: str,
+        length: int,
+        amplitude_dBFS: float,
+        window: WindowSegment | None = None,
+        block_size: int = 2**16,
+        filename: str | None = None,
+    ):
+        """
+        Generates a two-tone intermodulation test signal block by block into a WAV file.
+
+        Parameters
+        ----------
+        standard : str
+            One of `IMD_STANDARDS`, e.g. "smpte" or "ccif".
+        length : int
+            The length of the signal, in samples.
+        amplitude_dBFS : float
+            The peak amplitude the tones add up to, see `stream_tones`.
+        window : WindowSegment, optional
+            Returns the window for samples start:stop. If not provided, no window is applied.
+        block_size : int, optional
+            The number of samples generated at once.
+        filename : str, optional
+            The name of the file in the output directory. Defaults to
+            "two_tone_<standard>.wav".
+
+        Returns
+        -------
+        str
+            The path of the written file.
+        """
+        assert standard in IMD_STANDARDS, f"unknown IMD standard: {standard}"
+        low_frequency, high_frequency, ratio = IMD_STANDARDS[standard]
+        return self.stream_tones(
+            np.array([low_frequency, high_frequency]),
+            np.array([ratio, 1]),
+            np.zeros(2),
+            length,
+            amplitude_dBFS,
+            window,
+            block_size,
+            f"two_tone_{standard}.wav" if filename is None else filename,
+        )
+
+    def stream_sweep_up(
         self,
         length: int,
         start_frequency: float,
         end_frequency: float,
         amplitude_dBFS: float,
         log_scale: bool = True,
+        block_size: int = 2**16,
+        filename: str = "sweep.wav",
     ):
         """
-        Generates a sine wave sweep signal and saves it as a WAV file.
+        Generates a sine wave sweep signal block by block into a WAV file.
 
-        The sine wave sweep is generated with the specified start and end frequencies and duration.
+        Memory use depends on `block_size` only, so any length can be
+        generated. The samples match `sweep_up`.
+
+        Parameters
+        ----------
+        length : int
+            The length of the sine wave sweep signal, in samples.
+        start_frequency : float
+            The start frequency of the sine wave sweep, in Hertz.
+        end_frequency : float
+            The end frequency of the sine wave sweep, in Hertz.
+        amplitude_dBFS : float
+            The amplitude of the sine wave sweep, in decibels relative to full scale.
+        log_scale : bool, optional
+            If True, the sweep is generated in a logarithmic scale. If False, it is generated in a linear scale.
+        block_size : int, optional
+            The number of samples generated at once.
+        filename : str, optional
+            The name of the file in the output directory.
+
+        Returns
+        -------
+        str
+            The path of the written file.
+        """
+        f1 = self.phase_dtype.type(start_frequency)
+        duration = self.phase_dtype.type(length - 1) / self.sample_rate
+        if log_scale:
+            # phase of scipy.signal.chirp(method="logarithmic"): f1 * T / L * (exp(L * t / T) - 1)
+            log_ratio = np.log(self.phase_dtype.type(end_frequency) / f1)
+            rate = log_ratio / (length - 1)
+            scale = f1 * duration / log_ratio
+
+            def relative_cycles(start, k):
+                return scale * np.exp(start * rate) * np.expm1(k * rate)
+
+        else:
+            # phase of scipy.signal.chirp(method="linear"): f1 * t + beta * t**2 / 2
+            beta = (self.phase_dtype.type(end_frequency) - f1) / duration
+
+            def relative_cycles(start, k):
+                t = k / self.sample_rate
+                return (f1 + beta * start / self.sample_rate) * t + beta * t**2 / 2
+
+        return self._stream(
+            filename, length, relative_cycles, amplitude_dBFS, None, block_size
+        )
+
+    def stream_impulse(
+        self, length: int, block_size: int = 2**16, filename: str = "impulse.wav"
+    ):
+        """
+        Generates the impulse signal of `generate_impulse` block by block into a WAV file.
+
+        Parameters
+        ----------
+        length : int
+            The length of the impulse signal, in samples.
+        block_size : int, optional
+            The number of samples written at once.
+        filename : str, optional
+            The name of the file in the output directory.
+
+        Returns
+        -------
+        str
+            The path of the written file.
+        """
+        filepath = os.path.join(self.output_dir, filename)
+        with self.io.open_wav_writer(filepath, self.sample_rate) as writer:
+            for start in range(0, length, block_size):
+                block = np.zeros(min(block_size, length - start), dtype=np.double)
+                if start <= length // 2 < start + block.shape[0]:
+                    block[length // 2 - start] = 1.0
+                writer.write(block)
+        return filepath
+
+    def sweep_up(
+        self,
+        length: int,
+        start_frequency: float,
+        end_frequency: float,
+        amplitude_dBFS: float,
+        log_scale: bool = True,
+    ):
+        """
+        Generates a sine wave sweep signal without saving it.
 
         Parameters
         ----------
@@ -46,7 +522,7 @@ class generator:
         np.ndarray
             The sine wave sweep signal as a NumPy array.
         """
-        t = np.arange(length, dtype=np.longdouble) / self.sample_rate
+        t = np.arange(length, dtype=self.phase_dtype) / self.sample_rate
 
         if log_scale:
             sweep = scipy.signal.chirp(
@@ -57,7 +533,75 @@ class generator:
                 t, start_frequency, t[-1], end_frequency, method="linear", phi=-90
             )
 
-        sweep = sweep * 10 ** (amplitude_dBFS / 20)
+        return sweep.astype(self.dtype) * 10 ** (amplitude_dBFS / 20)
+
+    def inverse_sweep_up(
+        self,
+        length: int,
+        start_frequency: float,
+        end_frequency: float,
+    ):
+        """
+        Generates the inverse filter of a logarithmic sweep (Farina method).
+
+        It is the time-reversed sweep with an exponentially decaying envelope
+        that compensates the -3 dB/octave energy slope of the sweep, so that
+        convolving a sweep render with it yields the impulse response. It is
+        not normalized, see `deconvolution.deconvolver`.
+
+        Parameters
+        ----------
+        length : int
+            The length of the sweep, in samples.
+        start_frequency : float
+            The start frequency of the sweep, in Hertz.
+        end_frequency : float
+            The end frequency of the sweep, in Hertz.
+
+        Returns
+        -------
+        np.ndarray
+            The inverse filter as a NumPy array.
+        """
+        t = np.arange(length, dtype=self.phase_dtype) / self.sample_rate
+        rate = np.log(end_frequency / start_frequency) / t[-1]
+        sweep = self.sweep_up(length, start_frequency, end_frequency, 0, True)
+        return sweep[::-1] * np.exp(-t * rate).astype(self.dtype)
+
+    def generate_sweep_up(
+        self,
+        length: int,
+        start_frequency: float,
+        end_frequency: float,
+        amplitude_dBFS: float,
+        log_scale: bool = True,
+    ):
+        """
+        Generates a sine wave sweep signal and saves it as a WAV file.
+
+        The sine wave sweep is generated with the specified start and end frequencies and duration.
+
+        Parameters
+        ----------
+        length : int
+            The length of the sine wave sweep signal, in samples.
+        start_frequency : float
+            The start frequency of the sine wave sweep, in Hertz.
+        end_frequency : float
+            The end frequency of the sine wave sweep, in Hertz.
+        amplitude_dBFS : float
+            The amplitude of the sine wave sweep, in decibels relative to full scale.
+        log_scale : bool, optional
+            If True, the sweep is generated in a logarithmic scale. If False, it is generated in a linear scale.
+
+        Returns
+        -------
+        np.ndarray
+            The sine wave sweep signal as a NumPy array.
+        """
+        sweep = self.sweep_up(
+            length, start_frequency, end_frequency, amplitude_dBFS, log_scale
+        )
 
         self.io.save_wav(
             os.path.join(self.output_dir, "sweep.wav"),
@@ -84,16 +628,15 @@ class generator:
         np.ndarray
             The impulse signal as a NumPy array.
         """
-        impulse = np.zeros(length, dtype=np.double)
-        impulse[impulse.shape[0] // 2] = 1.0
+        signal = impulse(length)
 
         self.io.save_wav(
             os.path.join(self.output_dir, "impulse.wav"),
             self.sample_rate,
-            impulse,
+            signal,
         )
 
-        return impulse
+        return signal
 
     def generate_sine_wave(
         self,
@@ -116,7 +659,7 @@ class generator:
         amplitude_dBFS : float
             The amplitude of the sine wave, in decibels relative to full scale.
         window : np.ndarray, optional
-            The window to apply to the sine wave signal. If not provided, a Gaussian window is used.
+            The window to apply to the sine wave signal. If not provided, no window is applied.
 
         Returns
         -------
@@ -124,11 +667,11 @@ class generator:
             A tuple containing the sine wave signal as a NumPy array and the Gaussian window used to generate it.
 
         """
-        t = np.arange(length, dtype=np.longdouble) / self.sample_rate
-        sine_wave = np.sin(2 * np.pi * frequency * t, dtype=np.longdouble)
+        t = np.arange(length, dtype=self.phase_dtype) / self.sample_rate
+        sine_wave = np.sin(2 * np.pi * frequency * t).astype(self.dtype)
 
         if window is not None:
-            sine_wave = sine_wave * window
+            sine_wave *= window
 
         sine_wave = sine_wave * 10 ** (amplitude_dBFS / 20)
 
@@ -0,0 +1,426 @@
+from typing import TypedDict
+import csv
+import os
+import numpy as np
+import module.export as export
+import module.metrics as metrics
+
+MODES = ("store", "compare")
+
+# per-band tolerance: one value for all bands, or (frequency, tolerance) points interpolated on a log frequency axis
+BandTolerance = float | list[tuple[float, float]]
+
+
+class GoldenReference(TypedDict):
+    title: str
+    freq: np.ndarray
+    magnitude_db: np.ndarray
+    phase: np.ndarray
+    distortion_db: np.ndarray
+    impulse_excerpt: np.ndarray
+    metrics: dict[str, float]
+
+
+class GoldenTolerances(TypedDict):
+    magnitude_db: BandTolerance
+    phase: BandTolerance
+    distortion_db: BandTolerance
+    # magnitudes below this are compared as this, and their phase is not compared
+    floor_db: float
+    # the same for the distortion spectrum and the metrics in dB
+    distortion_floor_db: float
+    # by metric name, "harmonic_dbc" applies to every harmonic; unlisted metrics are not compared
+    metrics: dict[str, float]
+
+
+class GoldenCheck(TypedDict):
+    title: str
+    check: str
+    passed: bool
+    worst_freq: float
+    deviation: float
+    tolerance: float
+    failed_bands: int
+
+
+DEFAULT_TOLERANCES: GoldenTolerances = {
+    "magnitude_db": 0.1,
+    "phase": 1.0,
+    "distortion_db": 1.0,
+    "floor_db": -120,
+    "distortion_floor_db": -180,
+    "metrics": {
+        "latency": 0.01,
+        "thd_db": 0.5,
+        "thd_n_db": 0.5,
+        "noise_floor_db": 1.0,
+        "harmonic_dbc": 1.0,
+    },
+}
+
+
+def metric_values(m: metrics.DistortionMetrics) -> dict[str, float]:
+    """Returns the metrics of `export.METRIC_COLUMNS` and each harmonic as `h<order>_dbc`."""
+    values = {name: float(m[name]) for name in export.METRIC_COLUMNS}
+    for order, value in enumerate(m["harmonic_dbc"], start=2):
+        values[f"h{order}_dbc"] = float(value)
+    return values
+
+
+def reduce_references(
+    freq: np.ndarray,
+    export_list: list[export.AnalysisExport],
+    metrics_list: list[metrics.DistortionMetrics],
+    n_bands: int,
+) -> list[GoldenReference]:
+    """
+    Reduces the grid spectra and metrics of a run to golden references.
+
+    The grid points of all plugins are reduced into `n_bands` log-spaced
+    bands at once: the magnitude is the mean in dB, the phase the circular
+    mean, and the distortion the peak, so harmonics are kept. A band without
+    grid points, which happens when `n_bands` is close to `len(freq)`, is
+    merged into the next one, so there can be fewer bands.
+
+    Parameters
+    ----------
+    freq : np.ndarray
+        The frequency grid of the spectra, see `export.log_frequency_grid`.
+    export_list : list[export.AnalysisExport]
+        The grid spectra and impulse excerpt of each plugin.
+    metrics_list : list[metrics.DistortionMetrics]
+        The metrics of each plugin, in the order of `export_list`.
+    n_bands : int
+        The number of bands, at most `len(freq)`.
+
+    Returns
+    -------
+    list[GoldenReference]
+        The reference of each plugin.
+    """
+    n_points = len(freq)
+    assert n_bands <= n_points, f"{n_bands} bands need as many grid points: {n_points}"
+    if len(export_list) == 0:
+        return []
+    _, edges = export.log_frequency_grid(freq[0], freq[-1], n_bands)
+    start = np.searchsorted(freq, edges[:-1] * (1 - 1e-9))
+    # an empty band starts where the next one does, it takes over that band's points
+    start, first = np.unique(start, return_index=True)
+    edges = np.append(edges[first], edges[-1])
+    centers = np.sqrt(edges[:-1] * edges[1:])
+    counts = np.diff(np.append(start, len(freq)))
+    magnitude_db = np.stack([e["magnitude_db"] for e in export_list])
+    phase = np.deg2rad(np.stack([e["phase"] for e in export_list]))
+    distortion_db = np.stack([e["distortion_db"] for e in export_list])
+    band_magnitude = np.add.reduceat(magnitude_db, start, axis=-1) / counts
+    band_phase = np.rad2deg(
+        np.angle(np.add.reduceat(np.exp(1j * phase), start, axis=-1))
+    )
+    band_distortion = np.maximum.reduceat(distortion_db, start, axis=-1)
+    return [
+        {
+            "title": export_list[row]["title"],
+            "freq": centers,
+            "magnitude_db": band_magnitude[row],
+            "phase": band_phase[row],
+            "distortion_db": band_distortion[row],
+            "impulse_excerpt": np.asarray(
+                export_list[row]["impulse_excerpt"], dtype=np.float64
+            ),
+            "metrics": metric_values(metrics_list[row]),
+        }
+        for row in range(len(export_list))
+    ]
+
+
+def _filepath(golden_dir: str, title: str) -> str:
+    return os.path.join(golden_dir, f"{title}.npz")
+
+
+def store(golden_dir: str, references: list[GoldenReference]):
+    """Writes each reference to `<golden_dir>/<title>.npz`, replacing an earlier one."""
+    os.makedirs(golden_dir, exist_ok=True)
+    for reference in references:
+        names = list(reference["metrics"])
+        np.savez(
+            _filepath(golden_dir, reference["title"]),
+            freq=reference["freq"],
+            magnitude_db=reference["magnitude_db"],
+            phase=reference["phase"],
+            distortion_db=reference["distortion_db"],
+            impulse_excerpt=reference["impulse_excerpt"],
+            metric_names=np.array(names),
+            metric_values=np.array([reference["metrics"][name] for name in names]),
+        )
+
+
+def load(golden_dir: str) -> dict[str, GoldenReference]:
+    """Reads the references written by `store`, by title. An absent directory has none."""
+    if not os.path.isdir(golden_dir):
+        return {}
+    references = {}
+    for filename in sorted(os.listdir(golden_dir)):
+        title, extension = os.path.splitext(filename)
+        if extension != ".npz":
+            continue
+        with np.load(os.path.join(golden_dir, filename)) as f:
+            references[title] = {
+                "title": title,
+                "freq": f["freq"],
+                "magnitude_db": f["magnitude_db"],
+                "phase": f["phase"],
+                "distortion_db": f["distortion_db"],
+                "impulse_excerpt": f["impulse_excerpt"],
+                "metrics": dict(
+                    zip(f["metric_names"].tolist(), f["metric_values"].tolist())
+                ),
+            }
+    return references
+
+
+def band_tolerance(tolerance: BandTolerance, freq: np.ndarray) -> np.ndarray:
+    """Returns the tolerance of each band at `freq`, see `BandTolerance`."""
+    if np.isscalar(tolerance):
+        return np.full(len(freq), float(tolerance))
+    points = np.array(sorted(tolerance), dtype=np.float64)
+    return np.interp(np.log(freq), np.log(points[:, 0]), points[:, 1])
+
+
+def _difference(current: np.ndarray, reference: np.ndarray) -> np.ndarray:
+    # NaN on both sides is equal, e.g. a latency that was not detected
+    with np.errstate(invalid="ignore"):
+        deviation = np.abs(current - reference)
+    both = np.isnan(current) & np.isnan(reference)
+    return np.where(both, 0, np.where(np.isnan(deviation), np.inf, deviation))
+
+
+def _check(
+    titles: list[str],
+    check: str,
+    deviation: np.ndarray,
+    tolerance: np.ndarray,
+    freq: np.ndarray,
+) -> list[GoldenCheck]:
+    # deviation is (n_plugins, n_points), tolerance and freq (n_points,)
+    if deviation.shape[-1] == 0:
+        return []
+    failed = deviation > tolerance
+    worst = np.argmax(deviation / np.maximum(tolerance, 1e-300), axis=-1)
+    rows = np.arange(len(titles))
+    return [
+        {
+            "title": titles[row],
+            "check": check,
+            "passed": not bool(failed[row].any()),
+            "worst_freq": float(freq[worst[row]]),
+            "deviation": float(deviation[row, worst[row]]),
+            "tolerance": float(tolerance[worst[row]]),
+            "failed_bands": int(failed[row].sum()),
+        }
+        for row in rows
+    ]
+
+
+def compare(
+    references: list[GoldenReference],
+    golden: dict[str, GoldenReference],
+    tolerances: GoldenTolerances = DEFAULT_TOLERANCES,
+) -> list[GoldenCheck]:
+    """
+    Checks the references of a run against the golden references of the same titles.
+
+    All plugins are compared at once on `(n_plugins, n_bands)` arrays, with
+    the tolerance of each band broadcast over them.
+
+    Parameters
+    ----------
+    references : list[GoldenReference]
+        The references of this run, see `reduce_references`.
+    golden : dict[str, GoldenReference]
+        The stored references by title, see `load`.
+    tolerances : GoldenTolerances, optional
+        The largest absolute deviation that passes, per check.
+
+    Returns
+    -------
+    list[GoldenCheck]
+        For each plugin, one check per spectrum ("magnitude_db", "phase" and
+        "distortion_db"), one per compared metric (all harmonics together as
+        "harmonic_dbc", at the frequency of the worst harmonic) with the
+        worst deviation of each. A plugin with no golden reference, or one
+        stored with other bands, and a golden reference with no plugin in
+        this run fail a "reference" check instead.
+    """
+    checks = []
+    titles = set(reference["title"] for reference in references)
+    comparable = []
+    for reference in references:
+        stored = golden.get(reference["title"])
+        if stored is None or not np.array_equal(stored["freq"], reference["freq"]):
+            checks.append(_missing(reference["title"]))
+            continue
+        comparable.append((reference, stored))
+    for title in sorted(set(golden) - titles):
+        checks.append(_missing(title))
+    if len(comparable) == 0:
+        return checks
+
+    comparable_titles = [reference["title"] for reference, _ in comparable]
+    freq = comparable[0][0]["freq"]
+
+    def stack(name: str, index: int):
+        return np.stack([pair[index][name] for pair in comparable]).astype(np.float64)
+
+    floor_db = tolerances["floor_db"]
+    distortion_floor_db = tolerances["distortion_floor_db"]
+    golden_magnitude = stack("magnitude_db", 1)
+    magnitude = _difference(
+        np.maximum(stack("magnitude_db", 0), floor_db),
+        np.maximum(golden_magnitude, floor_db),
+    )
+    # the phase of bands below the floor is noise
+    phase = np.where(
+        golden_magnitude > floor_db,
+        np.abs(np.mod(stack("phase", 0) - stack("phase", 1) + 180, 360) - 180),
+        0,
+    )
+    distortion = _difference(
+        np.maximum(stack("distortion_db", 0), distortion_floor_db),
+        np.maximum(stack("distortion_db", 1), distortion_floor_db),
+    )
+    spectrum_checks = [
+        _check(
+            comparable_titles,
+            name,
+            deviation,
+            band_tolerance(tolerances[name], freq),
+            freq,
+        )
+        for name, deviation in (
+            ("magnitude_db", magnitude),
+            ("phase", phase),
+            ("distortion_db", distortion),
+        )
+    ]
+
+    metric_checks = []
+    for name, tolerance in tolerances["metrics"].items():
+        if name == "harmonic_dbc":
+            n_harmonics = max(
+                len([key for key in stored["metrics"] if key.endswith("_dbc")])
+                for _, stored in comparable
+            )
+            names = [f"h{order}_dbc" for order in range(2, n_harmonics + 2)]
+        else:
+            names = [name]
+
+        def values(index: int):
+            return np.array(
+                [
+                    [pair[index]["metrics"].get(key, np.nan) for key in names]
+                    for pair in comparable
+                ],
+                dtype=np.float64,
+            ).reshape(len(comparable), len(names))
+
+        current, reference = values(0), values(1)
+        if name.endswith("_db") or name.endswith("_dbc"):
+            current = np.fmax(current, distortion_floor_db)
+            reference = np.fmax(reference, distortion_floor_db)
+        if name == "harmonic_dbc":
+            fundamental_freq = comparable[0][1]["metrics"]["fundamental_freq"]
+            point_freq = np.arange(2, len(names) + 2) * fundamental_freq
+        else:
+            point_freq = np.full(len(names), np.nan)
+        metric_checks.append(
+            _check(
+                comparable_titles,
+                name,
+                _difference(current, reference),
+                np.full(len(names), float(tolerance)),
+                point_freq,
+            )
+        )
+
+    # grouped by plugin, in the order of the checks
+    for row in range(len(comparable)):
+        checks += [
+            group[row] for group in spectrum_checks + metric_checks if len(group) > 0
+        ]
+    return checks
+
+
+def _missing(title: str) -> GoldenCheck:
+    return {
+        "title": title,
+        "check": "reference",
+        "passed": False,
+        "worst_freq": np.nan,
+        "deviation": np.nan,
+        "tolerance": np.nan,
+        "failed_bands": 0,
+    }
+
+
+def reference_columns(
+    references: list[GoldenReference], suffix: str = ""
+) -> dict[str, np.ndarray]:
+    """
+    Returns references as the columns of an export, see `analysis.traces_from_export`.
+
+    Parameters
+    ----------
+    references : list[GoldenReference]
+        The references, all with the same bands.
+    suffix : str, optional
+        Appended to each title, e.g. " (golden)".
+    """
+    return {
+        "freq": references[0]["freq"],
+        "title": np.array([reference["title"] + suffix for reference in references]),
+        "magnitude_db": np.stack(
+            [reference["magnitude_db"] for reference in references]
+        ),
+        "phase": np.stack([reference["phase"] for reference in references]),
+        "distortion_db": np.stack(
+            [reference["distortion_db"] for reference in references]
+        ),
+        "impulse_excerpt": np.stack(
+            [reference["impulse_excerpt"] for reference in references]
+        ),
+        "latency": np.array(
+            [reference["metrics"].get("latency", np.nan) for reference in references]
+        ),
+    }
+
+
+def write_report(filepath: str, checks: list[GoldenCheck]):
+    """
+    Writes the checks as CSV, failed plugins first and each plugin's worst check first.
+
+    Parameters
+    ----------
+    filepath : str
+        The path of the CSV file.
+    checks : list[GoldenCheck]
+        The checks, see `compare`.
+    """
+    failed_titles = set(check["title"] for check in checks if not check["passed"])
+    ordered = sorted(
+        checks,
+        key=lambda check: (
+            check["title"] not in failed_titles,
+            check["title"],
+            check["passed"],
+            (
+                -np.nan_to_num(check["deviation"] / check["tolerance"], nan=np.inf)
+                if check["tolerance"] != 0
+                else 0
+            ),
+        ),
+    )
+    with open(filepath, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(list(GoldenCheck.__annotations__))
+        for check in ordered:
+            writer.writerow(list(check.values()))
@@ -0,0 +1,341 @@
+from typing import TypedDict
+import numpy as np
+import module.generator as generator
+import module.metrics as metrics
+import module.spectrum as spectrum
+
+# the amplitude two-tone products are relative to: the high tone (SMPTE) or the sum of both tones (CCIF)
+IMD_REFERENCE = {"smpte": "high", "ccif": "sum"}
+
+
+class MultitoneTable(TypedDict):
+    tone_freq: np.ndarray
+    # positions in `index`; -1 for harmonics above Nyquist
+    tone: np.ndarray
+    harmonic: np.ndarray
+    imd2: np.ndarray
+    imd3: np.ndarray
+    index: np.ndarray
+
+
+class TwoToneTable(TypedDict):
+    standard: str
+    tone_freq: np.ndarray
+    product_freq: np.ndarray
+    product_order: np.ndarray
+    # the tones first, then the products
+    index: np.ndarray
+
+
+class MultitoneMetrics(TypedDict):
+    title: str
+    tone_freq: list[float]
+    tone_db: list[float]
+    tone_thd_db: list[float]
+    harmonic_dbc: list[list[float]]
+    imd2_db: float
+    imd3_db: float
+    tdn_db: float
+
+
+class TwoToneMetrics(TypedDict):
+    title: str
+    standard: str
+    low_freq: float
+    high_freq: float
+    imd: float
+    imd_db: float
+    imd2_db: float
+    imd3_db: float
+
+
+def multitone_table(
+    tone_freq: np.ndarray,
+    sample_rate: float,
+    fft_size: int,
+    n_orders: int,
+    half_width: int,
+) -> MultitoneTable:
+    """
+    Precomputes the bins of each tone, harmonic and intermodulation product of a multitone.
+
+    Parameters
+    ----------
+    tone_freq : np.ndarray
+        The tone frequencies, in Hertz, see `generator.multitone_frequencies`.
+    sample_rate : float
+        The sample rate of the renders.
+    fft_size : int
+        The FFT length the renders are analyzed with.
+    n_orders : int
+        The highest harmonic order, 1 being the tone.
+    half_width : int
+        The bins on each side of each product, see `metrics.frequency_index_table`.
+
+    Returns
+    -------
+    MultitoneTable
+        The bins of every product in one `(n_products, 2 * half_width + 1)`
+        index table, and the rows of the tones, of the harmonics of each
+        tone (`(n_tones, n_orders - 1)`) and of the second (`a + b`, `a - b`)
+        and third order (`2a + b`, `2a - b`) intermodulation products of each
+        pair of tones. Products above Nyquist are left out.
+    """
+    nyquist = sample_rate / 2
+    tone_freq = np.asarray(tone_freq, dtype=np.float64)
+    harmonic_freq = tone_freq[:, np.newaxis] * np.arange(2, n_orders + 1)
+    a, b = np.meshgrid(tone_freq, tone_freq, indexing="ij")
+    pair = ~np.eye(len(tone_freq), dtype=bool)
+    upper = np.triu(pair)
+    imd2_freq = np.concatenate([(a + b)[upper], np.abs(a - b)[upper]])
+    imd3_freq = np.concatenate([(2 * a + b)[pair], np.abs(2 * a - b)[pair]])
+    imd2_freq = imd2_freq[(imd2_freq > 0) & (imd2_freq < nyquist)]
+    imd3_freq = imd3_freq[(imd3_freq > 0) & (imd3_freq < nyquist)]
+
+    in_band = harmonic_freq < nyquist
+    harmonic = np.full(harmonic_freq.shape, -1, dtype=np.int64)
+    harmonic[in_band] = len(tone_freq) + np.arange(np.count_nonzero(in_band))
+    offset = len(tone_freq) + np.count_nonzero(in_band)
+    freq = np.concatenate([tone_freq, harmonic_freq[in_band], imd2_freq, imd3_freq])
+    return {
+        "tone_freq": tone_freq,
+        "tone": np.arange(len(tone_freq)),
+        "harmonic": harmonic,
+        "imd2": offset + np.arange(len(imd2_freq)),
+        "imd3": offset + len(imd2_freq) + np.arange(len(imd3_freq)),
+        "index": metrics.frequency_index_table(freq, sample_rate, fft_size, half_width),
+    }
+
+
+def two_tone_table(
+    standard: str,
+    sample_rate: float,
+    fft_size: int,
+    n_orders: int,
+    half_width: int,
+) -> TwoToneTable:
+    """
+    Precomputes the bins of the tones and intermodulation products of a two-tone test.
+
+    The products are `|m * low + n * high|` for nonzero m and n with
+    `|m| + |n|` from 2 to `n_orders`, e.g. the SMPTE sidebands
+    `high +- k * low` and the CCIF difference tones `high - low` and
+    `2 * low - high`. Products that fall on the bin of a lower order product
+    or of a tone or harmonic are left out, as are those above Nyquist.
+
+    Parameters
+    ----------
+    standard : str
+        One of `generator.IMD_STANDARDS`.
+    sample_rate : float
+        The sample rate of the renders.
+    fft_size : int
+        The FFT length the renders are analyzed with.
+    n_orders : int
+        The highest intermodulation order.
+    half_width : int
+        The bins on each side of each product, see `metrics.frequency_index_table`.
+
+    Returns
+    -------
+    TwoToneTable
+        The tone and product frequencies, the order of each product, and one
+        index table with the tones first.
+    """
+    assert standard in generator.IMD_STANDARDS, f"unknown IMD standard: {standard}"
+    low_freq, high_freq, _ = generator.IMD_STANDARDS[standard]
+    bin_width = sample_rate / fft_size
+    taken = set(
+        int(round(order * freq / bin_width))
+        for freq in (low_freq, high_freq)
+        for order in range(1, int(sample_rate / 2 / freq) + 1)
+    )
+    product_freq, product_order = [], []
+    for order in range(2, n_orders + 1):
+        for n in range(1, order):
+            for m in (order - n, -(order - n)):
+                freq = abs(m * low_freq + n * high_freq)
+                center = int(round(freq / bin_width))
+                if freq == 0 or freq >= sample_rate / 2 or center in taken:
+                    continue
+                taken.add(center)
+                product_freq.append(freq)
+                product_order.append(order)
+    tone_freq = np.array([low_freq, high_freq])
+    product_freq = np.array(product_freq, dtype=np.float64)
+    return {
+        "standard": standard,
+        "tone_freq": tone_freq,
+        "product_freq": product_freq,
+        "product_order": np.array(product_order, dtype=np.int64),
+        "index": metrics.frequency_index_table(
+            np.concatenate([tone_freq, product_freq]), sample_rate, fft_size, half_width
+        ),
+    }
+
+
+def _energies(spectrum_list: list[spectrum.spectrum], index: np.ndarray) -> np.ndarray:
+    # (n_renders, n_products), the power summed over the bins of each product
+    energy = np.empty((len(spectrum_list), index.shape[0]), dtype=np.float64)
+    for row, _spectrum in enumerate(spectrum_list):
+        energy[row] = np.sum(np.abs(_spectrum.values[index]) ** 2, axis=-1)
+    return energy
+
+
+def multitone_metrics(
+    spectrum_list: list[spectrum.spectrum],
+    title_list: list[str],
+    table: MultitoneTable,
+    low_freq: float = 10,
+    order_gain: np.ndarray | None = None,
+) -> list[MultitoneMetrics]:
+    """
+    Computes tone levels, per-tone harmonics and intermodulation of multitone renders.
+
+    Only the bins of `table` and one power sum are taken from each
+    spectrum; everything else is computed on `(n_renders, n_products)` arrays.
+
+    Parameters
+    ----------
+    spectrum_list : list[spectrum.spectrum]
+        The spectra of the multitone renders, all with the length `table`
+        was built for.
+    title_list : list[str]
+        The title of each render.
+    table : MultitoneTable
+        The bins of the products, see `multitone_table`.
+    low_freq : float, optional
+        Energy below this frequency is ignored for the total distortion and noise.
+    order_gain : np.ndarray, optional
+        The gain of each order under the window of the tones, see
+        `metrics.window_order_gain`, up to the highest harmonic order and
+        at least 3. The harmonic and intermodulation energies are divided by
+        it, so the levels are those of steady tones.
+
+    Returns
+    -------
+    list[MultitoneMetrics]
+        The metrics of each render, in dB. Tone levels are relative to the
+        strongest tone, harmonics to their own tone (NaN above Nyquist), and
+        the intermodulation orders and the total distortion and noise (all
+        energy outside the tone bins) to the energy of all tones. The total
+        distortion and noise mixes all orders, so it is not corrected by
+        `order_gain` and holds for the windowed tones.
+    """
+    if len(spectrum_list) == 0:
+        return []
+    energy = _energies(spectrum_list, table["index"])
+    noise = np.empty(len(spectrum_list), dtype=np.float64)
+    band = spectrum_list[0].band(low_freq, spectrum_list[0].sample_rate / 2)
+    tone_bins = table["index"][table["tone"]]
+    tone_bins = tone_bins[(tone_bins >= band.start) & (tone_bins < band.stop)]
+    for row, _spectrum in enumerate(spectrum_list):
+        # summed with the tone bins zeroed, as in metrics.distortion_metrics
+        power = np.abs(_spectrum.values[band]) ** 2
+        power[tone_bins - band.start] = 0
+        noise[row] = np.sum(power)
+
+    tone = energy[:, table["tone"]]
+    # -1 picks the NaN column appended for the harmonics above Nyquist
+    harmonic = np.concatenate(
+        [energy, np.full((len(spectrum_list), 1), np.nan)], axis=-1
+    )[:, table["harmonic"]]
+    imd2 = energy[:, table["imd2"]].sum(axis=-1)
+    imd3 = energy[:, table["imd3"]].sum(axis=-1)
+    if order_gain is not None:
+        # the harmonic columns are orders 2, 3, ...
+        harmonic = harmonic / order_gain[1 : harmonic.shape[-1] + 1]
+        imd2 = imd2 / order_gain[1]
+        imd3 = imd3 / order_gain[2]
+    total = tone.sum(axis=-1)
+    with np.errstate(divide="ignore"):
+        tone_db = 10 * np.log10(tone / tone.max(axis=-1, keepdims=True))
+        harmonic_dbc = 10 * np.log10(harmonic / tone[:, :, np.newaxis])
+        tone_thd_db = 10 * np.log10(np.nansum(harmonic, axis=-1) / tone)
+        imd2_db = 10 * np.log10(imd2 / total)
+        imd3_db = 10 * np.log10(imd3 / total)
+        tdn_db = 10 * np.log10(noise / total)
+
+    return [
+        {
+            "title": title_list[row],
+            "tone_freq": table["tone_freq"].tolist(),
+            "tone_db": tone_db[row].tolist(),
+            "tone_thd_db": tone_thd_db[row].tolist(),
+            "harmonic_dbc": harmonic_dbc[row].tolist(),
+            "imd2_db": float(imd2_db[row]),
+            "imd3_db": float(imd3_db[row]),
+            "tdn_db": float(tdn_db[row]),
+        }
+        for row in range(len(spectrum_list))
+    ]
+
+
+def two_tone_metrics(
+    spectrum_list: list[spectrum.spectrum],
+    title_list: list[str],
+    table: TwoToneTable,
+    order_gain: np.ndarray | None = None,
+) -> list[TwoToneMetrics]:
+    """
+    Computes the intermodulation distortion of two-tone renders.
+
+    Parameters
+    ----------
+    spectrum_list : list[spectrum.spectrum]
+        The spectra of the two-tone renders, all with the length `table`
+        was built for.
+    title_list : list[str]
+        The title of each render.
+    table : TwoToneTable
+        The bins of the tones and products, see `two_tone_table`.
+    order_gain : np.ndarray, optional
+        The gain of each order under the window of the tones, see
+        `metrics.window_order_gain`, up to the highest product order. The
+        product energies are divided by it, so the levels are those of
+        steady tones. Without it, an order k product reads low by about
+        `5 * log10(k)` dB under a Gaussian window.
+
+    Returns
+    -------
+    list[TwoToneMetrics]
+        The metrics of each render. `imd` is the root sum square of the
+        product amplitudes relative to the reference amplitude of
+        `IMD_REFERENCE`, as a ratio and in dB, and `imd2_db` and `imd3_db`
+        are the same over the second and third order products only.
+    """
+    if len(spectrum_list) == 0:
+        return []
+    energy = _energies(spectrum_list, table["index"])
+    amplitude = np.sqrt(energy[:, :2])
+    reference = (
+        amplitude[:, 1]
+        if IMD_REFERENCE[table["standard"]] == "high"
+        else amplitude.sum(axis=-1)
+    )
+    products = energy[:, 2:]
+    if order_gain is not None:
+        products = products / order_gain[table["product_order"] - 1]
+    imd = np.sqrt(products.sum(axis=-1)) / reference
+    with np.errstate(divide="ignore"):
+        imd_db = 20 * np.log10(imd)
+        imd2_db = 20 * np.log10(
+            np.sqrt(products[:, table["product_order"] == 2].sum(axis=-1)) / reference
+        )
+        imd3_db = 20 * np.log10(
+            np.sqrt(products[:, table["product_order"] == 3].sum(axis=-1)) / reference
+        )
+
+    return [
+        {
+            "title": title_list[row],
+            "standard": table["standard"],
+            "low_freq": float(table["tone_freq"][0]),
+            "high_freq": float(table["tone_freq"][1]),
+            "imd": float(imd[row]),
+            "imd_db": float(imd_db[row]),
+            "imd2_db": float(imd2_db[row]),
+            "imd3_db": float(imd3_db[row]),
+        }
+        for row in range(len(spectrum_list))
+    ]
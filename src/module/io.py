@@ -1,7 +1,23 @@
 from scipy.io import wavfile
+from typing import TypedDict
 import os
+import struct
 import numpy as np
 
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class WavInfo(TypedDict):
+    sample_rate: int
+    channels: int
+    format_tag: int
+    container_bit_depth: int
+    bit_depth: int
+    data_offset: int
+    frames: int
+
 
 class io:
     def __init__(self) -> None:
@@ -28,7 +44,238 @@ class io:
         assert os.path.splitext(filepath)[1] == ".wav", f"file is not wav: {filepath}"
         wavfile.write(filepath, sample_rate, audio_data_64bf)
 
-    def load_wav_as_mono(self, filepath: str):
+    def open_wav_writer(self, filepath: str, sample_rate: int, channels: int = 1):
+        """
+        Opens a WAV file to be written block by block, see `wav_writer`.
+
+        Parameters
+        ----------
+        filepath : str
+            The path where the WAV file will be saved. Must have a ".wav" extension.
+        sample_rate : int
+            The sample rate of the audio data.
+        channels : int, optional
+            The number of channels.
+
+        Returns
+        -------
+        wav_writer
+            The writer, to be used as a context manager.
+        """
+        return wav_writer(filepath, sample_rate, channels)
+
+    def read_wav_info(self, filepath: str) -> WavInfo:
+        """
+        Parses the RIFF header of a WAV file without reading the sample data.
+
+        Parameters
+        ----------
+        filepath : str
+            The path to the WAV file.
+
+        Returns
+        -------
+        WavInfo
+            The sample rate, channel count, sample format, container and valid
+            bit depth, byte offset of the data chunk and number of frames.
+            For WAVE_FORMAT_EXTENSIBLE files the format is taken from the
+            sub-format GUID and the bit depth from wValidBitsPerSample.
+
+        Raises
+        ------
+        AssertionError
+            If the file does not exist, is not a RIFF/WAVE file, or has no
+            fmt or data chunk.
+        """
+        assert os.path.exists(filepath), f"file not found: {filepath}"
+        assert os.path.splitext(filepath)[1] == ".wav", f"file is not wav: {filepath}"
+
+        file_size = os.path.getsize(filepath)
+        fmt = None
+        data_offset = None
+        data_size = None
+        with open(filepath, "rb") as f:
+            riff, _, wave = struct.unpack("<4sI4s", f.read(12))
+            assert (
+                riff == b"RIFF" and wave == b"WAVE"
+            ), f"not a RIFF/WAVE file: {filepath}"
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    break
+                chunk_id, chunk_size = struct.unpack("<4sI", header)
+                if chunk_id == b"fmt ":
+                    fmt = f.read(chunk_size)
+                elif chunk_id == b"data":
+                    data_offset = f.tell()
+                    # some writers leave the size at 0 or 0xFFFFFFFF while streaming
+                    data_size = min(chunk_size, file_size - data_offset)
+                    if fmt is not None:
+                        break
+                    f.seek(chunk_size, os.SEEK_CUR)
+                else:
+                    f.seek(chunk_size, os.SEEK_CUR)
+                # chunks are word aligned
+                if chunk_size % 2 == 1:
+                    f.seek(1, os.SEEK_CUR)
+
+        assert fmt is not None, f"fmt chunk not found: {filepath}"
+        assert data_offset is not None, f"data chunk not found: {filepath}"
+
+        format_tag, channels, sample_rate, _, block_align, container_bit_depth = (
+            struct.unpack("<HHIIHH", fmt[:16])
+        )
+        bit_depth = container_bit_depth
+        if format_tag == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 40:
+            valid_bits, _, sub_format = struct.unpack("<HI16s", fmt[18:40])
+            if valid_bits != 0:
+                bit_depth = valid_bits
+            format_tag = struct.unpack("<H", sub_format[:2])[0]
+        assert format_tag in (
+            WAVE_FORMAT_PCM,
+            WAVE_FORMAT_IEEE_FLOAT,
+        ), f"unsupported wav format {format_tag:#06x}: {filepath}"
+
+        return {
+            "sample_rate": sample_rate,
+            "channels": channels,
+            "format_tag": format_tag,
+            "container_bit_depth": container_bit_depth,
+            "bit_depth": bit_depth,
+            "data_offset": data_offset,
+            "frames": data_size // block_align,
+        }
+
+    def load_wav(
+        self,
+        filepath: str,
+        channel: int | None = 0,
+        start: int = 0,
+        stop: int | None = None,
+        dtype: np.dtype = np.longdouble,
+        out: np.ndarray | None = None,
+    ):
+        """
+        Loads one or all channels of a sample range from a WAV file.
+
+        The data chunk is memory-mapped, and only the selected channel and
+        range is converted to `dtype` and scaled to [-1.0, 1.0).
+
+        Parameters
+        ----------
+        filepath : str
+            The path to the WAV file to be loaded.
+        channel : int or None, optional
+            The channel to load. None loads all channels as one
+            `(channels, stop - start)` array.
+        start : int, optional
+            The first frame to load.
+        stop : int, optional
+            The frame after the last one to load. Defaults to the end of the file.
+        dtype : np.dtype, optional
+            The dtype of the returned audio data.
+        out : np.ndarray, optional
+            An array of at least `stop - start` samples along its last axis
+            (1-D, or `(channels, ...)` with `channel` None) to write the audio
+            data into instead of allocating a new one.
+
+        Returns
+        -------
+        tuple
+            A tuple containing the sample rate (int) and the audio data (np.ndarray).
+
+        Raises
+        ------
+        AssertionError
+            If the file cannot be parsed, or the channel or range is out of bounds.
+        """
+        info = self.read_wav_info(filepath)
+        stop = info["frames"] if stop is None else stop
+        assert (
+            channel is None or 0 <= channel < info["channels"]
+        ), f"channel out of range: {channel}"
+        assert (
+            0 <= start <= stop <= info["frames"]
+        ), f"range out of bounds: {start}:{stop}"
+
+        length = stop - start
+        # frames are interleaved, so all channels come as (length, channels)
+        # and are transposed into out
+        shape = (length,) if channel is not None else (info["channels"], length)
+        if out is None:
+            out = np.empty(shape, dtype=dtype)
+        else:
+            assert (
+                out.shape[:-1] == shape[:-1]
+            ), f"out has {out.shape[:-1]} channels, not {shape[:-1]}"
+            assert out.shape[-1] >= length, f"out is too short: {out.shape[-1]}"
+            out = out[..., :length]
+
+        def select(raw: np.ndarray) -> np.ndarray:
+            # the selected samples of a memory-mapped (frames, channels, ...) array
+            if channel is not None:
+                return raw[start:stop, channel]
+            return np.moveaxis(raw[start:stop], 1, 0)
+
+        if length == 0:
+            return info["sample_rate"], out
+
+        container_bytes = info["container_bit_depth"] // 8
+        frame_shape = (info["frames"], info["channels"])
+        if info["format_tag"] == WAVE_FORMAT_IEEE_FLOAT:
+            raw = np.memmap(
+                filepath,
+                dtype=f"<f{container_bytes}",
+                mode="r",
+                offset=info["data_offset"],
+                shape=frame_shape,
+            )
+            out[:] = select(raw)
+            scale = None
+        elif container_bytes == 1:
+            # 8-bit pcm is unsigned
+            raw = np.memmap(
+                filepath,
+                dtype=np.uint8,
+                mode="r",
+                offset=info["data_offset"],
+                shape=frame_shape,
+            )
+            out[:] = select(raw)
+            out -= 128
+            scale = 2**7
+        elif container_bytes == 3:
+            # no 24-bit dtype, so left-justify the bytes into int32
+            raw = np.memmap(
+                filepath,
+                dtype=np.uint8,
+                mode="r",
+                offset=info["data_offset"],
+                shape=frame_shape + (3,),
+            )
+            padded = np.zeros(shape + (4,), dtype=np.uint8)
+            padded[..., 1:] = select(raw)
+            out[:] = padded.view("<i4")[..., 0]
+            scale = 2**31
+        else:
+            raw = np.memmap(
+                filepath,
+                dtype=f"<i{container_bytes}",
+                mode="r",
+                offset=info["data_offset"],
+                shape=frame_shape,
+            )
+            out[:] = select(raw)
+            scale = 2 ** (info["container_bit_depth"] - 1)
+        del raw
+
+        # samples are left-justified in the container, so this also covers
+        # valid bits < container bits
+        if scale is not None:
+            out /= scale
+        return info["sample_rate"], out
+
+    def load_wav_as_mono(self, filepath: str, dtype: np.dtype = np.longdouble):
         """
         Loads a WAV file and returns the audio data as mono.
 
@@ -36,6 +283,8 @@ class io:
         ----------
         filepath : str
             The path to the WAV file to be loaded.
+        dtype : np.dtype, optional
+            The dtype of the returned audio data.
 
         Returns
         -------
@@ -47,30 +296,95 @@ class io:
         AssertionError
             If the file does not exist or if the file extension is not ".wav".
         """
-        assert os.path.exists(filepath), f"file not found: {filepath}"
-        assert os.path.splitext(filepath)[1] == ".wav", f"file is not wav: {filepath}"
+        info = self.read_wav_info(filepath)
 
-        sample_rate, audio = wavfile.read(filepath)
-        estimated_int_bit_depth = 0
-        if audio.dtype == np.int16:
-            estimated_int_bit_depth = 16
-        elif audio.dtype == np.int32:
-            if np.max(audio) > 2**15:
-                estimated_int_bit_depth = 32
-            else:
-                estimated_int_bit_depth = 24
+        # if odd length, add 0 to last
+        audio = np.zeros(info["frames"] + info["frames"] % 2, dtype=dtype)
+        sample_rate, _ = self.load_wav(filepath, channel=0, dtype=dtype, out=audio)
+        return sample_rate, audio
 
-        audio = audio.astype(np.longdouble)
-        if estimated_int_bit_depth != 0:
-            audio /= 2 ** (estimated_int_bit_depth - 1)
 
-        # if odd length, add 0 to last
-        if audio.shape[0] % 2 == 1:
-            audio = np.concatenate(
-                [audio, np.zeros((1, audio.shape[1]), dtype=np.longdouble)],
-                dtype=np.longdouble,
+class wav_writer:
+    # RIFF size limit; the sizes are patched in as uint32
+    MAX_DATA_BYTES = 2**32 - 1 - 58
+
+    def __init__(self, filepath: str, sample_rate: int, channels: int = 1) -> None:
+        """
+        Writes a 64-bit float WAV file incrementally.
+
+        The header is written with zero sizes first and patched on `close`,
+        so only the block being written is held in memory. The format is the
+        same as `io.save_wav` writes for float64 data.
+
+        Parameters
+        ----------
+        filepath : str
+            The path where the WAV file will be saved. Must have a ".wav" extension.
+        sample_rate : int
+            The sample rate of the audio data.
+        channels : int, optional
+            The number of channels.
+        """
+        assert os.path.splitext(filepath)[1] == ".wav", f"file is not wav: {filepath}"
+        self.filepath = filepath
+        self.channels = channels
+        self.frames = 0
+        self.block_align = 8 * channels
+        self.file = open(filepath, "wb")
+        self.file.write(struct.pack("<4sI4s", b"RIFF", 0, b"WAVE"))
+        self.file.write(
+            struct.pack(
+                "<4sIHHIIHHH",
+                b"fmt ",
+                18,
+                WAVE_FORMAT_IEEE_FLOAT,
+                channels,
+                sample_rate,
+                sample_rate * self.block_align,
+                self.block_align,
+                64,
+                0,
             )
+        )
+        # non-PCM files carry the frame count in a fact chunk
+        self.fact_offset = self.file.tell() + 8
+        self.file.write(struct.pack("<4sII", b"fact", 4, 0))
+        self.file.write(struct.pack("<4sI", b"data", 0))
+        self.data_offset = self.file.tell()
+
+    def write(self, block: np.ndarray):
+        """
+        Appends frames to the file.
+
+        Parameters
+        ----------
+        block : np.ndarray
+            The frames, 1-D for mono or `(frames, channels)`, scaled to [-1.0, 1.0].
+        """
+        block = np.asarray(block, dtype="<f8").reshape(-1, self.channels)
+        assert (
+            self.frames + block.shape[0]
+        ) * self.block_align <= self.MAX_DATA_BYTES, (
+            f"wav file exceeds 4 GiB: {self.filepath}"
+        )
+        block.tofile(self.file)
+        self.frames += block.shape[0]
+
+    def close(self):
+        """Patches the chunk sizes and closes the file."""
+        if self.file.closed:
+            return
+        data_size = self.frames * self.block_align
+        self.file.seek(4)
+        self.file.write(struct.pack("<I", self.data_offset - 8 + data_size))
+        self.file.seek(self.fact_offset)
+        self.file.write(struct.pack("<I", self.frames))
+        self.file.seek(self.data_offset - 4)
+        self.file.write(struct.pack("<I", data_size))
+        self.file.close()
+
+    def __enter__(self):
+        return self
 
-        # print(audio.shape)
-        audio_data_per_channel = audio if len(audio.shape) == 1 else audio[:, 0]
-        return sample_rate, audio_data_per_channel
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,124 @@
+import numpy as np
+import scipy.fft
+import module.spectrum as spectrum
+
+
+class latency_estimator:
+    def __init__(
+        self, reference: np.ndarray, reference_delay: float | None = None
+    ) -> None:
+        """
+        Estimates the latency of plugin renders by FFT cross-correlation
+        with the signal fed to the plugins.
+
+        The spectrum of the reference is computed once per FFT length and
+        reused for every render, and the renders are correlated in one batched
+        inverse FFT. The integer peak is refined to a fraction of a sample
+        with Newton steps on the band-limited correlation, evaluated from the
+        spectra directly.
+
+        Parameters
+        ----------
+        reference : np.ndarray
+            The signal fed to the plugins, see `generator.impulse`.
+        reference_delay : float, optional
+            The position of the reference instant in `reference`, in samples.
+            Defaults to the center, where `generator.impulse` puts the impulse.
+        """
+        self.reference = reference
+        self.reference_delay = (
+            reference.shape[0] // 2 if reference_delay is None else reference_delay
+        )
+        self._reference_fft: dict[int, np.ndarray] = {}
+
+    def _reference_spectrum(self, length: int):
+        if length not in self._reference_fft:
+            self._reference_fft[length] = np.conj(
+                scipy.fft.rfft(self.reference, n=length)
+            )
+        return self._reference_fft[length]
+
+    def estimate(
+        self,
+        spectrum_list: list[spectrum.spectrum],
+        workers: int | None = None,
+        n_refine: int = 3,
+    ) -> np.ndarray:
+        """
+        Returns the latency of each render relative to its `delay`.
+
+        Parameters
+        ----------
+        spectrum_list : list[spectrum.spectrum]
+            The spectra of the renders, all with the same length, see
+            `spectrum.spectrum.from_signals`. Their `delay` is where the
+            reference instant is without latency.
+        workers : int, optional
+            The number of workers passed to `scipy.fft.irfft`.
+        n_refine : int, optional
+            The number of Newton steps of the sub-sample refinement, 0 keeps
+            the parabolic estimate.
+
+        Returns
+        -------
+        np.ndarray
+            The latency of each render in samples, as float64. Positive when
+            the render lags the reference. Lags beyond half the FFT length
+            wrap around.
+        """
+        if len(spectrum_list) == 0:
+            return np.empty(0, dtype=np.float64)
+        length = spectrum_list[0].length
+        assert all(
+            _spectrum.length == length for _spectrum in spectrum_list
+        ), "the spectra differ in length"
+        cross = np.stack([_spectrum.values for _spectrum in spectrum_list])
+        cross *= self._reference_spectrum(length)
+        correlation = np.abs(scipy.fft.irfft(cross, n=length, axis=-1, workers=workers))
+        peak = np.argmax(correlation, axis=-1)
+        rows = np.arange(len(spectrum_list))
+        # parabola through the peak and its neighbours, wrapping around the ends
+        before = correlation[rows, (peak - 1) % length].astype(np.float64)
+        center = correlation[rows, peak].astype(np.float64)
+        after = correlation[rows, (peak + 1) % length].astype(np.float64)
+        denominator = before - 2 * center + after
+        with np.errstate(divide="ignore", invalid="ignore"):
+            offset = np.where(denominator < 0, (before - after) / (2 * denominator), 0)
+        del correlation
+        lag = peak + offset
+        for _ in range(n_refine):
+            lag = self._newton_step(cross, length, lag)
+        # lags past half the length are negative lags of the circular correlation
+        lag = np.mod(lag + length // 2, length) - length // 2
+        delays = np.array(
+            [_spectrum.delay for _spectrum in spectrum_list], dtype=np.float64
+        )
+        return lag + self.reference_delay - delays
+
+    @staticmethod
+    def _newton_step(cross: np.ndarray, length: int, lag: np.ndarray) -> np.ndarray:
+        # derivatives of c(t) = sum_k w_k Re(cross_k exp(2 pi i k t / length)),
+        # the correlation between the samples. The one-sided bins count
+        # twice, except DC and (for even lengths) Nyquist
+        k = np.arange(cross.shape[-1], dtype=np.float64)
+        weight = np.full(cross.shape[-1], 2.0)
+        weight[0] = 1
+        if length % 2 == 0:
+            weight[-1] = 1
+        omega = 2 * np.pi * k / length
+        result = lag.copy()
+        for row in range(cross.shape[0]):
+            # k * lag is reduced modulo length first to keep the argument small
+            rotated = cross[row] * np.exp(
+                2j * np.pi * np.mod(k * lag[row], length) / length
+            )
+            value = np.sum(weight * rotated.real)
+            first = -np.sum(weight * omega * rotated.imag)
+            second = -np.sum(weight * omega**2 * rotated.real)
+            # |c| is maximized, so a negative peak (inverted polarity) works too
+            if second * value < 0:
+                step = first / second
+                # a far step means the parabola was already closer
+                if abs(step) < 1:
+                    result[row] = lag[row] - step
+        return result
@@ -0,0 +1,309 @@
+from typing import TypedDict
+import numpy as np
+import scipy.fft
+import module.spectrum as spectrum
+
+
+class DistortionMetrics(TypedDict):
+    title: str
+    # of the plugin's impulse render, in samples, NaN if not detected
+    latency: float
+    fundamental_freq: float
+    harmonic_dbc: list[float]
+    thd: float
+    thd_db: float
+    thd_n: float
+    thd_n_db: float
+    noise_floor_db: float
+
+
+def window_half_width(
+    window: np.ndarray | None,
+    fft_size: int,
+    floor_db: float = -200,
+) -> int:
+    """
+    Returns how many bins a windowed tone spreads to on each side of its bin.
+
+    Parameters
+    ----------
+    window : np.ndarray or None
+        The window applied to the test tone, or None for no window.
+    fft_size : int
+        The FFT length the renders are analyzed with.
+    floor_db : float, optional
+        The level below the peak at which the window spectrum counts as ended.
+
+    Returns
+    -------
+    int
+        The half width of the window's main lobe down to `floor_db`, in bins.
+        Without a window, the tone leaks everywhere and `fft_size // 2` is returned.
+    """
+    if window is None:
+        return fft_size // 2
+    magnitude = np.abs(scipy.fft.rfft(window, n=fft_size))
+    above = np.flatnonzero(20 * np.log10(magnitude / magnitude[0] + 1e-300) < floor_db)
+    return int(above[0]) if len(above) > 0 else fft_size // 2
+
+
+def window_order_gain(window: np.ndarray | None, n_orders: int) -> np.ndarray:
+    """
+    Returns how a window scales the energy of distortion products of each order.
+
+    A product of order k of a windowed tone carries the k-th power of the
+    window as its envelope, so its energy relative to the tone is scaled by
+    `sum(w ** (2 * k)) / sum(w ** 2)`, about `1 / sqrt(k)` for a Gaussian.
+    Dividing the measured energies by this gives the levels of a steady tone.
+
+    Parameters
+    ----------
+    window : np.ndarray or None
+        The window applied to the test tone, or None for no window.
+    n_orders : int
+        The highest order, 1 being the tone.
+
+    Returns
+    -------
+    np.ndarray
+        The `(n_orders,)` gain of orders 1 to `n_orders`, as float64. The
+        first is 1, and all are 1 without a window.
+    """
+    gain = np.ones(n_orders, dtype=np.float64)
+    if window is None:
+        return gain
+    power = np.asarray(window, dtype=np.float64) ** 2
+    total = np.sum(power)
+    product = power.copy()
+    for order in range(2, n_orders + 1):
+        product *= power
+        gain[order - 1] = np.sum(product) / total
+    return gain
+
+
+def harmonic_index_table(
+    fundamental_freq: float,
+    sample_rate: float,
+    fft_size: int,
+    n_harmonics: int,
+    half_width: int,
+) -> np.ndarray:
+    """
+    Precomputes the bins around the fundamental and each harmonic.
+
+    Parameters
+    ----------
+    fundamental_freq : float
+        The test tone frequency, in Hertz.
+    sample_rate : float
+        The sample rate of the renders.
+    fft_size : int
+        The FFT length the renders are analyzed with.
+    n_harmonics : int
+        The highest harmonic order, 1 being the fundamental.
+    half_width : int
+        The bins on each side of each harmonic, see `window_half_width`.
+        Limited so that neighbouring harmonics do not overlap.
+
+    Returns
+    -------
+    np.ndarray
+        A `(orders, 2 * half_width + 1)` array of bin indices, for orders up
+        to `n_harmonics` that lie below Nyquist.
+    """
+    bin_width = sample_rate / fft_size
+    half_width = max(0, min(half_width, int(fundamental_freq / bin_width / 2) - 1))
+    orders = np.arange(1, n_harmonics + 1)
+    centers = np.round(orders * fundamental_freq / bin_width).astype(np.int64)
+    centers = centers[centers + half_width <= fft_size // 2]
+    return centers[:, np.newaxis] + np.arange(-half_width, half_width + 1)
+
+
+def frequency_index_table(
+    freq: np.ndarray,
+    sample_rate: float,
+    fft_size: int,
+    half_width: int,
+) -> np.ndarray:
+    """
+    Precomputes the bins around arbitrary frequencies, e.g. tones and their products.
+
+    Parameters
+    ----------
+    freq : np.ndarray
+        The frequencies, in Hertz, between 0 and Nyquist.
+    sample_rate : float
+        The sample rate of the renders.
+    fft_size : int
+        The FFT length the renders are analyzed with.
+    half_width : int
+        The bins on each side of each frequency, see `window_half_width`.
+        Limited so that neighbouring frequencies do not overlap and the
+        bands stay between 0 and Nyquist.
+
+    Returns
+    -------
+    np.ndarray
+        A `(len(freq), 2 * half_width + 1)` array of bin indices.
+    """
+    centers = np.round(np.asarray(freq) * fft_size / sample_rate).astype(np.int64)
+    if len(centers) > 1:
+        spacing = int(np.min(np.diff(np.sort(centers))))
+        assert spacing > 0, "two frequencies share a bin"
+        half_width = min(half_width, (spacing - 1) // 2)
+    if len(centers) > 0:
+        half_width = min(
+            half_width, int(centers.min()), fft_size // 2 - int(centers.max())
+        )
+    half_width = max(0, half_width)
+    return centers[:, np.newaxis] + np.arange(-half_width, half_width + 1)
+
+
+def harmonic_bands(
+    signals: np.ndarray,
+    sample_rate: float,
+    index_table: np.ndarray,
+    fft_size: int,
+    n_points: int,
+) -> list[spectrum.band_spectrum]:
+    """
+    Evaluates the bands of `index_table` with a zoom FFT at `n_points` each.
+
+    The peaks are resolved finer than the FFT bins without zero-padding the
+    whole render. Each band costs a few FFTs of about the render length, so
+    this is slower than reading the bins of an existing spectrum.
+
+    Parameters
+    ----------
+    signals : np.ndarray
+        The `(n_renders, length)` sine renders.
+    sample_rate : float
+        The sample rate of the renders.
+    index_table : np.ndarray
+        The bins of each harmonic, see `harmonic_index_table`.
+    fft_size : int
+        The FFT length `index_table` was built for.
+    n_points : int
+        The number of frequencies of each band. Raised to the number of bins
+        of the band, since a coarser band would miss energy between points.
+
+    Returns
+    -------
+    list[spectrum.band_spectrum]
+        One band per order, each with one row per render.
+    """
+    step = sample_rate / fft_size
+    return [
+        spectrum.band_spectrum.from_signal(
+            signals,
+            sample_rate,
+            bins[0] * step,
+            bins[-1] * step,
+            max(n_points, len(bins)),
+            delay=0,
+        )
+        for bins in index_table
+    ]
+
+
+def distortion_metrics(
+    spectrum_list: list[spectrum.spectrum],
+    title_list: list[str],
+    fundamental_freq: float,
+    index_table: np.ndarray,
+    low_freq: float = 20,
+    harmonic_bands: list[spectrum.band_spectrum] | None = None,
+    latency: list[float] | None = None,
+    order_gain: np.ndarray | None = None,
+) -> list[DistortionMetrics]:
+    """
+    Computes THD, THD+N, harmonic levels and the noise floor of sine renders.
+
+    Only the bins of `index_table` and one power sum are taken from each
+    spectrum; everything else is computed on `(n_plugins, orders)` arrays.
+
+    Parameters
+    ----------
+    spectrum_list : list[spectrum.spectrum]
+        The spectra of the sine renders, all with the same length.
+    title_list : list[str]
+        The title of each render.
+    fundamental_freq : float
+        The test tone frequency, in Hertz.
+    index_table : np.ndarray
+        The bins of each harmonic, see `harmonic_index_table`.
+    low_freq : float, optional
+        Energy below this frequency is ignored for THD+N and the noise floor.
+    harmonic_bands : list[spectrum.band_spectrum], optional
+        If given, the harmonic energies and the fundamental's peak are taken
+        from these instead of the bins, see `harmonic_bands`.
+    latency : list[float], optional
+        The latency of each render's plugin in samples, reported with the
+        metrics, see `analysis.detect_latency`. NaN if not given.
+    order_gain : np.ndarray, optional
+        The gain of each order of `index_table` under the window of the
+        test tone, see `window_order_gain`. The harmonic energies are divided
+        by it, so the levels are those of a steady tone. Without it, the
+        harmonics read low by about `5 * log10(order)` dB under a Gaussian
+        window.
+
+    Returns
+    -------
+    list[DistortionMetrics]
+        The metrics of each render. Levels are in dB; harmonics are relative
+        to the fundamental, and the noise floor is the mean noise power per
+        bin relative to the fundamental's peak bin, as in the normalized
+        distortion plot.
+    """
+    if len(spectrum_list) == 0:
+        return []
+    if latency is None:
+        latency = [np.nan] * len(spectrum_list)
+    harmonic_power = np.empty(
+        (len(spectrum_list),) + index_table.shape, dtype=np.float64
+    )
+    noise = np.empty(len(spectrum_list), dtype=np.float64)
+    band = spectrum_list[0].band(low_freq, spectrum_list[0].sample_rate / 2)
+    in_band = index_table[(index_table >= band.start) & (index_table < band.stop)]
+    for row, _spectrum in enumerate(spectrum_list):
+        harmonic_power[row] = np.abs(_spectrum.values[index_table]) ** 2
+        # summed with the harmonic bins zeroed instead of subtracted from the
+        # total, which would cancel out a -200 dB floor
+        power = np.abs(_spectrum.values[band]) ** 2
+        power[in_band - band.start] = 0
+        noise[row] = np.sum(power)
+    noise_bins = max(1, (band.stop - band.start) - len(in_band))
+
+    energy = harmonic_power.sum(axis=-1)
+    peak_power = harmonic_power[:, 0].max(axis=-1)
+    if harmonic_bands is not None:
+        length = spectrum_list[0].length
+        energy = np.stack([band.energy(length) for band in harmonic_bands], axis=-1)
+        peak_power = harmonic_bands[0].magnitude.max(axis=-1) ** 2
+    if order_gain is not None:
+        energy = energy / np.asarray(order_gain, dtype=np.float64)[: energy.shape[-1]]
+    fundamental = energy[:, 0]
+    distortion = energy[:, 1:].sum(axis=-1)
+
+    thd = np.sqrt(distortion / fundamental)
+    thd_n = np.sqrt((distortion + noise) / fundamental)
+    with np.errstate(divide="ignore"):
+        harmonic_dbc = 10 * np.log10(energy[:, 1:] / fundamental[:, np.newaxis])
+        noise_floor_db = 10 * np.log10(noise / noise_bins / peak_power)
+        thd_db = 20 * np.log10(thd)
+        thd_n_db = 20 * np.log10(thd_n)
+
+    return [
+        {
+            "title": title_list[row],
+            "latency": float(latency[row]),
+            "fundamental_freq": fundamental_freq,
+            "harmonic_dbc": harmonic_dbc[row].tolist(),
+            "thd": float(thd[row]),
+            "thd_db": float(thd_db[row]),
+            "thd_n": float(thd_n[row]),
+            "thd_n_db": float(thd_n_db[row]),
+            "noise_floor_db": float(noise_floor_db[row]),
+        }
+        for row in range(len(spectrum_list))
+    ]
@@ -1,23 +1,29 @@
-from typing import TypedDict
+from typing import NotRequired, TypedDict
 import numpy as np
 from matplotlib import pyplot as plt
 import matplotlib as mpl
-import matplotlib.mlab as mlab
 import os
 import scipy.fft
+import module.analysis as analysis
+import module.decimate as decimate
+import module.stft as stft
+import module.deconvolution as deconvolution
 
 mpl.rcParams["agg.path.chunksize"] = 100000
 
 
-class AnalyzeDict(TypedDict):
-    impulse: np.ndarray
-    sine_wave: np.ndarray
-    title: str
+AnalyzeDict = analysis.AnalyzeDict
 
 
 class AnalyzeSweepDict(TypedDict):
-    sweep: np.ndarray
+    sweep: np.ndarray | str
+    title: str
+    sample_rate: NotRequired[int]
+
+
+class SweepDeconvolutionDict(TypedDict):
     title: str
+    responses: list[deconvolution.HarmonicResponse]
 
 
 class WindowList(TypedDict):
@@ -30,49 +36,37 @@ class plotter:
         self.output_dir = output_dir
         os.makedirs(output_dir, exist_ok=True)
 
-    def _downsample_with_indices(data, max_samples, central_samples=100):
-        length = len(data)
-        if length <= max_samples:
-            indices = np.arange(length)
-            return indices, data
-
-        # Determine the range for the central part
-        central_start = (length - central_samples) // 2
-        central_end = central_start + central_samples
-
-        # Downsample the data excluding the central part
-        left_part = data[:central_start]
-        right_part = data[central_end:]
-        if len(left_part) + len(right_part) > max_samples - central_samples:
-            factor = (len(left_part) + len(right_part)) // (
-                max_samples - central_samples
-            )
-            left_indices = np.arange(len(left_part))[::factor]
-            right_indices = np.arange(len(right_part))[::factor]
-            indices = np.concatenate(
-                (
-                    left_indices,
-                    np.arange(central_start, central_end),
-                    right_indices + central_end,
-                )
-            )
-        else:
-            indices = np.concatenate(
-                (
-                    np.arange(len(left_part)),
-                    np.arange(central_start, central_end),
-                    np.arange(len(right_part)) + central_end,
-                )
-            )
+    def _plot(
+        self,
+        ax,
+        x: np.ndarray,
+        y: np.ndarray,
+        log_x: bool = False,
+        symlog_x: bool = False,
+        **kwargs,
+    ):
+        """
+        Draws a trace decimated to at most `decimate.MAX_POINTS` points.
 
-        # Combine the left, central, and right parts
-        downsampled_data = data[indices]
-        return indices, downsampled_data
+        All line plots go through here, so drawing time and file size do not
+        grow with the length of the trace. `symlog_x` decimates for a symlog
+        axis, see `decimate.decimate_symlog`.
+        """
+        if symlog_x:
+            x, y = decimate.decimate_symlog(np.asarray(x), np.asarray(y))
+        else:
+            x, y = decimate.decimate(np.asarray(x), np.asarray(y), log_x=log_x)
+        return ax.plot(x, y, **kwargs)
 
     def plot_window(self, window_list: list[WindowList], sample_rate: float):
         fig, ax = plt.subplots(figsize=(15, 7), layout="constrained")
         for window in window_list:
-            ax.plot(window["window"], label=window["title"])
+            self._plot(
+                ax,
+                np.arange(len(window["window"])),
+                window["window"],
+                label=window["title"],
+            )
         ax.set_title("window")
         ax.legend()
         plt.savefig(os.path.join(self.output_dir, "window.png"))
@@ -80,12 +74,16 @@ class plotter:
     def plot_window_spectrum(self, window_list: list[WindowList], sample_rate: float):
         fig, ax = plt.subplots(figsize=(15, 7), layout="constrained")
         for window in window_list:
-            window_fft = scipy.fft.fft(window["window"])
-            window_fft_freq = np.fft.fftfreq(len(window_fft), 1 / sample_rate)
+            window_fft = scipy.fft.fftshift(scipy.fft.fft(window["window"]))
+            window_fft_freq = scipy.fft.fftshift(
+                scipy.fft.fftfreq(len(window_fft), 1 / sample_rate)
+            )
             fft_max = np.max(np.abs(window_fft))
-            ax.plot(
+            self._plot(
+                ax,
                 window_fft_freq,
                 20 * np.log10(np.abs(window_fft) / fft_max),
+                symlog_x=True,
                 label=window["title"],
             )
         ax.set_xscale("symlog")
@@ -102,25 +100,41 @@ class plotter:
         zoom: int = 50,
         important_freq: float = 200,
     ):
+        self.plot_analysis_traces(
+            [
+                analysis.analysis_traces(
+                    impulse_dict, sample_rate, zoom, important_freq
+                )
+                for impulse_dict in impulse_dict_list
+            ],
+            sample_rate,
+            zoom=zoom,
+            important_freq=important_freq,
+        )
+
+    def plot_analysis_traces(
+        self,
+        traces_list: list[analysis.AnalysisTraces],
+        sample_rate: float,
+        zoom: int = 50,
+        important_freq: float = 200,
+    ):
 
         fig, ax = plt.subplots(figsize=(20, 35), layout="constrained", nrows=6)
 
-        for impulse_dict in impulse_dict_list:
+        for traces in traces_list:
             i = 0
-            impulse = impulse_dict["impulse"]
-            impulse_fft = scipy.fft.fft(impulse)
-            impulse_fft_freq = np.fft.fftfreq(len(impulse_fft), 1 / sample_rate)
-
-            plot_index_start = len(impulse) // 2 - zoom
-            plot_index_end = len(impulse) // 2 + zoom
-            second_max_value = np.sort(
-                np.abs(impulse[plot_index_start:plot_index_end]) ** 20
-            )[::-1][1]
-
-            ax[i].plot(
-                (impulse[plot_index_start:plot_index_end] ** 20)
-                * np.sign(impulse[plot_index_start:plot_index_end]),
-                label=impulse_dict["title"],
+            second_max_value = traces["impulse_zoom_limit"]
+
+            self._plot(
+                ax[i],
+                traces["impulse_zoom_index"],
+                traces["impulse_zoom"],
+                label=(
+                    f"{traces['title']} (latency {traces['latency']:.2f} samples)"
+                    if np.isfinite(traces["latency"])
+                    else traces["title"]
+                ),
                 linewidth=0.5,
             )
             ax[i].set_title(
@@ -144,14 +158,12 @@ class plotter:
             ax[i].set_xlabel("Samples")
             i += 1
 
-            plot_index = np.where(
-                (impulse_fft_freq >= 1) & (impulse_fft_freq <= sample_rate / 2)
-            )
-            max_value = np.max(np.abs(impulse_fft[plot_index]))
-            ax[i].plot(
-                impulse_fft_freq[plot_index],
-                20 * np.log10(np.abs(impulse_fft[plot_index]) / max_value),
-                label=impulse_dict["title"],
+            self._plot(
+                ax[i],
+                traces["magnitude_freq"],
+                traces["magnitude_db"],
+                log_x=True,
+                label=traces["title"],
             )
             ax[i].set_title("impulse frequency characteristic")
             ax[i].legend()
@@ -161,13 +173,12 @@ class plotter:
             i += 1
 
             # plot phase responce
-            rolled_impulse = np.roll(impulse, len(impulse) // 2)
-            rolled_impulse_fft = scipy.fft.fft(rolled_impulse)
-            impulse_phase = np.angle(rolled_impulse_fft, deg=True)
-            ax[i].plot(
-                impulse_fft_freq[plot_index],
-                impulse_phase[plot_index],
-                label=impulse_dict["title"],
+            self._plot(
+                ax[i],
+                traces["phase_freq"],
+                traces["phase"],
+                log_x=True,
+                label=traces["title"],
             )
             ax[i].set_title("impulse phase characteristic")
             ax[i].set_ylim(-200, 200)
@@ -179,14 +190,12 @@ class plotter:
             i += 1
 
             # sine wave
-            sine_wave_fft = scipy.fft.fft(impulse_dict["sine_wave"])
-            sine_wave_fft_freq = np.fft.fftfreq(len(sine_wave_fft), 1 / sample_rate)
-            sine_wave_fft_max_value = np.max(np.abs(sine_wave_fft[plot_index]))
-            ax[i].plot(
-                sine_wave_fft_freq[plot_index],
-                20
-                * np.log10(np.abs(sine_wave_fft[plot_index]) / sine_wave_fft_max_value),
-                label=impulse_dict["title"],
+            self._plot(
+                ax[i],
+                traces["distortion_freq"],
+                traces["distortion_db"],
+                log_x=True,
+                label=traces["title"],
                 linewidth=0.5,
             )
             ax[i].set_title("distortion frequency characteristic")
@@ -197,16 +206,12 @@ class plotter:
             i += 1
 
             # zoom in
-            plot_index = np.where(
-                (impulse_fft_freq > important_freq / 2)
-                & (impulse_fft_freq < important_freq * 2)
-                & (impulse_fft_freq >= 1)
-                & (impulse_fft_freq <= sample_rate / 2)
-            )
-            ax[i].plot(
-                impulse_fft_freq[plot_index],
-                20 * np.log10(np.abs(impulse_fft[plot_index]) / max_value),
-                label=impulse_dict["title"],
+            self._plot(
+                ax[i],
+                traces["zoom_freq"],
+                traces["zoom_magnitude_db"],
+                log_x=True,
+                label=traces["title"],
             )
             ax[i].set_title("impulse frequency characteristic (zoom in)")
             ax[i].legend()
@@ -215,10 +220,12 @@ class plotter:
             ax[i].set_ylabel("Amplitude [dB]")
             i += 1
 
-            ax[i].plot(
-                impulse_fft_freq[plot_index],
-                20 * np.log10(np.abs(impulse_fft[plot_index]) / max_value),
-                label=impulse_dict["title"],
+            self._plot(
+                ax[i],
+                traces["zoom_freq"],
+                traces["zoom_magnitude_db"],
+                log_x=True,
+                label=traces["title"],
             )
             ax[i].set_title("impulse frequency characteristic (zoom in)")
             ax[i].set_ylim(-24, 1)
@@ -245,20 +252,42 @@ class plotter:
 
     def plot_mono_audio_spectrogram(
         self,
-        audio: np.ndarray,
+        audio: np.ndarray | str,
         sample_rate: int,
         is_log_scale: bool = True,
         prefix: str = "",
+        workers: int | None = None,
+        dtype: np.dtype = np.float64,
     ):
         fig, ax = plt.subplots(figsize=(30, 15), layout="constrained")
-        Pxx, freq, t = mlab.specgram(
+        image, time_edges, freq_edges = stft.stft_image(
             audio,
-            NFFT=8192 * 2,
-            Fs=sample_rate,
-            noverlap=8192,
+            sample_rate,
+            nfft=8192 * 2,
+            hop=8192,
+            log_freq=is_log_scale,
+            workers=workers,
+            dtype=dtype,
         )
-        Pxx_max = np.max(np.abs(Pxx))
-        mesh = ax.pcolormesh(t, freq, 20 * np.log10(Pxx / Pxx_max), cmap="magma")
+        if is_log_scale:
+            # the rows are log-spaced, so they are drawn as a rasterized mesh
+            mesh = ax.pcolormesh(
+                time_edges,
+                freq_edges,
+                image,
+                cmap="magma",
+                shading="flat",
+                rasterized=True,
+            )
+        else:
+            mesh = ax.imshow(
+                image,
+                cmap="magma",
+                origin="lower",
+                aspect="auto",
+                interpolation="nearest",
+                extent=(time_edges[0], time_edges[-1], freq_edges[0], freq_edges[-1]),
+            )
         cb = fig.colorbar(mesh, ax=ax)
         cb.set_label("Intensity [dB]")
         mesh.set_clim(-200, 0)
@@ -269,3 +298,62 @@ class plotter:
         ax.set_ylim(20, sample_rate / 2)
         plt.savefig(os.path.join(self.output_dir, f"{prefix}audio_spectrogram.png"))
         # plt.savefig(os.path.join(self.output_dir, f"{prefix}audio_spectrogram.pdf"))
+
+    def plot_sweep_deconvolution(
+        self,
+        deconvolution_dict_list: list[SweepDeconvolutionDict],
+        sample_rate: float,
+    ):
+        fig, ax = plt.subplots(figsize=(20, 20), layout="constrained", nrows=3)
+        for deconvolution_dict in deconvolution_dict_list:
+            linear = deconvolution_dict["responses"][0]
+            linear_spectrum = linear["spectrum"]
+            plot_index = linear_spectrum.band(*linear["band"])
+            self._plot(
+                ax[0],
+                linear_spectrum.freq[plot_index],
+                linear_spectrum.db[plot_index],
+                log_x=True,
+                label=deconvolution_dict["title"],
+            )
+            self._plot(
+                ax[1],
+                linear_spectrum.freq[plot_index],
+                linear_spectrum.phase[plot_index],
+                log_x=True,
+                label=deconvolution_dict["title"],
+            )
+            for response in deconvolution_dict["responses"][1:]:
+                order = response["order"]
+                harmonic_spectrum = response["spectrum"]
+                plot_index = harmonic_spectrum.band(*response["band"])
+                # plotted against the excitation frequency, relative to the linear response there
+                excitation_freq = harmonic_spectrum.freq[plot_index] / order
+                linear_db = np.interp(
+                    excitation_freq, linear_spectrum.freq, linear_spectrum.db
+                )
+                self._plot(
+                    ax[2],
+                    excitation_freq,
+                    harmonic_spectrum.db[plot_index] - linear_db,
+                    log_x=True,
+                    label=f"{deconvolution_dict['title']} H{order}",
+                    linewidth=0.5,
+                )
+
+        ax[0].set_title("sweep linear frequency characteristic")
+        ax[0].set_ylabel("Amplitude [dB]")
+        ax[1].set_title("sweep linear phase characteristic")
+        ax[1].set_ylim(-200, 200)
+        ax[1].set_yticks(np.arange(-180, 181, 45))
+        ax[1].set_ylabel("Phase [degree]")
+        ax[2].set_title("harmonic distortion relative to linear response")
+        ax[2].set_ylabel("Amplitude [dB]")
+        for a in ax:
+            a.set_xscale("log")
+            a.set_xlabel("Frequency [Hz]")
+            a.grid(which="both", axis="both")
+            a.legend()
+
+        plt.savefig(os.path.join(self.output_dir, "sweep_deconvolution.png"))
+        plt.savefig(os.path.join(self.output_dir, "sweep_deconvolution.pdf"))
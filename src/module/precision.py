@@ -0,0 +1,47 @@
+import numpy as np
+
+PRECISIONS = {
+    "float32": np.float32,
+    "float64": np.float64,
+    "longdouble": np.longdouble,
+}
+
+
+def real_dtype(precision: str) -> np.dtype:
+    """
+    Returns the real dtype used for a precision setting.
+
+    Parameters
+    ----------
+    precision : str
+        One of "float32", "float64" or "longdouble".
+
+    Returns
+    -------
+    np.dtype
+        The real dtype for signals, windows and FFT inputs.
+
+    Raises
+    ------
+    AssertionError
+        If the precision is unknown.
+    """
+    assert precision in PRECISIONS, f"unknown precision: {precision}"
+    return np.dtype(PRECISIONS[precision])
+
+
+def complex_dtype(precision: str) -> np.dtype:
+    """
+    Returns the complex dtype that an FFT of `real_dtype(precision)` produces.
+
+    Parameters
+    ----------
+    precision : str
+        One of "float32", "float64" or "longdouble".
+
+    Returns
+    -------
+    np.dtype
+        The complex dtype for spectra.
+    """
+    return np.result_type(real_dtype(precision), np.complex64)
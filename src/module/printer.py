@@ -1,16 +1,225 @@
+from contextlib import contextmanager
+import atexit
 from rich import print
+from rich.table import Table
+import json
 import os
+import sys
 import time
+import tracemalloc
 
+try:
+    import resource
+except ImportError:
+    # not available on Windows, peak RSS is then not recorded
+    resource = None
 
-class printer:
-    def __init__(self, output_filepath: str):
+
+def peak_rss_bytes() -> int | None:
+    """Returns the peak resident set size of this process so far, or None if unknown."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class recorder:
+    def __init__(self, trace_memory: bool = False):
+        """
+        Records timed stages, without any output.
+
+        Picklable, so worker processes can measure their own stages and send
+        `spans` back to be added to the main `printer` with `add_spans`.
+
+        Parameters
+        ----------
+        trace_memory : bool, optional
+            If True, the bytes allocated in each stage are measured with
+            tracemalloc, which slows down allocation-heavy Python code.
+        """
+        self.spans: list[dict] = []
+        self.stack: list[dict] = []
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _finish(self, event: dict):
+        self.spans.append(event)
+
+    @contextmanager
+    def span(self, name: str):
+        """
+        Measures a stage of the run, as a context manager or decorator.
+
+        Wall and CPU time, the bytes allocated at peak within the stage
+        (with `trace_memory`) and the peak RSS of the process so far, at the
+        end of the stage, are recorded. The peak RSS is a lifetime maximum,
+        so a stage shows the peak of an earlier one unless it exceeds it. Spans can be nested; a stage's allocation includes its
+        children's.
+
+        Parameters
+        ----------
+        name : str
+            The name of the stage.
+        """
+        record = {"depth": len(self.stack), "start": time.time(), "peak_traced": 0}
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if len(self.stack) > 0:
+                # reset_peak below would lose the parent's peak so far
+                self.stack[-1]["peak_traced"] = max(self.stack[-1]["peak_traced"], peak)
+            record["start_traced"] = current
+            tracemalloc.reset_peak()
+        self.stack.append(record)
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+            self.stack.pop()
+            event = {
+                "type": "span",
+                "name": name,
+                "depth": record["depth"],
+                "start": record["start"],
+                "wall_s": wall,
+                "cpu_s": cpu,
+                "allocated_bytes": None,
+                "peak_rss_bytes": peak_rss_bytes(),
+                "pid": os.getpid(),
+            }
+            if self.trace_memory:
+                _, peak = tracemalloc.get_traced_memory()
+                peak = max(peak, record["peak_traced"])
+                event["allocated_bytes"] = peak - record["start_traced"]
+                if len(self.stack) > 0:
+                    self.stack[-1]["peak_traced"] = max(
+                        self.stack[-1]["peak_traced"], peak
+                    )
+            self._finish(event)
+
+
+class printer(recorder):
+    # events are written to events.jsonl in batches of this many
+    FLUSH_EVENTS = 64
+
+    def __init__(self, output_filepath: str, trace_memory: bool = False):
+        """
+        Prints messages and records timed stages of a run.
+
+        Messages go to the console and `output.txt`. Stages are measured with
+        `span`, and every message and stage is also recorded as one JSON
+        object per line in `events.jsonl`.
+
+        Parameters
+        ----------
+        output_filepath : str
+            The directory to write `output.txt` and `events.jsonl` into.
+        trace_memory : bool, optional
+            See `recorder`.
+        """
+        super().__init__(trace_memory)
         self.output_filepath = os.path.join(output_filepath, "output.txt")
+        self.events_filepath = os.path.join(output_filepath, "events.jsonl")
         os.makedirs(output_filepath, exist_ok=True)
+        # line buffered, so the log is complete even if the run crashes
+        self.output_file = open(self.output_filepath, "a", buffering=1)
+        self.events: list[dict] = []
+        # scripts that never call close still get their events written
+        atexit.register(self.flush)
 
     def print_message(self, message):
-        with open(self.output_filepath, "a") as f:
-            f.write(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {message}\n")
-        print(
-            f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {message}",
-        )
+        now = time.time()
+        line = f"[{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now))}] {message}"
+        self.output_file.write(f"{line}\n")
+        print(line)
+        self._record({"type": "message", "time": now, "message": str(message)})
+
+    def _record(self, event: dict):
+        self.events.append(event)
+        if len(self.events) >= self.FLUSH_EVENTS:
+            self.flush()
+
+    def _finish(self, event: dict):
+        super()._finish(event)
+        self._record(event)
+
+    def add_spans(self, spans: list[dict]):
+        """
+        Adds the spans of a worker's `recorder`, nested under the current span.
+
+        Parameters
+        ----------
+        spans : list[dict]
+            The `spans` of the recorder.
+        """
+        for event in spans:
+            self._finish({**event, "depth": event["depth"] + len(self.stack)})
+
+    def flush(self):
+        """Appends the buffered events to `events.jsonl`."""
+        if len(self.events) == 0:
+            return
+        with open(self.events_filepath, "a") as f:
+            for event in self.events:
+                f.write(json.dumps(event) + "\n")
+        self.events = []
+
+    def _label(self, event: dict) -> str:
+        if event["pid"] == os.getpid():
+            return event["name"]
+        return f"{event['name']} (pid {event['pid']})"
+
+    def summary(self):
+        """Prints a table of all finished stages and flushes the events."""
+        table = Table(title="stages")
+        for column in (
+            "stage",
+            "wall [s]",
+            "cpu [s]",
+            "allocated [MiB]",
+            "process peak RSS [MiB]",
+        ):
+            table.add_column(column, justify="left" if column == "stage" else "right")
+        # spans finish inner first, so order them by start
+        for event in sorted(self.spans, key=lambda e: (e["start"], e["depth"])):
+            table.add_row(
+                "  " * event["depth"] + self._label(event),
+                f"{event['wall_s']:.3f}",
+                f"{event['cpu_s']:.3f}",
+                (
+                    "-"
+                    if event["allocated_bytes"] is None
+                    else f"{event['allocated_bytes'] / 2**20:.1f}"
+                ),
+                (
+                    "-"
+                    if event["peak_rss_bytes"] is None
+                    else f"{event['peak_rss_bytes'] / 2**20:.1f}"
+                ),
+            )
+        print(table)
+        for event in sorted(self.spans, key=lambda e: (e["start"], e["depth"])):
+            self.output_file.write(
+                f"{'  ' * event['depth']}{self._label(event)}: {event['wall_s']:.3f} s wall, {event['cpu_s']:.3f} s cpu"
+                + (
+                    ""
+                    if event["allocated_bytes"] is None
+                    else f", {event['allocated_bytes'] / 2**20:.1f} MiB allocated"
+                )
+                + (
+                    ""
+                    if event["peak_rss_bytes"] is None
+                    else f", {event['peak_rss_bytes'] / 2**20:.1f} MiB process peak RSS so far"
+                )
+                + "\n"
+            )
+        self.flush()
+
+    def close(self):
+        """Flushes the events and closes `output.txt`."""
+        self.flush()
+        self.output_file.close()
@@ -0,0 +1,262 @@
+from typing import TypedDict
+import functools
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import module.generator as generator
+import module.windows as windows
+import module.precision as precision_module
+
+# bump when the generated samples change, so cached signals are not reused
+GENERATOR_VERSION = 1
+
+
+class SignalSpec(TypedDict):
+    kind: str
+    length: int
+    amplitude_dBFS: float | None
+    frequency: float | None
+    start_frequency: float | None
+    end_frequency: float | None
+    log_scale: bool | None
+    window_std: float | None
+
+
+class GridSettings(TypedDict):
+    sample_rate: int
+    precision: str
+    block_size: int
+    cache_dir: str
+
+
+class ManifestEntry(TypedDict):
+    name: str
+    key: str
+    path: str
+    cached: bool
+    spec: SignalSpec
+
+
+def impulse_spec(length: int) -> SignalSpec:
+    """Returns the impulse of `generator.stream_impulse`."""
+    return {
+        "kind": "impulse",
+        "length": length,
+        "amplitude_dBFS": None,
+        "frequency": None,
+        "start_frequency": None,
+        "end_frequency": None,
+        "log_scale": None,
+        "window_std": None,
+    }
+
+
+def sine_grid(
+    length: int,
+    frequencies: list[float],
+    amplitudes_dBFS: list[float],
+    window_stds: list[float | None],
+) -> list[SignalSpec]:
+    """
+    Returns the sine wave of every frequency x amplitude x window combination.
+
+    Parameters
+    ----------
+    length : int
+        The length of the signals, in samples.
+    frequencies : list[float]
+        The frequencies, in Hertz.
+    amplitudes_dBFS : list[float]
+        The amplitudes, in decibels relative to full scale.
+    window_stds : list[float or None]
+        The standard deviations of the Gaussian window, in samples. None
+        generates the sine wave without a window.
+
+    Returns
+    -------
+    list[SignalSpec]
+        The signals, frequency-major.
+    """
+    return [
+        {
+            "kind": "sine",
+            "length": length,
+            "amplitude_dBFS": amplitude_dBFS,
+            "frequency": frequency,
+            "start_frequency": None,
+            "end_frequency": None,
+            "log_scale": None,
+            "window_std": window_std,
+        }
+        for frequency, amplitude_dBFS, window_std in itertools.product(
+            frequencies, amplitudes_dBFS, window_stds
+        )
+    ]
+
+
+def sweep_grid(
+    length: int,
+    start_frequency: float,
+    end_frequency: float,
+    amplitudes_dBFS: list[float],
+    log_scales: list[bool],
+) -> list[SignalSpec]:
+    """
+    Returns the sweep of every amplitude x scale combination.
+
+    Parameters
+    ----------
+    length : int
+        The length of the signals, in samples.
+    start_frequency : float
+        The start frequency of the sweeps, in Hertz.
+    end_frequency : float
+        The end frequency of the sweeps, in Hertz.
+    amplitudes_dBFS : list[float]
+        The amplitudes, in decibels relative to full scale.
+    log_scales : list[bool]
+        True for logarithmic sweeps, False for linear ones.
+
+    Returns
+    -------
+    list[SignalSpec]
+        The signals, amplitude-major.
+    """
+    return [
+        {
+            "kind": "sweep",
+            "length": length,
+            "amplitude_dBFS": amplitude_dBFS,
+            "frequency": None,
+            "start_frequency": start_frequency,
+            "end_frequency": end_frequency,
+            "log_scale": log_scale,
+            "window_std": None,
+        }
+        for amplitude_dBFS, log_scale in itertools.product(amplitudes_dBFS, log_scales)
+    ]
+
+
+def signal_name(spec: SignalSpec) -> str:
+    """Returns a readable file name of a signal, without extension."""
+    if spec["kind"] == "impulse":
+        return f"impulse_{spec['length']}"
+    if spec["kind"] == "sine":
+        window = (
+            "rect" if spec["window_std"] is None else f"gauss{spec['window_std']:g}"
+        )
+        return f"sine_{spec['frequency']:g}Hz_{spec['amplitude_dBFS']:g}dBFS_{window}_{spec['length']}"
+    scale = "log" if spec["log_scale"] else "lin"
+    return f"sweep_{spec['start_frequency']:g}-{spec['end_frequency']:g}Hz_{scale}_{spec['amplitude_dBFS']:g}dBFS_{spec['length']}"
+
+
+def signal_key(spec: SignalSpec, settings: GridSettings) -> str:
+    """
+    Returns the cache key of a signal.
+
+    Everything that changes the samples is hashed: the spec, the sample rate,
+    the precision and `GENERATOR_VERSION`. The block size is not, since it
+    does not change the written signal.
+    """
+    identity = {
+        "spec": spec,
+        "sample_rate": settings["sample_rate"],
+        "precision": settings["precision"],
+        "version": GENERATOR_VERSION,
+    }
+    return hashlib.sha256(json.dumps(identity, sort_keys=True).encode()).hexdigest()
+
+
+def generate_signal(spec: SignalSpec, settings: GridSettings) -> ManifestEntry:
+    """
+    Generates one signal into the cache, unless it is already there.
+
+    This is the unit of work of the process pool in `gen_signal_grid.py`.
+    The signal is written under a temporary name and renamed when complete,
+    so an interrupted run never leaves a truncated signal in the cache.
+
+    Parameters
+    ----------
+    spec : SignalSpec
+        The signal.
+    settings : GridSettings
+        The generation settings.
+
+    Returns
+    -------
+    ManifestEntry
+        The signal's name, key, path in the cache, and whether it was reused.
+    """
+    key = signal_key(spec, settings)
+    filepath = os.path.join(settings["cache_dir"], f"{key}.wav")
+    entry: ManifestEntry = {
+        "name": signal_name(spec),
+        "key": key,
+        "path": filepath,
+        "cached": os.path.exists(filepath),
+        "spec": spec,
+    }
+    if entry["cached"]:
+        return entry
+
+    gen = generator.generator(
+        settings["sample_rate"], settings["cache_dir"], settings["precision"]
+    )
+    tmp_filename = f"{key}.{os.getpid()}.tmp.wav"
+    if spec["kind"] == "impulse":
+        gen.stream_impulse(spec["length"], settings["block_size"], tmp_filename)
+    elif spec["kind"] == "sine":
+        window = None
+        if spec["window_std"] is not None:
+            dtype = precision_module.real_dtype(settings["precision"])
+            # called with (start, stop) of each block
+            window = functools.partial(
+                windows.gaussian_segment_longdouble,
+                spec["length"],
+                spec["window_std"],
+                dtype=dtype,
+            )
+        gen.stream_sine_wave(
+            spec["frequency"],
+            spec["length"],
+            spec["amplitude_dBFS"],
+            window=window,
+            block_size=settings["block_size"],
+            filename=tmp_filename,
+        )
+    else:
+        assert spec["kind"] == "sweep", f"unknown signal kind: {spec['kind']}"
+        gen.stream_sweep_up(
+            spec["length"],
+            spec["start_frequency"],
+            spec["end_frequency"],
+            spec["amplitude_dBFS"],
+            log_scale=spec["log_scale"],
+            block_size=settings["block_size"],
+            filename=tmp_filename,
+        )
+    os.replace(os.path.join(settings["cache_dir"], tmp_filename), filepath)
+    return entry
+
+
+def link_signal(entry: ManifestEntry, output_dir: str) -> str:
+    """
+    Makes a cached signal available under its readable name in `output_dir`.
+
+    A hard link is used where possible, so the grid takes no extra space.
+
+    Returns
+    -------
+    str
+        The path of the link or copy.
+    """
+    filepath = os.path.join(output_dir, f"{entry['name']}.wav")
+    if os.path.exists(filepath):
+        os.remove(filepath)
+    try:
+        os.link(entry["path"], filepath)
+    except OSError:
+        shutil.copyfile(entry["path"], filepath)
+    return filepath
@@ -0,0 +1,324 @@
+from functools import cached_property
+import numpy as np
+import scipy.fft
+import scipy.signal
+
+
+class spectrum:
+    def __init__(
+        self,
+        values: np.ndarray,
+        length: int,
+        sample_rate: float,
+        delay: float = 0.0,
+    ) -> None:
+        """
+        One-sided spectrum of a real signal.
+
+        Every derived quantity is computed on first access and kept, so plots
+        and exports can share one instance without redoing any work.
+
+        Parameters
+        ----------
+        values : np.ndarray
+            The output of `scipy.fft.rfft`, `length // 2 + 1` bins.
+        length : int
+            The length of the transformed signal, in samples.
+        sample_rate : float
+            The sample rate of the transformed signal.
+        delay : float, optional
+            The position of the reference instant (e.g. the impulse) in the
+            signal, in samples. It is removed from `phase`.
+        """
+        assert (
+            values.shape[-1] == length // 2 + 1
+        ), f"not an rfft of {length}: {values.shape}"
+        self.values = values
+        self.length = length
+        self.sample_rate = sample_rate
+        self.delay = delay
+        self._bands: dict[tuple[float, float], slice] = {}
+
+    @classmethod
+    def from_signal(
+        cls,
+        signal: np.ndarray,
+        sample_rate: float,
+        length: int | None = None,
+        delay: float | None = None,
+        workers: int | None = None,
+    ):
+        """
+        Computes the spectrum of a signal with one real FFT.
+
+        Parameters
+        ----------
+        signal : np.ndarray
+            The real time-domain signal. The FFT runs in its dtype.
+        sample_rate : float
+            The sample rate of the signal.
+        length : int, optional
+            The FFT length. The signal is zero-padded at the end up to it.
+            Since `delay` is removed from the phase, this gives the same
+            spectrum as padding both sides. Defaults to the signal length.
+        delay : float, optional
+            The reference delay in samples. Defaults to the center of the signal.
+        workers : int, optional
+            The number of workers passed to `scipy.fft.rfft`.
+
+        Returns
+        -------
+        spectrum
+            The spectrum of the signal.
+        """
+        if length is None:
+            length = signal.shape[-1]
+        if delay is None:
+            delay = signal.shape[-1] // 2
+        return cls(
+            scipy.fft.rfft(signal, n=length, workers=workers),
+            length,
+            sample_rate,
+            delay,
+        )
+
+    @classmethod
+    def from_signals(
+        cls,
+        signals: np.ndarray,
+        sample_rate: float,
+        delays: list[float],
+        workers: int | None = None,
+    ):
+        """
+        Computes the spectra of equally long signals with one batched real FFT.
+
+        Parameters
+        ----------
+        signals : np.ndarray
+            A C-contiguous `(n_signals, length)` array. The FFT runs along the
+            last axis in its dtype.
+        sample_rate : float
+            The sample rate of the signals.
+        delays : list[float]
+            The reference delay of each signal, in samples.
+        workers : int, optional
+            The number of workers passed to `scipy.fft.rfft`.
+
+        Returns
+        -------
+        list[spectrum]
+            The spectrum of each signal. Their `values` are rows of one
+            `(n_signals, length // 2 + 1)` array.
+        """
+        assert signals.ndim == 2, f"signals must be 2-D: {signals.shape}"
+        assert len(delays) == signals.shape[0], "one delay per signal is needed"
+        values = scipy.fft.rfft(signals, axis=-1, workers=workers)
+        return [
+            cls(values[idx], signals.shape[-1], sample_rate, delays[idx])
+            for idx in range(signals.shape[0])
+        ]
+
+    @cached_property
+    def freq(self) -> np.ndarray:
+        """Frequency of each bin, in Hertz."""
+        return scipy.fft.rfftfreq(self.length, 1 / self.sample_rate)
+
+    @cached_property
+    def magnitude(self) -> np.ndarray:
+        """Absolute value of each bin."""
+        return np.abs(self.values)
+
+    @cached_property
+    def db(self) -> np.ndarray:
+        """Magnitude in dB."""
+        return 20 * np.log10(self.magnitude)
+
+    @cached_property
+    def peak_magnitude(self) -> np.floating:
+        """Largest magnitude between 1 Hz and Nyquist."""
+        return np.max(self.magnitude[self.band(1, self.sample_rate / 2)])
+
+    @cached_property
+    def normalized_db(self) -> np.ndarray:
+        """Magnitude in dB relative to `peak_magnitude`."""
+        return self.db - 20 * np.log10(self.peak_magnitude)
+
+    @cached_property
+    def phase_rad(self) -> np.ndarray:
+        """Phase in radians, not wrapped, with `delay` removed."""
+        # remove the delay analytically instead of transforming a rolled copy;
+        # k * delay is reduced modulo length first to keep the argument small.
+        # float32 cannot hold k * delay for a fractional delay, so it is formed
+        # in float64 at least
+        dtype = np.longdouble if self.values.dtype == np.clongdouble else np.float64
+        turns = np.mod(
+            np.arange(self.values.shape[-1], dtype=dtype) * dtype(self.delay),
+            self.length,
+        )
+        return np.angle(self.values) + 2 * np.pi * turns / self.length
+
+    @cached_property
+    def phase(self) -> np.ndarray:
+        """Phase in degrees, wrapped to [-180, 180), with `delay` removed."""
+        return np.mod(np.rad2deg(self.phase_rad) + 180, 360) - 180
+
+    @cached_property
+    def unwrapped_phase(self) -> np.ndarray:
+        """Phase in degrees, unwrapped along frequency, with `delay` removed."""
+        return np.rad2deg(np.unwrap(self.phase_rad))
+
+    @cached_property
+    def group_delay(self) -> np.ndarray:
+        """Group delay in seconds, including `delay`."""
+        return self.delay / self.sample_rate - np.gradient(
+            np.deg2rad(self.unwrapped_phase), 2 * np.pi * self.freq
+        )
+
+    def band(self, low: float, high: float) -> slice:
+        """
+        Returns the bins with `low <= freq <= high` as a slice.
+
+        Parameters
+        ----------
+        low : float
+            The lower frequency, in Hertz.
+        high : float
+            The upper frequency, in Hertz.
+
+        Returns
+        -------
+        slice
+            The slice of bins in the band. Cached per band.
+        """
+        key = (low, high)
+        if key not in self._bands:
+            step = self.sample_rate / self.length
+            start = max(int(np.ceil(low / step)), 0)
+            stop = min(int(np.floor(high / step)) + 1, self.values.shape[-1])
+            self._bands[key] = slice(start, max(start, stop))
+        return self._bands[key]
+
+
+class band_spectrum:
+    def __init__(
+        self,
+        values: np.ndarray,
+        freq: np.ndarray,
+        sample_rate: float,
+        delay: float = 0.0,
+    ) -> None:
+        """
+        Spectrum of a real signal evaluated only over one frequency band.
+
+        Unlike `spectrum`, the resolution is chosen freely instead of being
+        `sample_rate / length`, so fine detail in a narrow band does not need
+        a zero-padded full-length FFT.
+
+        Parameters
+        ----------
+        values : np.ndarray
+            The DTFT of the signal at `freq`, see `from_signal`.
+        freq : np.ndarray
+            The evenly spaced frequencies, in Hertz.
+        sample_rate : float
+            The sample rate of the transformed signal.
+        delay : float, optional
+            The position of the reference instant in the signal, in samples.
+            It is removed from `phase`.
+        """
+        assert (
+            values.shape[-1] == freq.shape[0]
+        ), f"values and freq differ: {values.shape}, {freq.shape}"
+        self.values = values
+        self.freq = freq
+        self.sample_rate = sample_rate
+        self.delay = delay
+
+    @classmethod
+    def from_signal(
+        cls,
+        signal: np.ndarray,
+        sample_rate: float,
+        low: float,
+        high: float,
+        n_points: int,
+        delay: float | None = None,
+    ):
+        """
+        Evaluates the spectrum of a signal over a band with a zoom FFT (chirp-z).
+
+        The cost is a few FFTs of about `signal length + n_points`, whatever
+        the resolution.
+
+        Parameters
+        ----------
+        signal : np.ndarray
+            The real time-domain signal, or a `(n_signals, length)` array to
+            evaluate all rows at once. Transformed in float64, since the
+            chirp-z transform has no longdouble path.
+        sample_rate : float
+            The sample rate of the signal.
+        low : float
+            The lower frequency, in Hertz.
+        high : float
+            The upper frequency, in Hertz, included.
+        n_points : int
+            The number of frequencies.
+        delay : float, optional
+            The reference delay in samples. Defaults to the center of the signal.
+
+        Returns
+        -------
+        band_spectrum
+            The spectrum of the signal over the band. For a 2-D `signal`, its
+            `values` have one row per signal.
+        """
+        if delay is None:
+            delay = signal.shape[-1] // 2
+        values = scipy.signal.zoom_fft(
+            signal.astype(np.float64, copy=False),
+            [low, high],
+            m=n_points,
+            fs=sample_rate,
+            endpoint=True,
+            axis=-1,
+        )
+        return cls(values, np.linspace(low, high, n_points), sample_rate, delay)
+
+    @property
+    def step(self) -> float:
+        """Frequency spacing of the points, in Hertz."""
+        return (self.freq[-1] - self.freq[0]) / max(len(self.freq) - 1, 1)
+
+    @cached_property
+    def magnitude(self) -> np.ndarray:
+        """Absolute value at each frequency."""
+        return np.abs(self.values)
+
+    @cached_property
+    def db(self) -> np.ndarray:
+        """Magnitude in dB."""
+        return 20 * np.log10(self.magnitude)
+
+    @cached_property
+    def phase_rad(self) -> np.ndarray:
+        """Phase in radians, not wrapped, with `delay` removed."""
+        turns = np.mod(self.freq * self.delay / self.sample_rate, 1)
+        return np.angle(self.values) + 2 * np.pi * turns
+
+    @cached_property
+    def phase(self) -> np.ndarray:
+        """Phase in degrees, wrapped to [-180, 180), with `delay` removed."""
+        return np.mod(np.rad2deg(self.phase_rad) + 180, 360) - 180
+
+    def energy(self, length: int) -> np.ndarray:
+        """
+        Returns the energy in the band in the units of a `length`-point rfft.
+
+        That is, the sum of `|values|**2` over the bins a `spectrum` of FFT
+        length `length` would have in the band, so both can be compared.
+        """
+        return (
+            np.sum(self.magnitude**2, axis=-1) * length * self.step / self.sample_rate
+        )
@@ -0,0 +1,128 @@
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import scipy.fft
+import scipy.signal
+import module.io as io
+
+
+def stft_image(
+    source: np.ndarray | str,
+    sample_rate: float | None = None,
+    nfft: int = 8192 * 2,
+    hop: int = 8192,
+    n_columns: int = 3000,
+    n_rows: int = 1500,
+    log_freq: bool = False,
+    block_frames: int = 256,
+    workers: int | None = None,
+    dtype: np.dtype = np.float64,
+):
+    """
+    Computes a spectrogram image block by block at the output resolution.
+
+    Frames are transformed `block_frames` at a time, and each block is reduced
+    straight into a preallocated float32 image of `n_rows` x `n_columns`
+    by taking the maximum power of the frames and bins falling into each
+    pixel. Memory therefore depends on the image and block size, not on
+    the length of the signal.
+
+    Parameters
+    ----------
+    source : np.ndarray or str
+        The mono signal, or the path to a WAV file whose channel 0 is read
+        block by block from a memory map.
+    sample_rate : float, optional
+        The sample rate of `source`. Read from the file if `source` is a path.
+    nfft : int, optional
+        The frame length.
+    hop : int, optional
+        The distance between frames, in samples.
+    n_columns : int, optional
+        The maximum number of time columns of the image.
+    n_rows : int, optional
+        The maximum number of frequency rows of the image.
+    log_freq : bool, optional
+        If True, the rows are spaced logarithmically in frequency.
+    block_frames : int, optional
+        The number of frames transformed together.
+    workers : int, optional
+        The number of blocks processed in parallel.
+    dtype : np.dtype, optional
+        The dtype frames are read and transformed in.
+
+    Returns
+    -------
+    tuple
+        A tuple containing the image in dB relative to its maximum
+        (np.ndarray, float32, rows x columns), the time edges of the columns
+        in seconds (np.ndarray) and the frequency edges of the rows in Hertz
+        (np.ndarray).
+    """
+    _io = io.io()
+    if isinstance(source, str):
+        info = _io.read_wav_info(source)
+        sample_rate = info["sample_rate"]
+        length = info["frames"]
+    else:
+        assert sample_rate is not None, "sample_rate is needed for an array source"
+        length = source.shape[0]
+
+    n_frames = max(1, (max(length, nfft) - nfft) // hop + 1)
+    n_columns = min(n_columns, n_frames)
+    frame_column = np.arange(n_frames) * n_columns // n_frames
+
+    n_bins = nfft // 2 + 1
+    df = sample_rate / nfft
+    if log_freq:
+        row_edges = np.geomspace(1, n_bins, min(n_rows, n_bins) + 1)
+    else:
+        row_edges = np.linspace(0, n_bins, min(n_rows, n_bins) + 1)
+    row_edges = np.unique(np.round(row_edges).astype(np.int64))
+    row_edges = row_edges[row_edges < n_bins]
+    image = np.zeros((len(row_edges), n_columns), dtype=np.float32)
+
+    window = scipy.signal.get_window("hann", nfft).astype(dtype)
+
+    def read(start: int, stop: int):
+        block = np.zeros(stop - start, dtype=dtype)
+        stop = min(stop, length)
+        if start < stop:
+            if isinstance(source, str):
+                _io.load_wav(source, 0, start, stop, dtype=dtype, out=block)
+            else:
+                block[: stop - start] = source[start:stop]
+        return block
+
+    def process(first_frame: int):
+        last_frame = min(first_frame + block_frames, n_frames)
+        block = read(first_frame * hop, (last_frame - 1) * hop + nfft)
+        frames = np.lib.stride_tricks.sliding_window_view(block, nfft)[::hop]
+        power = np.abs(scipy.fft.rfft(frames * window, axis=-1)) ** 2
+        power = np.maximum.reduceat(power.astype(np.float32), row_edges, axis=-1)
+        columns = frame_column[first_frame:last_frame]
+        # frames of one block only cover a few neighbouring columns
+        reduced = np.zeros(
+            (image.shape[0], columns[-1] - columns[0] + 1), dtype=np.float32
+        )
+        np.maximum.at(reduced.T, columns - columns[0], power)
+        return columns[0], reduced
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for first_column, reduced in executor.map(
+            process, range(0, n_frames, block_frames)
+        ):
+            target = image[:, first_column : first_column + reduced.shape[1]]
+            np.maximum(target, reduced, out=target)
+
+    # same scale as the former mlab.specgram plot: 20 * log10 of the power ratio
+    with np.errstate(divide="ignore"):
+        image /= np.max(image)
+        np.log10(image, out=image)
+    image *= 20
+
+    column_first_frame = np.searchsorted(frame_column, np.arange(n_columns))
+    time_edges = (
+        np.append(column_first_frame, n_frames) * hop + nfft / 2 - hop / 2
+    ) / sample_rate
+    freq_edges = (np.append(row_edges, n_bins) - 0.5).clip(0) * df
+    return image, time_edges, freq_edges
@@ -0,0 +1,79 @@
+import module.catalog as catalog
+
+
+class watcher:
+    def __init__(self, _catalog: catalog.catalog, load_dirs: dict[str, str]) -> None:
+        """
+        Polls the input directories for renders that arrived or changed.
+
+        A render is reported once its size and mtime are the same in two
+        consecutive polls, so files still being written by the DAW are
+        picked up only when they are complete.
+
+        Parameters
+        ----------
+        _catalog : catalog.catalog
+            The catalog the directories are scanned through. Only the headers
+            of changed files are read on each poll.
+        load_dirs : dict[str, str]
+            The directory of each test type, see `catalog.catalog.scan`.
+        """
+        self.catalog = _catalog
+        self.load_dirs = load_dirs
+        # (size, mtime) of each render as it was analyzed
+        self.seen: dict[str, tuple[int, int]] = {}
+        # (size, mtime) of each changed render at the last poll
+        self.pending: dict[str, tuple[int, int]] = {}
+
+    def mark_seen(self, entries: list[catalog.CatalogEntry]):
+        """Records renders as analyzed, e.g. those of the initial run."""
+        for entry in entries:
+            self.seen[entry["path"]] = (entry["size"], entry["mtime_ns"])
+
+    def settled(
+        self, entries: list[catalog.CatalogEntry]
+    ) -> list[catalog.CatalogEntry]:
+        """
+        Returns the entries unchanged since they were recorded as analyzed,
+        leaving out renders still being written.
+        """
+        return [
+            entry
+            for entry in entries
+            if self.seen.get(entry["path"]) == (entry["size"], entry["mtime_ns"])
+        ]
+
+    def poll(self):
+        """
+        Scans the directories once.
+
+        Returns
+        -------
+        tuple
+            A tuple containing all current entries (list[catalog.CatalogEntry]),
+            the entries that arrived or changed and have settled since the
+            last poll (list[catalog.CatalogEntry]), and the paths of removed
+            renders (list[str]).
+        """
+        entries = self.catalog.scan(self.load_dirs)
+        current = {
+            entry["path"]: (entry["size"], entry["mtime_ns"]) for entry in entries
+        }
+        settled = [
+            entry
+            for entry in entries
+            if self.seen.get(entry["path"]) != current[entry["path"]]
+            and self.pending.get(entry["path"]) == current[entry["path"]]
+        ]
+        self.mark_seen(settled)
+        self.pending = {
+            path: state
+            for path, state in current.items()
+            if self.seen.get(path) != state
+        }
+        removed = [path for path in self.seen if path not in current]
+        for path in removed:
+            del self.seen[path]
+        if len(settled) > 0 or len(removed) > 0:
+            self.catalog.save()
+        return entries, settled, removed
@@ -1,11 +1,14 @@
+from typing import Callable, TypedDict
 import numpy as np
+import scipy.fft
+import scipy.signal.windows as scipy_windows
 import scipy.special as sp
 
 PI = np.longdouble(3.1415926535897932384626433832795028841971)
 
 
-def bartlett_longdouble(M):
-    values = np.array([0.0, M], dtype=np.longdouble)
+def bartlett_longdouble(M, dtype=np.longdouble):
+    values = np.array([0.0, M], dtype=dtype)
     M = values[1]
 
     if M < 1:
@@ -16,8 +19,8 @@ def bartlett_longdouble(M):
     return np.where(np.less_equal(n, 0), 1 + n / (M - 1), 1 - n / (M - 1))
 
 
-def hanning_longdouble(M):
-    values = np.array([0.0, M], dtype=np.longdouble)
+def hanning_longdouble(M, dtype=np.longdouble):
+    values = np.array([0.0, M], dtype=dtype)
     M = values[1]
 
     if M < 1:
@@ -25,10 +28,10 @@ def hanning_longdouble(M):
     if M == 1:
         return np.ones(1, dtype=values.dtype)
     n = np.arange(1 - M, M, 2, dtype=values.dtype)
-    return 0.5 + 0.5 * np.cos(PI * n / (M - 1), dtype=values.dtype)
+    return 0.5 + 0.5 * np.cos(PI.astype(values.dtype) * n / (M - 1), dtype=values.dtype)
 
 
-# kaiserの中で使われているi0の計算が、longdoubleでは実行できないらしい
+# scipy.special.i0, used by kaiser, has no longdouble loop, hence i0_longdouble
 
 
 def _len_guards(M):
@@ -54,13 +57,203 @@ def _truncate(w, needed):
         return w
 
 
-def gaussian_longdouble(M, std, sym=True):
+def gaussian_longdouble(M, std, sym=True, dtype=np.longdouble):
     if _len_guards(M):
-        return np.ones(M, dtype=np.longdouble)
+        return np.ones(M, dtype=dtype)
     M, needs_trunc = _extend(M, sym)
 
-    n = np.arange(0, M, dtype=np.longdouble) - (M - 1.0) / 2.0
+    n = np.arange(0, M, dtype=dtype) - (M - 1.0) / 2.0
     sig2 = 2 * std * std
-    w = np.exp(-(n**2) / sig2, dtype=np.longdouble)
+    w = np.exp(-(n**2) / sig2, dtype=dtype)
 
     return _truncate(w, needs_trunc)
+
+
+def gaussian_segment_longdouble(M, std, start, stop, sym=True, dtype=np.longdouble):
+    """Samples start:stop of gaussian_longdouble(M, std, sym) without computing the rest"""
+    if _len_guards(M):
+        return np.ones(stop - start, dtype=dtype)
+    M, _ = _extend(M, sym)
+
+    n = np.arange(start, stop, dtype=dtype) - (M - 1.0) / 2.0
+    sig2 = 2 * std * std
+    return np.exp(-(n**2) / sig2, dtype=dtype)
+
+
+def i0_longdouble(x, dtype=np.longdouble):
+    """Modified Bessel function of order 0 by its power series, in `dtype`"""
+    x = np.asarray(x, dtype=dtype)
+    quarter_x2 = x * x / 4
+    term = np.ones_like(x)
+    total = np.ones_like(x)
+    k = 0
+    # the terms grow up to k ~ x / 2 and then fall off, all positive
+    while np.any(term > np.finfo(dtype).eps * total):
+        k += 1
+        term = term * quarter_x2 / (k * k)
+        total += term
+    return total
+
+
+def kaiser_longdouble(M, beta, sym=True, dtype=np.longdouble):
+    if _len_guards(M):
+        return np.ones(M, dtype=dtype)
+    M, needs_trunc = _extend(M, sym)
+
+    n = np.arange(0, M, dtype=dtype)
+    alpha = (M - 1) / 2.0
+    w = i0_longdouble(
+        beta * np.sqrt(1 - ((n - alpha) / alpha) ** 2), dtype=dtype
+    ) / i0_longdouble(beta, dtype=dtype)
+
+    return _truncate(w, needs_trunc)
+
+
+class WindowCandidate(TypedDict):
+    title: str
+    # M -> the window of length M
+    window: Callable[[int], np.ndarray]
+
+
+class WindowDesign(TypedDict):
+    title: str
+    mainlobe_half_width: float
+    sidelobe_db: float
+    leakage_floor_db: float
+    floor_half_width: float
+
+
+def gaussian_candidates(stds, length, dtype=np.longdouble) -> list[WindowCandidate]:
+    """Gaussian windows with `std` in samples of a `length`-sample window, for `evaluate_windows`"""
+    return [
+        {
+            "title": f"gaussian std={std:g}",
+            "window": lambda M, std=std: gaussian_longdouble(
+                M, std * M / length, dtype=dtype
+            ),
+        }
+        for std in stds
+    ]
+
+
+def kaiser_candidates(betas, dtype=np.longdouble) -> list[WindowCandidate]:
+    """Kaiser windows, for `evaluate_windows`"""
+    return [
+        {
+            "title": f"kaiser beta={beta:g}",
+            "window": lambda M, beta=beta: kaiser_longdouble(M, beta, dtype=dtype),
+        }
+        for beta in betas
+    ]
+
+
+def chebyshev_candidates(attenuations, dtype=np.longdouble) -> list[WindowCandidate]:
+    """Dolph-Chebyshev windows (float64, from scipy), for `evaluate_windows`"""
+    return [
+        {
+            "title": f"chebyshev at={at:g}",
+            "window": lambda M, at=at: scipy_windows.chebwin(M, at).astype(dtype),
+        }
+        for at in attenuations
+    ]
+
+
+def product_candidate(a: WindowCandidate, b: WindowCandidate) -> WindowCandidate:
+    """The sample-wise product of two candidates, e.g. nuttall x kaiser"""
+    return {
+        "title": f"{a['title']} x {b['title']}",
+        "window": lambda M: a["window"](M) * b["window"](M),
+    }
+
+
+def evaluate_windows(
+    candidates: list[WindowCandidate],
+    floor_db: float = -200,
+    eval_length: int = 2**12,
+    oversample: int = 16,
+    dtype=np.longdouble,
+    mainlobe_level_db: float = -6,
+) -> list[WindowDesign]:
+    """
+    Measures the spectrum of many candidate windows with one batched FFT.
+
+    The windows are shape-defined, so they are built at `eval_length`
+    instead of the signal length and their spectra zero-padded by
+    `oversample`. Widths are in bins of the window's own length, which is
+    the same for any length; multiply by `fft_size / signal_length` to get
+    bins of a padded FFT, as in `metrics.window_half_width`.
+
+    Parameters
+    ----------
+    candidates : list[WindowCandidate]
+        The windows, see `gaussian_candidates` and the like.
+    floor_db : float, optional
+        The level the spectrum must stay below for `floor_half_width`.
+    eval_length : int, optional
+        The length the windows are built at. Floor widths beyond
+        `eval_length / 4` bins are reported as inf.
+    oversample : int, optional
+        The zero-padding factor of the spectra.
+    dtype : np.dtype, optional
+        The dtype of the FFT. Below about -300 dB, float64 rounding shows.
+    mainlobe_level_db : float, optional
+        The level `mainlobe_half_width` is measured at for windows without a
+        null.
+
+    Returns
+    -------
+    list[WindowDesign]
+        For each candidate: the distance of the first null from DC
+        (`mainlobe_half_width`), the highest level beyond it
+        (`sidelobe_db`), the highest level beyond `eval_length / 4` bins
+        (`leakage_floor_db`) and the distance beyond which the spectrum
+        stays below `floor_db` (`floor_half_width`). Levels are relative to
+        DC. A minimum only counts as a null if the spectrum rises 20 dB above
+        the rounding noise of `dtype` after it; a window without one, like a
+        Gaussian falling into the noise, gets the distance at which the
+        spectrum drops below `mainlobe_level_db` as `mainlobe_half_width`, and
+        the noise level as `sidelobe_db`.
+    """
+    if len(candidates) == 0:
+        return []
+    windows = np.stack(
+        [candidate["window"](eval_length).astype(dtype) for candidate in candidates]
+    )
+    magnitude = np.abs(scipy.fft.rfft(windows, n=eval_length * oversample, axis=-1))
+    with np.errstate(divide="ignore"):
+        db = (20 * np.log10(magnitude / magnitude[:, :1])).astype(np.float64)
+    n_bins = db.shape[-1]
+    k = np.arange(n_bins)
+
+    # the first bin after which the spectrum rises again
+    with np.errstate(invalid="ignore"):
+        rising = np.diff(db, axis=-1) > 0
+    first_minimum = np.where(rising.any(axis=-1), rising.argmax(axis=-1), n_bins - 1)
+    beyond = k >= first_minimum[:, np.newaxis]
+    sidelobe_db = np.where(beyond, db, -np.inf).max(axis=-1)
+    # a rise in the rounding noise is no sidelobe, so that minimum is no null
+    noise_db = 20 * np.log10(np.finfo(dtype).eps) + 20
+    has_null = sidelobe_db > noise_db
+    below_level = db < mainlobe_level_db
+    level_width = np.where(
+        below_level.any(axis=-1), below_level.argmax(axis=-1), n_bins - 1
+    )
+    mainlobe_half_width = np.where(has_null, first_minimum, level_width) / oversample
+    # n_bins // 2 padded bins are eval_length / 4 bins of the window
+    leakage_floor_db = db[:, n_bins // 2 :].max(axis=-1)
+    above = db > floor_db
+    last_above = n_bins - 1 - above[:, ::-1].argmax(axis=-1)
+    floor_half_width = np.where(
+        last_above >= n_bins // 2, np.inf, (last_above + 1) / oversample
+    )
+
+    return [
+        {
+            "title": candidate["title"],
+            "mainlobe_half_width": float(mainlobe_half_width[idx]),
+            "sidelobe_db": float(sidelobe_db[idx]),
+            "leakage_floor_db": float(leakage_floor_db[idx]),
+            "floor_half_width": float(floor_half_width[idx]),
+        }
+        for idx, candidate in enumerate(candidates)
+    ]
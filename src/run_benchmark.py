@@ -0,0 +1,140 @@
+import module.printer as printer
+import module.benchmark as benchmark
+import os
+import sys
+import time
+
+CONFIG = {
+    "sample_rate": 48000,
+    "signal_length": 2**20,
+    "fft_sizes": [2**20, 2**21, 2**22],
+    "plugin_counts": [1, 4, 16],
+    "repeats": 3,
+    # measure the bytes allocated per stage, see printer.span. Slows down every stage
+    # and skews its timing
+    "trace_memory": False,
+    "fft_workers": os.cpu_count(),
+    # renders of the synthetic plugins, rewritten on every run to match signal_length
+    "render_dir": "./data/benchmark_renders",
+    "baseline_path": "./data/benchmark_baseline.json",
+    # True stores this run as the new baseline
+    "update_baseline": False,
+    # a stage slower or allocating more than this fraction over the baseline regressed
+    "tolerance": 0.2,
+    "fail_on_regression": True,
+    # the largest error of the sub-sample latency estimate that passes, in samples,
+    # see benchmark.check_latency
+    "latency_tolerance": 1e-3,
+    "output_dir": os.path.join("output_benchmark", time.strftime("%Y%m%d-%H%M%S")),
+}
+
+
+def main():
+    os.makedirs(CONFIG["output_dir"], exist_ok=True)
+
+    p = printer.printer(CONFIG["output_dir"], CONFIG["trace_memory"])
+
+    for key, value in CONFIG.items():
+        p.print_message(f"{key}: {value}")
+
+    with p.span("render"):
+        n_plugins = max(CONFIG["plugin_counts"])
+        p.print_message(f"Rendering {n_plugins} synthetic plugins...")
+        render_paths = benchmark.render_plugins(
+            CONFIG["render_dir"],
+            CONFIG["sample_rate"],
+            CONFIG["signal_length"],
+            n_plugins,
+        )
+
+    with p.span("latency check"):
+        p.print_message("Checking the latency estimate on known delays...")
+        latency_checks = benchmark.check_latency(
+            CONFIG["signal_length"],
+            CONFIG["sample_rate"],
+            tolerance=CONFIG["latency_tolerance"],
+            workers=CONFIG["fft_workers"],
+        )
+        for check in latency_checks:
+            p.print_message(
+                f"delay {check['delay']:g} (polarity {check['polarity']:+d}): "
+                f"estimated {check['latency']:.6f}, error {check['error']:.2e} samples"
+                + ("" if check["passed"] else " FAILED")
+            )
+        latency_failures = [check for check in latency_checks if not check["passed"]]
+
+    results = []
+    with p.span("benchmark"):
+        for n_plugins in CONFIG["plugin_counts"]:
+            for idx, fft_size in enumerate(CONFIG["fft_sizes"]):
+                p.print_message(
+                    f"Benchmarking fft_size {fft_size}, {n_plugins} plugins..."
+                )
+                case_results = benchmark.run_case(
+                    render_paths,
+                    CONFIG["sample_rate"],
+                    fft_size,
+                    n_plugins,
+                    os.path.join(CONFIG["output_dir"], "plots"),
+                    repeats=CONFIG["repeats"],
+                    # it does not depend on fft_size
+                    spectrogram=idx == 0,
+                    trace_memory=CONFIG["trace_memory"],
+                    workers=CONFIG["fft_workers"],
+                )
+                for result in case_results:
+                    p.print_message(
+                        f"{result['stage']}: {result['wall_s']:.3f} s wall, "
+                        f"{result['cpu_s']:.3f} s cpu"
+                        + (
+                            ""
+                            if result["allocated_bytes"] is None
+                            else f", {result['allocated_bytes'] / 2**20:.1f} MiB "
+                            "allocated"
+                        )
+                    )
+                results += case_results
+
+    p.print_message("Writing result...")
+    benchmark.write_results(
+        os.path.join(CONFIG["output_dir"], "benchmark_results.csv"), results
+    )
+
+    regressions = []
+    baseline = benchmark.load_baseline(CONFIG["baseline_path"])
+    if baseline is None or CONFIG["update_baseline"]:
+        p.print_message(f"Storing baseline: '{CONFIG['baseline_path']}'")
+        benchmark.save_baseline(CONFIG["baseline_path"], results)
+    else:
+        if baseline["machine"] != benchmark.machine_info():
+            p.print_message(
+                f"baseline was measured on another machine: {baseline['machine']}"
+            )
+        comparisons = benchmark.compare_to_baseline(
+            results, baseline["results"], CONFIG["tolerance"]
+        )
+        benchmark.write_results(
+            os.path.join(CONFIG["output_dir"], "benchmark_comparison.csv"), comparisons
+        )
+        for comparison in comparisons:
+            p.print_message(
+                f"{comparison['stage']} (fft_size {comparison['fft_size']}, "
+                f"{comparison['n_plugins']} plugins): "
+                f"{comparison['wall_ratio']:.2f}x baseline"
+                + (" REGRESSION" if comparison["regression"] else "")
+            )
+        regressions = [c for c in comparisons if c["regression"]]
+        p.print_message(f"{len(regressions)} of {len(comparisons)} stages regressed")
+
+    p.print_message("Done!")
+    p.summary()
+    p.close()
+    if len(regressions) > 0 and CONFIG["fail_on_regression"]:
+        sys.exit(1)
+    # a wrong estimate is a bug, not a slowdown
+    if len(latency_failures) > 0:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import numpy as np
+import pytest
+import analyze
+import gen_signals
+import module.generator as generator
+import module.io as io
+
+LENGTH = 2**14
+
+
+@pytest.fixture
+def analyze_config(tmp_path, monkeypatch):
+    """
+    Points analyze.CONFIG at empty render directories under `tmp_path`, with
+    short renders, no plots, no cache and one process.
+
+    Returns a function that writes the impulse and sine renders of a plugin,
+    given the plugin as a function of the test signal.
+    """
+    monkeypatch.setitem(gen_signals.CONFIG, "signal_length", LENGTH)
+    monkeypatch.setitem(gen_signals.CONFIG, "sine_wave_window_std", 1000)
+    settings = {
+        "load_dir_impulse": str(tmp_path / "effected" / "impulse"),
+        "load_dir_sin": str(tmp_path / "effected" / "sin"),
+        "catalog_path": str(tmp_path / "data" / "catalog.json"),
+        "cache_dir": None,
+        "fft_size": LENGTH,
+        "plot": False,
+        "plot_zoom": 100,
+        "export_format": "json",
+        "workers": 1,
+        "memory_budget": None,
+        "output_dir": str(tmp_path / "output"),
+    }
+    for key, value in settings.items():
+        monkeypatch.setitem(analyze.CONFIG, key, value)
+    for path in (settings["load_dir_impulse"], settings["load_dir_sin"]):
+        os.makedirs(path)
+    os.makedirs(settings["output_dir"])
+    # both depend on gen_signals.CONFIG and fft_size
+    analyze.sine_wave_half_width.cache_clear()
+    analyze.sine_wave_order_gain.cache_clear()
+
+    _io = io.io()
+    gen = generator.generator(analyze.CONFIG["sample_rate"], str(tmp_path), "float64")
+    signals = {
+        "impulse": _io.load_wav_as_mono(gen.stream_impulse(LENGTH), np.float64)[1],
+        "sin": _io.load_wav_as_mono(
+            gen.stream_sine_wave(
+                gen_signals.CONFIG["sine_wave_freq"],
+                LENGTH,
+                -6,
+                window=gen_signals.sine_wave_window_segment(gen_signals.CONFIG),
+            ),
+            np.float64,
+        )[1],
+    }
+
+    def write_plugin(title: str, plugin):
+        for kind, load_dir in (
+            ("impulse", settings["load_dir_impulse"]),
+            ("sin", settings["load_dir_sin"]),
+        ):
+            _io.save_wav(
+                os.path.join(load_dir, f"{title}.wav"),
+                analyze.CONFIG["sample_rate"],
+                plugin(signals[kind][:LENGTH]),
+            )
+
+    yield write_plugin
+    analyze.sine_wave_half_width.cache_clear()
+    analyze.sine_wave_order_gain.cache_clear()
@@ -0,0 +1,34 @@
+import os
+
+import numpy as np
+import analyze
+import module.export as export
+
+
+def _read_outputs():
+    columns = export.read_export(
+        os.path.join(analyze.CONFIG["output_dir"], "analysis_export.json")
+    )
+    with open(os.path.join(analyze.CONFIG["output_dir"], "output.txt")) as f:
+        log = f.read()
+    return columns, log
+
+
+def test_silent_render_is_reported_and_left_out(analyze_config):
+    analyze_config("bypassed", np.zeros_like)
+    analyze_config("dry", lambda x: x)
+    analyze.main()
+
+    columns, log = _read_outputs()
+    assert list(columns["title"]) == ["dry"]
+    assert np.all(np.isfinite(columns["thd_db"]))
+    assert "bypassed: every channel is silent, left out" in log
+
+
+def test_only_silent_renders_write_empty_outputs(analyze_config):
+    analyze_config("bypassed", np.zeros_like)
+    analyze.main()
+
+    columns, log = _read_outputs()
+    assert len(columns["title"]) == 0
+    assert "bypassed: every channel is silent, left out" in log
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+import module.export as export
+import module.golden as golden
+
+
+def _run(freq: np.ndarray, magnitude_db: np.ndarray):
+    export_list = [
+        {
+            "title": "plugin",
+            "magnitude_db": magnitude_db,
+            "phase": np.zeros(len(freq)),
+            "distortion_db": np.full(len(freq), -150.0),
+            "impulse_excerpt": np.zeros(8),
+        }
+    ]
+    metrics_list = [
+        {name: 0.0 for name in export.METRIC_COLUMNS} | {"harmonic_dbc": [-100.0]}
+    ]
+    return export_list, metrics_list
+
+
+@pytest.mark.parametrize(
+    "freq",
+    [
+        export.log_frequency_grid(1, 24000, 400)[0],
+        # denser at the top than the bands, so low bands hold no grid point
+        np.linspace(20, 24000, 400),
+    ],
+)
+def test_as_many_bands_as_grid_points(freq):
+    rng = np.random.default_rng(0)
+    magnitude_db = rng.normal(0, 3, len(freq))
+    (reference,) = golden.reduce_references(freq, *_run(freq, magnitude_db), len(freq))
+    assert len(reference["freq"]) <= len(freq)
+    for name in ("magnitude_db", "phase", "distortion_db"):
+        assert np.all(np.isfinite(reference[name]))
+
+    golden_references = {"plugin": reference}
+    checks = golden.compare([reference], golden_references)
+    assert all(check["passed"] for check in checks)
+
+    (changed,) = golden.reduce_references(
+        freq, *_run(freq, magnitude_db + 1), len(freq)
+    )
+    checks = golden.compare([changed], golden_references)
+    (magnitude,) = [check for check in checks if check["check"] == "magnitude_db"]
+    assert not magnitude["passed"]
+    assert magnitude["failed_bands"] == len(reference["freq"])
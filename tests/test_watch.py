@@ -0,0 +1,39 @@
+import os
+
+import numpy as np
+import analyze
+import module.catalog as catalog
+import module.export as export
+import module.printer as printer
+import module.watch as watch
+
+
+def test_watch_survives_removal_of_every_render(analyze_config):
+    analyze_config("dry", lambda x: x)
+    analyze_config("invert", lambda x: -x)
+    p = printer.printer(analyze.CONFIG["output_dir"])
+    _catalog = catalog.catalog(analyze.CONFIG["catalog_path"])
+    entries, pair_list, _ = analyze.scan_renders(p, _catalog)
+    results = {}
+    analyze._store_results(results, pair_list, *analyze.analyze_pairs(p, pair_list))
+    assert sorted(results) == ["dry", "invert"]
+
+    _watcher = watch.watcher(
+        _catalog,
+        {
+            "impulse": analyze.CONFIG["load_dir_impulse"],
+            "sine": analyze.CONFIG["load_dir_sin"],
+        },
+    )
+    _watcher.mark_seen(entries)
+    for entry in entries:
+        os.remove(entry["path"])
+    analyze._watch_update(p, _catalog, _watcher, results)
+    p.close()
+
+    assert results == {}
+    columns = export.read_export(
+        os.path.join(analyze.CONFIG["output_dir"], "analysis_export.json")
+    )
+    assert len(columns["title"]) == 0
+    assert np.all(columns["freq"] > 0)